@@ -0,0 +1,68 @@
+"""
+Request body size versus time per render with and without compression of render requests,
+against a local stand-in render server that also gzips its responses.
+
+    python -m benchmarks.bench_render_compression [renders]
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+
+from flask import Flask
+from mock import patch
+from monotonic import monotonic
+
+from react.render_server import RenderServer, _compress
+from .bench_render_payload import listing_props
+from .stand_in_server import StandInRenderServer
+
+MODES = [
+    ('none', None, None),
+    ('gzip level 1', 'gzip', 1),
+    ('gzip level 6', 'gzip', 6),
+    ('deflate level 6', 'deflate', 6),
+]
+
+
+def main(renders=200):
+    server = StandInRenderServer(compress=True, markup_size=20000).start()
+
+    app = Flask(__name__)
+    app.config.update({
+        'REACT_RENDER': True,
+        'REACT_RENDER_URL': server.url,
+        'SERVER_NAME': 'localhost',
+        'REACT_RENDER_COMPRESSION_THRESHOLD': 1024,
+    })
+
+    print('{:>6} {:>16} {:>12} {:>12}'.format('items', 'compression', 'request B', 'ms/render'))
+
+    try:
+        with app.test_request_context('/'), patch('react.render_server.get_csrf_token', return_value='token'):
+            for items in (10, 100, 1000):
+                for name, encoding, level in MODES:
+                    app.config.update({
+                        'REACT_RENDER_COMPRESSION': encoding,
+                        'REACT_RENDER_COMPRESSION_LEVEL': level,
+                    })
+                    renderer = RenderServer()
+
+                    encode_options, _ = renderer._serialize_options(
+                        '/listing.js', renderer._serialize_props(listing_props(items)), False)
+                    body = encode_options(False).encode('utf-8')
+                    if encoding:
+                        body = _compress(body, encoding, level)
+
+                    renderer.render('/listing.js', listing_props(items))
+                    start = monotonic()
+                    for _ in range(renders):
+                        renderer.render('/listing.js', listing_props(items))
+                    elapsed = (monotonic() - start) / renders
+
+                    print('{:>6} {:>16} {:>12} {:>12.3f}'.format(items, name, len(body), elapsed * 1000))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,122 @@
+"""
+Throughput, latency percentiles and allocations of `render_component` under concurrent load,
+against the stand-in render server.
+
+    python -m benchmarks.bench_render_load [concurrency] [renders] [latency_ms] [markup_size]
+
+Each of `concurrency` threads makes renders one after another, each in a request of its own (so with
+its own csrf token) as a request thread of the app would, until `renders` have been made in total. The render server takes `latency_ms` per render and
+returns `markup_size` bytes of markup. Allocations are measured with tracemalloc (Python 3 only) in
+a second, shorter, run, as tracing slows rendering down.
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from monotonic import monotonic
+
+from react.render import render_component
+from react.render_server import RenderServer
+from .bench_render_payload import listing_props
+from .stand_in_server import StandInRenderServer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+SCENARIOS = [
+    ('no cache', {}),
+    ('render cache', {'REACT_RENDER_CACHE': True}),
+    ('render cache, stats', {'REACT_RENDER_CACHE': True, 'REACT_RENDER_STATS': True}),
+]
+
+
+def percentile(timings, percent):
+    """Nearest-rank percentile of sorted ``timings``."""
+    index = int(round(percent / 100 * len(timings) + 0.5)) - 1
+    return timings[min(max(index, 0), len(timings) - 1)]
+
+
+def run(app, renderer, concurrency, renders, props):
+    def worker(count):
+        timings = []
+        for i in range(count):
+            with app.test_request_context('/'):
+                start = monotonic()
+                render_component('/widget/component.js', props(i), renderer=renderer)
+                timings.append(monotonic() - start)
+        return timings
+
+    counts = [renders // concurrency + (1 if i < renders % concurrency else 0) for i in range(concurrency)]
+    start = monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = sorted(t for worker_timings in executor.map(worker, counts) for t in worker_timings)
+    return timings, monotonic() - start
+
+
+def measure_allocations(app, renderer, concurrency, renders, props):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        run(app, renderer, concurrency, renders, props)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return peak, retained
+
+
+def main(concurrency=8, renders=2000, latency_ms=5, markup_size=10000):
+    server = StandInRenderServer(latency=latency_ms / 1000, markup_size=markup_size).start()
+    items = listing_props(20)
+
+    def props(i):
+        # A few distinct pages, so the render cache has something to hit.
+        return dict(items, page=i % 20)
+
+    print('{} threads, {} renders, {}ms render server latency, {}B markup'.format(
+        concurrency, renders, latency_ms, markup_size))
+    print('{:22} {:>10} {:>9} {:>9} {:>9} {:>11} {:>12}'.format(
+        'scenario', 'renders/s', 'p50 ms', 'p95 ms', 'p99 ms', 'peak KiB', 'retained KiB'))
+
+    try:
+        for name, config in SCENARIOS:
+            app = Flask(__name__)
+            app.config.update({
+                'REACT_RENDER': True,
+                'REACT_RENDER_URL': server.url,
+                'REACT_RENDER_POOL_SIZE': concurrency,
+                'SERVER_NAME': 'localhost',
+                'SECRET_KEY': 'benchmark',
+            })
+            app.config.update(config)
+            renderer = RenderServer()
+
+            run(app, renderer, concurrency, concurrency * 5, props)
+            timings, elapsed = run(app, renderer, concurrency, renders, props)
+
+            peak = retained = None
+            if tracemalloc is not None:
+                peak, retained = measure_allocations(app, renderer, concurrency, renders // 10, props)
+
+            print('{:22} {:>10.0f} {:>9.2f} {:>9.2f} {:>9.2f} {:>11} {:>12}'.format(
+                name,
+                len(timings) / elapsed,
+                percentile(timings, 50) * 1000,
+                percentile(timings, 95) * 1000,
+                percentile(timings, 99) * 1000,
+                '-' if peak is None else '{:.0f}'.format(peak / 1024),
+                '-' if retained is None else '{:.0f}'.format(retained / 1024),
+            ))
+            renderer.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
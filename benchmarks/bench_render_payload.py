@@ -0,0 +1,69 @@
+"""
+Request body size and CPU time to prepare a render, for props sent as a JSON encoded string
+(`serializedProps`) versus embedded as they are (`props`), over catalogue listings of different sizes.
+
+    python -m benchmarks.bench_render_payload [repeat]
+
+Set REACT_RENDER_JSON_DUMPS below to compare another JSON encoder.
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+import timeit
+
+from flask import Flask
+from mock import patch
+
+from react.render_server import RenderServer
+
+REACT_RENDER_JSON_DUMPS = None
+
+
+def listing_props(items):
+    return {
+        'services': [
+            {
+                'id': 1000000 + i,
+                'name': 'Cloud hosting "{}"'.format(i),
+                'supplierName': 'Supplier & Sons Pty Ltd',
+                'summary': 'Managed <b>infrastructure</b> with 24/7 support.\n' * 3,
+                'lot': 'cloud-hosting',
+                'frameworkSlug': 'digital-marketplace',
+                'prices': [{'unit': 'hour', 'price': '120.00'}, {'unit': 'day', 'price': '900.00'}],
+                'tags': ['government', 'secure', 'scalable'],
+            }
+            for i in range(items)
+        ]
+    }
+
+
+def prepare(renderer, props, raw_props):
+    serialized_props = renderer._serialize_props(dict(props))
+    encode_options, _ = renderer._serialize_options('/listing.js', serialized_props, False)
+    return encode_options(raw_props)
+
+
+def main(repeat=200):
+    app = Flask(__name__)
+    app.config.update({'SERVER_NAME': 'localhost', 'REACT_RENDER_JSON_DUMPS': REACT_RENDER_JSON_DUMPS})
+
+    renderer = RenderServer()
+
+    print('{:>6} {:>18} {:>12} {:>18} {:>12}'.format(
+        'items', 'serializedProps B', 'ms/render', 'props B', 'ms/render'))
+
+    with app.test_request_context('/'), patch('react.render_server.get_csrf_token', return_value='token'):
+        for items in (10, 100, 1000):
+            props = listing_props(items)
+            row = [items]
+            for raw_props in (False, True):
+                body = prepare(renderer, props, raw_props)
+                seconds = min(timeit.repeat(
+                    lambda: prepare(renderer, props, raw_props), number=repeat, repeat=3)) / repeat
+                row.extend([len(body.encode('utf-8')), seconds * 1000])
+
+            print('{:>6} {:>18} {:>12.3f} {:>18} {:>12.3f}'.format(*row))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,56 @@
+"""
+Per-render overhead of a new connection per render versus the pooled keep-alive session.
+
+    python -m benchmarks.bench_render_pool [renders]
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+
+import requests
+from flask import Flask
+from mock import patch
+from monotonic import monotonic
+
+from react.render_server import RenderServer
+from .stand_in_server import StandInRenderServer
+
+
+def run(renderer, renders):
+    start = monotonic()
+    for _ in range(renders):
+        renderer.render('/widget/component.js', {'foo': 'bar'})
+    return (monotonic() - start) / renders
+
+
+def main(renders=1000):
+    server = StandInRenderServer().start()
+
+    app = Flask(__name__)
+    app.config.update({
+        'REACT_RENDER': True,
+        'REACT_RENDER_URL': server.url,
+        'SERVER_NAME': 'localhost',
+    })
+
+    try:
+        with app.test_request_context('/'), patch('react.render_server.get_csrf_token', return_value='token'):
+            pooled = RenderServer()
+            unpooled = RenderServer()
+            # Emulate the previous behaviour of one `requests.post` per render.
+            unpooled._session = requests
+
+            run(pooled, 10)
+            results = [
+                ('new connection per render', run(unpooled, renders)),
+                ('pooled keep-alive session', run(pooled, renders)),
+            ]
+    finally:
+        server.stop()
+
+    for name, seconds in results:
+        print('{:30} {:8.3f} ms/render'.format(name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,64 @@
+"""
+CPU time to format a listing of S3 keys, reformatting timestamps with dateutil versus the fast path
+for the formats S3 returns.
+
+    python -m benchmarks.bench_s3_format_key [keys] [repeat]
+"""
+from __future__ import absolute_import, print_function
+
+import datetime
+import sys
+import timeit
+
+from dateutil.parser import parse as parse_time
+from mock import patch
+
+from dmutils import s3
+from dmutils.formats import DATETIME_FORMAT
+
+
+class Key(object):
+    def __init__(self, name, last_modified):
+        self.name = name
+        self.last_modified = last_modified
+        self.size = 1024
+
+
+def listing(keys):
+    start = datetime.datetime(2015, 1, 1)
+    return [
+        Key(
+            'g-cloud-9/documents/{}/{}-pricing-document.pdf'.format(i // 10, i),
+            # Alternate listing timestamps and our own timestamp metadata.
+            (start + datetime.timedelta(minutes=i)).strftime(
+                '%Y-%m-%dT%H:%M:%S.000Z' if i % 2 else DATETIME_FORMAT)
+        )
+        for i in range(keys)
+    ]
+
+
+def dateutil_format_timestamp(timestamp):
+    return parse_time(timestamp).strftime(DATETIME_FORMAT)
+
+
+def main(keys=10000, repeat=5):
+    with patch('dmutils.s3.boto.connect_s3'):
+        bucket = s3.S3('digitalmarketplace-documents-dev-dev', validate=False)
+    listed = listing(keys)
+
+    def run():
+        for key in listed:
+            bucket._format_key(key, False)
+
+    results = []
+    with patch('dmutils.s3.format_timestamp', dateutil_format_timestamp):
+        results.append(('dateutil', min(timeit.repeat(run, number=1, repeat=repeat))))
+    results.append(('fast path', min(timeit.repeat(run, number=1, repeat=repeat))))
+
+    for name, seconds in results:
+        print('{:10} {:8.1f} ms per {} keys  {:6.2f} us/key'.format(
+            name, seconds * 1000, keys, seconds / keys * 1000000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
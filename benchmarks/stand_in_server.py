@@ -0,0 +1,107 @@
+"""
+Minimal stand-in for the node render service, for benchmarking the React render path locally.
+
+Speaks HTTP/1.1 with keep-alive so that connection reuse on the client side is measurable, and
+accepts props either as a JSON encoded string (`serializedProps`) or, if started with
+`raw_props=True`, as a JSON object (`props`). Compressed request bodies are accepted, and
+responses are gzipped for clients that accept it if started with `compress=True`. Each render
+takes at least `latency` seconds and returns `markup_size` bytes of markup, to stand in for heavier
+components.
+
+Run it on its own to point an app at it:
+
+    python -m benchmarks.stand_in_server [port] [latency] [markup_size]
+"""
+from __future__ import absolute_import, print_function
+
+import json
+import sys
+import threading
+import time
+import zlib
+
+from six.moves import BaseHTTPServer, socketserver
+
+
+class RenderHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs
+    # adds ~40ms to every response on a kept-alive connection.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('content-length', 0))
+        body = self.rfile.read(length)
+        if self.headers.get('content-encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif self.headers.get('content-encoding') == 'deflate':
+            body = zlib.decompress(body)
+
+        options = json.loads(body.decode('utf-8'))
+        if 'serializedProps' in options:
+            options['props'] = json.loads(options['serializedProps'])
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        body = json.dumps({
+            'markup': '<div>{}{}</div>'.format(options['path'], 'x' * self.server.markup_size),
+            'slug': 'main',
+            'files': {'main': 'main.js', 'vendor': 'vendor.js'},
+        }).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.server.compress and 'gzip' in self.headers.get('accept-encoding', ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header('Content-Encoding', 'gzip')
+        if self.server.raw_props:
+            self.send_header('X-Render-Formats', 'serialized-props, raw-props')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInRenderServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    # Enough for the load benchmark's concurrent connections.
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, raw_props=False, compress=False, markup_size=0, latency=0):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), RenderHandler)
+        self.raw_props = raw_props
+        self.compress = compress
+        self.markup_size = markup_size
+        self.latency = latency
+
+    @property
+    def url(self):
+        return 'http://{}:{}/render'.format(*self.server_address)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(port=8000, latency=0, markup_size=0):
+    server = StandInRenderServer(port=int(port), latency=float(latency), markup_size=int(markup_size))
+    print('Stand-in render server listening on {}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -1,14 +1,13 @@
 import os
 import datetime
 import rollbar
-import boto3
 
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
 
-from .s3 import S3ResponseError, get_file_size_up_to_maximum, FILE_SIZE_LIMIT
+from .s3 import S3ResponseError, get_cached_signed_url, get_file_size_up_to_maximum, storage_pool, FILE_SIZE_LIMIT
 
 
 BAD_SUPPLIER_NAME_CHARACTERS = ['#', '%', '&', '{', '}', '\\', '<', '>', '*', '?', '/', '$',
@@ -111,11 +110,7 @@ def upload_service_documents(bucket, documents_url, service, request_files, sect
              if field in request_files}
     files = filter_empty_files(files)
     errors = validate_documents(files)
-    s3 = boto3.resource(
-        's3',
-        endpoint_url=os.getenv('AWS_S3_URL')
-    )
-    uploader = s3.Bucket(bucket)
+    uploader = storage_pool.get_resource().Bucket(bucket)
     if errors:
         return None, errors
 
@@ -218,12 +213,22 @@ def get_extension(filename):
     return file_extension.lower()
 
 
-def get_signed_url(bucket, path, base_url):
-    s3 = boto3.client(
-        's3',
-        endpoint_url=os.getenv('AWS_S3_URL')
-    )
-    url = s3.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': path}, ExpiresIn=120)
+SIGNED_URL_EXPIRES_IN = 120
+
+
+def get_signed_url(bucket, path, base_url, cache=False):
+    """Sign a URL to download ``path`` from ``bucket``, on the host of ``base_url`` if it is given.
+
+    With ``cache`` set, a URL signed earlier for the same path is reused, see ``get_cached_signed_url``.
+    """
+    def sign():
+        return storage_pool.get_client().generate_presigned_url(
+            'get_object', Params={'Bucket': bucket, 'Key': path}, ExpiresIn=SIGNED_URL_EXPIRES_IN)
+
+    if cache:
+        url = get_cached_signed_url(('boto3', os.getenv('AWS_S3_URL'), bucket, path), SIGNED_URL_EXPIRES_IN, sign)
+    else:
+        url = sign()
     if url is not None:
         if base_url is not None:
             url = urlparse.urlparse(url)
@@ -232,6 +237,14 @@ def get_signed_url(bucket, path, base_url):
         return url
 
 
+def get_signed_urls(bucket, paths, base_url, cache=False):
+    """Sign URLs for several paths in ``bucket``, as ``get_signed_url`` does.
+
+    :return: dict of path to signed URL
+    """
+    return dict((path, get_signed_url(bucket, path, base_url, cache)) for path in paths)
+
+
 # this method is deprecated
 def get_agreement_document_path(framework_slug, supplier_code, document_name):
     return '{0}/agreements/{1}/{1}-{2}'.format(
@@ -1,11 +1,13 @@
 import os
 import re
-import boto3
 import botocore
+from boto3.s3.transfer import TransferConfig
 from werkzeug.utils import secure_filename
 from flask import current_app
 from io import BytesIO
 
+from .s3 import storage_pool
+
 
 def allowed_file(filename):
     return filename.lower().rsplit('.', 1)[1] in current_app.config.get('ALLOWED_EXTENSIONS')
@@ -49,26 +51,36 @@ def s3_upload_fileObj(fileObj, path=''):
         raise Exception('Invalid file extension: {}'.format(fileObj.filename))
 
     filename = secure_filename(fileObj.filename)
-    s3 = boto3.resource(
-        's3',
-        endpoint_url=os.getenv('AWS_S3_URL')
-    )
-    bucket = s3.Bucket(current_app.config.get('S3_BUCKET_NAME'))
+    bucket = storage_pool.get_resource().Bucket(current_app.config.get('S3_BUCKET_NAME'))
 
     filename = s3_generate_unique_filename(filename, path)
 
-    bucket.upload_fileobj(fileObj, os.path.join(path, filename))
+    bucket.upload_fileobj(fileObj, os.path.join(path, filename), **_upload_options())
 
     return filename
 
 
+def _upload_options():
+    """Multipart upload settings for ``upload_fileobj``, from the app config.
+
+    Files larger than ``S3_UPLOAD_PART_SIZE`` bytes are uploaded in parts of that size,
+    ``S3_UPLOAD_CONCURRENCY`` (default 10) at a time. Failed parts are retried by botocore,
+    and the upload is aborted if a part still fails.
+    """
+    part_size = current_app.config.get('S3_UPLOAD_PART_SIZE')
+    if not part_size:
+        return {}
+
+    return {'Config': TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=current_app.config.get('S3_UPLOAD_CONCURRENCY', 10),
+    )}
+
+
 def s3_download_file(bucket_name, file, path):
     filename = secure_filename(file)
-    s3 = boto3.client(
-        's3',
-        endpoint_url=os.getenv('AWS_S3_URL')
-    )
-    obj = s3.get_object(Bucket=bucket_name, Key=os.path.join(path, filename))
+    obj = storage_pool.get_client().get_object(Bucket=bucket_name, Key=os.path.join(path, filename))
     body = obj['Body']
     for chunk in body.iter_chunks(chunk_size=10 * 1024):
         yield chunk
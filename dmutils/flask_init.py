@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import os
+import sys
 import jinja2
 import rollbar
 try:
@@ -9,7 +10,7 @@ except ImportError:
     from urllib.parse import quote  # Python 3+
 
 import flask_featureflags
-from . import config, logging, force_https, request_id, formats, filters, rollbar_agent
+from . import config, logging, force_https, request_id, formats, filters, rollbar_agent, s3
 from flask import Markup, redirect, request, session, current_app, abort
 from flask_script import Manager, Server
 from flask_login import current_user
@@ -46,6 +47,7 @@ def init_app(
     request_id.init_app(application)
     force_https.init_app(application)
     rollbar_agent.init_app(application)
+    s3.init_app(application)
 
     flask_featureflags.FeatureFlag(application)
 
@@ -211,6 +213,9 @@ def init_manager(application, port, extra_directories=()):
     @manager.command
     def runprodserver():
         from waitress import serve
+        # Imported here as react depends on dmutils.
+        from react.warmup import warm_up_from_config
+        warm_up_from_config(application)
         serve(application, port=port)
 
     @manager.command
@@ -219,4 +224,32 @@ def init_manager(application, port, extra_directories=()):
         for rule in sorted(manager.app.url_map.iter_rules(), key=lambda r: r.rule):
             print("{:10} {}".format(", ".join(rule.methods - set(['OPTIONS', 'HEAD'])), rule.rule))
 
+    @manager.option('-n', '--limit', dest='limit', type=int, default=20)
+    def render_stats(limit):
+        """Show the React components taking the most server-side render time.
+
+        Reads the summaries the app's processes write to REACT_RENDER_STATS_FILE, as this
+        command's own process hasn't rendered anything.
+        """
+        # Imported here as react depends on dmutils.
+        from react.instrumentation import format_summary, load_summary
+
+        summary_file = application.config.get('REACT_RENDER_STATS_FILE')
+        if not summary_file:
+            sys.exit("REACT_RENDER_STATS_FILE must be set to show render stats")
+        # Summaries not written for a few intervals are from workers that have stopped.
+        max_age = 3 * application.config.get('REACT_RENDER_STATS_INTERVAL', 60)
+        print(format_summary(load_summary(summary_file, max_age), limit))
+
+    @manager.option('--crawl', dest='crawl', action='store_true', default=False)
+    def render_warmup(crawl):
+        """Render the REACT_RENDER_WARMUP components and show how long each took."""
+        from react.warmup import format_results, warm_up
+
+        results = warm_up(
+            application, application.config.get('REACT_RENDER_WARMUP'), crawl,
+            max_workers=application.config.get('REACT_RENDER_WARMUP_CONCURRENCY', 4),
+            timeout=application.config.get('REACT_RENDER_WARMUP_TIMEOUT', 30))
+        print(format_results(results))
+
     return manager
@@ -65,6 +65,25 @@ class CloudWatchClient(object):
             dimensions=self.dimensions(dimensions),
             statistics=statistics)
 
+    def put_count(self, name, count, dimensions=None):
+        """Send the number of times something happened."""
+        self._put_metric(name, count, unit='Count', dimensions=dimensions)
+
+    def put_statistics(self, name, count, total, minimum, maximum, unit=None, dimensions=None):
+        """Send a set of values aggregated locally, rather than each value separately."""
+        if not count:
+            return
+        self._put_metric(
+            name,
+            unit=unit,
+            dimensions=dimensions,
+            statistics={
+                'samplecount': count,
+                'sum': total,
+                'minimum': minimum,
+                'maximum': maximum,
+            })
+
     def timer(self, name):
         return Timer(self, name)
 
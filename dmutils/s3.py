@@ -1,31 +1,207 @@
 from __future__ import absolute_import
 import os
 import re
+import threading
+import time
 import boto
 import boto.exception
+import boto3.session
 import datetime
+import heapq
 import mimetypes
 import logging
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
 from dateutil.parser import parse as parse_time
+from monotonic import monotonic
 
 from boto.exception import S3ResponseError  # noqa
+from botocore.config import Config
 
 from .formats import DATETIME_FORMAT
 
 logger = logging.getLogger(__name__)
 
 FILE_SIZE_LIMIT = 5400000  # approximately 5Mb
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects smaller parts, other than the last
+MULTI_DELETE_MAX_KEYS = 1000  # most keys S3 deletes in one request
 BUCKET_SHORT_NAME_PATTERN = re.compile(
     r'^digitalmarketplace-([^\-]+)-([^\-]+)-(\2)$'
 )
+# Timestamps in the formats S3 returns them in, which are reformatted without dateutil:
+# listings' ISO 8601 last_modified and our own DATETIME_FORMAT timestamp metadata...
+ISO_TIMESTAMP_PATTERN = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z$'
+)
+# ...and RFC 1123 last_modified from HEAD requests, e.g. "Mon, 17 Aug 2015 14:00:00 GMT".
+RFC1123_TIMESTAMP_PATTERN = re.compile(
+    r'^[A-Z][a-z]{2}, (\d{2}) ([A-Z][a-z]{2}) (\d{4}) (\d{2}):(\d{2}):(\d{2}) GMT$'
+)
+MONTHS = dict(
+    (month, '{:02}'.format(number)) for number, month in enumerate(
+        ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)
+)
 
 
-class S3(object):
-    def __init__(self, bucket_name=None, host='s3-eu-west-1.amazonaws.com'):
-        conn = boto.connect_s3(host=host)
+class StoragePool(object):
+    """Process-wide pool of the S3 connections and clients used by ``S3``, ``dmutils.file`` and
+    ``dmutils.documents``, with timeouts and retries for all of them set in one place.
+
+    Each connection, client and bucket handle is created once per process rather than on every
+    call. boto connections and bucket handles are kept per host, and boto3 clients per endpoint
+    URL; all of them are safe to share between threads and keep a pool of HTTP connections.
+    boto3 resources are not thread-safe, so one is kept per endpoint URL for each thread.
+    """
+
+    def __init__(self):
+        self._connections = {}
+        self._buckets = {}
+        self._clients = {}
+        self._local = threading.local()
+        self._settings = {}
+        self._lock = threading.Lock()
+
+    def configure(self, timeout=None, retries=None, max_connections=None):
+        """Set how connections and clients are created, clearing any created already.
+        Settings left as ``None`` keep the library's default.
+
+        :param timeout:         seconds to wait to connect to S3 and for each read
+        :param retries:         times a request that fails with a server or connection error is retried
+        :param max_connections: HTTP connections each boto3 client keeps open; boto connections
+                                open as many as they need
+        """
+        with self._lock:
+            self._settings = {'timeout': timeout, 'retries': retries, 'max_connections': max_connections}
+        self.clear()
+
+    def get_connection(self, host):
+        with self._lock:
+            conn = self._connections.get(host)
+            if conn is None:
+                conn = self._connections[host] = boto.connect_s3(host=host)
+                if self._settings.get('timeout') is not None:
+                    conn.http_connection_kwargs['timeout'] = self._settings['timeout']
+                if self._settings.get('retries') is not None:
+                    conn.num_retries = self._settings['retries']
+            return conn
+
+    def get_bucket(self, bucket_name, host, validate=True):
+        """Return the boto bucket handle for ``bucket_name``, creating it on first use.
+
+        :param validate: check that the bucket exists when it is first used. If ``False``, a
+                         missing bucket is only noticed when the first request to it fails.
+        """
+        bucket = self._buckets.get((host, bucket_name))
+        if bucket is not None:
+            return bucket
+
+        # Validating makes a request, so isn't done holding the lock. If two threads race
+        # to create the same bucket handle, the first one stored is kept.
+        conn = self.get_connection(host)
+        if validate:
+            bucket = conn.get_bucket(bucket_name)
+        else:
+            bucket = conn.get_bucket(bucket_name, validate=False)
+
+        with self._lock:
+            return self._buckets.setdefault((host, bucket_name), bucket)
+
+    def get_client(self, endpoint_url=None):
+        """Return the boto3 S3 client for ``endpoint_url``, the ``AWS_S3_URL`` environment variable by default."""
+        endpoint_url = endpoint_url or os.getenv('AWS_S3_URL')
+        with self._lock:
+            client = self._clients.get(endpoint_url)
+            if client is None:
+                client = self._clients[endpoint_url] = boto3.session.Session().client(
+                    's3', endpoint_url=endpoint_url, config=self._boto3_config())
+            return client
+
+    def get_resource(self, endpoint_url=None):
+        """Return this thread's boto3 S3 resource for ``endpoint_url``, the ``AWS_S3_URL`` environment
+        variable by default."""
+        endpoint_url = endpoint_url or os.getenv('AWS_S3_URL')
+        resources = getattr(self._local, 'resources', None)
+        if resources is None:
+            resources = self._local.resources = {}
+        resource = resources.get(endpoint_url)
+        if resource is None:
+            resource = resources[endpoint_url] = boto3.session.Session().resource(
+                's3', endpoint_url=endpoint_url, config=self._boto3_config())
+        return resource
+
+    def clear(self):
+        with self._lock:
+            self._connections.clear()
+            self._buckets.clear()
+            self._clients.clear()
+            # Resources held by other threads are replaced the next time those threads use the pool.
+            self._local = threading.local()
+
+    def _boto3_config(self):
+        options = {}
+        if self._settings.get('timeout') is not None:
+            options['connect_timeout'] = options['read_timeout'] = self._settings['timeout']
+        if self._settings.get('retries') is not None:
+            options['retries'] = {'max_attempts': self._settings['retries']}
+        if self._settings.get('max_connections') is not None:
+            options['max_pool_connections'] = self._settings['max_connections']
+        return Config(**options)
+
+
+storage_pool = StoragePool()
+
+
+def init_app(app):
+    """Configure ``storage_pool`` from ``S3_TIMEOUT``, ``S3_RETRIES`` and ``S3_POOL_SIZE`` in the app config."""
+    storage_pool.configure(
+        timeout=app.config.get('S3_TIMEOUT'),
+        retries=app.config.get('S3_RETRIES'),
+        max_connections=app.config.get('S3_POOL_SIZE'),
+    )
+
+
+class LRUCache(object):
+    """Thread-safe cache holding at most ``max_size`` entries, dropping the least recently used."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, cache_key):
+        """Return ``(True, value)`` for a cached entry, or ``(False, None)``, as ``None`` may be cached."""
+        with self._lock:
+            if cache_key not in self._entries:
+                return False, None
+            value = self._entries.pop(cache_key)
+            self._entries[cache_key] = value
+            return True, value
+
+    def set(self, cache_key, value):
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            self._entries[cache_key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Custom timestamp metadata of S3 objects, keyed by ``(bucket_name, path, etag)``: an object that
+# is overwritten gets a new etag, so a cached timestamp never needs invalidating.
+timestamp_cache = LRUCache()
+
+# Signed URLs with the time they expire, see ``get_cached_signed_url``.
+signed_url_cache = LRUCache()
+
 
+class S3(object):
+    def __init__(self, bucket_name=None, host='s3-eu-west-1.amazonaws.com', validate=True):
         self.bucket_name = bucket_name
-        self.bucket = conn.get_bucket(bucket_name)
+        self.bucket = storage_pool.get_bucket(bucket_name, host, validate)
 
     @property
     def bucket_short_name(self):
@@ -36,7 +212,8 @@ class S3(object):
 
         return match.group(1)
 
-    def save(self, path, file, acl='public-read', move_prefix=None, timestamp=None, download_filename=None):
+    def save(self, path, file, acl='public-read', move_prefix=None, timestamp=None, download_filename=None,
+             archive=True, fast=False, part_size=None, max_concurrency=4, part_retries=2):
         """Save a file in an S3 bucket
 
         canned ACL list: https://docs.aws.amazon.com/AmazonS3/latest/dev/acl-overview.html#canned-acl
@@ -46,12 +223,25 @@ class S3(object):
         :param acl:         S3 canned ACL
         :param move_prefix: Prefix to give to existing file when moving it out of the way
         :param timestamp:   Timestamp to set for this file rather than using utcnow
+        :param archive:     Move an existing file at ``path`` out of the way first
+        :param fast:        Send the ACL with the upload rather than in a separate request, and archive
+                            an existing file with a single copy request rather than checking for it first
+        :param part_size:   Upload files larger than this many bytes in parts of this size, at least
+                            ``MULTIPART_MIN_PART_SIZE``. The ACL is always sent with multipart uploads.
+        :param max_concurrency: Parts uploaded at the same time
+        :param part_retries: Times a part that fails to upload is retried before the upload is cancelled
 
         :return: S3 Key
         """
         path = path.lstrip('/')
 
-        self._move_existing(path, move_prefix)
+        if part_size is not None and part_size < MULTIPART_MIN_PART_SIZE:
+            raise ValueError('part_size must be at least {} bytes'.format(MULTIPART_MIN_PART_SIZE))
+
+        if archive and fast:
+            self._copy_existing(path, move_prefix)
+        elif archive:
+            self._move_existing(path, move_prefix)
 
         key = self.bucket.new_key(path)
         filesize = get_file_size_up_to_maximum(file)
@@ -60,11 +250,23 @@ class S3(object):
         headers = {'Content-Type': self._get_mimetype(key.name)}
         if download_filename:
             headers['Content-Disposition'] = 'attachment; filename="{}"'.format(download_filename).encode('utf-8')
-        key.set_contents_from_file(
-            file,
-            headers=headers
-        )
-        key.set_acl(acl)
+        if part_size and get_file_size(file) > part_size:
+            self._save_multipart(
+                path, file, headers, {'timestamp': timestamp.strftime(DATETIME_FORMAT)}, acl,
+                part_size, max_concurrency, part_retries
+            )
+        elif fast:
+            key.set_contents_from_file(
+                file,
+                headers=headers,
+                policy=acl
+            )
+        else:
+            key.set_contents_from_file(
+                file,
+                headers=headers
+            )
+            key.set_acl(acl)
         logger.info(
             "Uploaded file {filepath} of size {filesize} with acl {fileacl}",
             extra={
@@ -75,23 +277,75 @@ class S3(object):
 
         return key
 
+    def _save_multipart(self, path, file, headers, metadata, acl, part_size, max_concurrency, part_retries):
+        upload = self.bucket.initiate_multipart_upload(path, headers=headers, metadata=metadata, policy=acl)
+        try:
+            # Parts are read one after another from the file, and at most max_concurrency
+            # of them are held in memory while they upload.
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                pending = set()
+                part_number = 0
+                data = file.read(part_size)
+                while data:
+                    part_number += 1
+                    pending.add(executor.submit(_upload_part, upload, data, part_number, part_retries))
+                    if len(pending) >= max_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    data = file.read(part_size)
+                for future in pending:
+                    future.result()
+            upload.complete_upload()
+        except Exception:
+            logger.warning(
+                "Cancelling multipart upload of {filepath}",
+                extra={"filepath": path})
+            upload.cancel_upload()
+            raise
+
     def path_exists(self, path):
         return bool(self.bucket.get_key(path))
 
-    def get_signed_url(self, path, expires_in=30):
+    def get_signed_url(self, path, expires_in=30, check_exists=True, cache=False):
         """Create a signed S3 document URL
 
         :param path: S3 object path within the bucket
         :param expires_in: how long the generated URL is valid
                            for, in seconds
+        :param check_exists: check the object exists first, with a request to S3. If ``False``,
+                             the URL is signed without any requests, whether or not the object exists.
+        :param cache: reuse a URL signed earlier for the same path, see ``get_cached_signed_url``
 
         :return: signed URL or ``None`` if object was not found
 
         """
+        if check_exists and not self.bucket.get_key(path):
+            return None
 
-        key = self.bucket.get_key(path)
-        if key:
-            return key.generate_url(expires_in)
+        if not cache:
+            return self.bucket.new_key(path).generate_url(expires_in)
+
+        return get_cached_signed_url(
+            (self.bucket_name, path), expires_in,
+            lambda: self.bucket.new_key(path).generate_url(expires_in)
+        )
+
+    def get_signed_urls(self, paths, expires_in=30, check_exists=False, cache=False, max_concurrency=10):
+        """Create signed S3 document URLs for several paths
+
+        Takes the same arguments as ``get_signed_url``, but doesn't check objects exist by default.
+        Existence checks are made up to ``max_concurrency`` at a time.
+
+        :return: dict of path to signed URL, or ``None`` if the object was not found
+        """
+        paths = list(paths)
+        if not check_exists or not paths:
+            return dict((path, self.get_signed_url(path, expires_in, False, cache)) for path in paths)
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(paths))) as executor:
+            urls = executor.map(lambda path: self.get_signed_url(path, expires_in, True, cache), paths)
+            return dict(zip(paths, urls))
 
     def get_key(self, path):
         key = self.bucket.get_key(path)
@@ -102,7 +356,82 @@ class S3(object):
         self._move_existing(path, None)
         self.bucket.delete_key(path)
 
-    def list(self, prefix='', delimiter='', load_timestamps=False):
+    def delete_keys(self, paths, move_prefix=None, archive=True, max_concurrency=10):
+        """Delete several files, moving each out of the way first as ``delete_key`` does
+
+        Files are copied to their archive paths up to ``max_concurrency`` at a time, then
+        deleted with multi-object delete requests of up to ``MULTI_DELETE_MAX_KEYS`` keys.
+        A file that fails to archive is not deleted.
+
+        :param paths:       locations in S3 bucket of the files to delete
+        :param move_prefix: Prefix to give to the archived files, the current time by default
+        :param archive:     Move files out of the way before deleting them
+
+        :return: dict of ``keys``, a list of {'path', 'archive_path', 'deleted', 'error'} for each
+                 path in order, and a ``summary`` of the results (see ``bulk_summary``)
+        """
+        start = monotonic()
+        paths = list(paths)
+        if archive:
+            results = self._archive_keys(paths, move_prefix, max_concurrency)
+        else:
+            results = [{'path': path, 'archive_path': None, 'error': None} for path in paths]
+
+        for result in results:
+            result['deleted'] = False
+        deletable = [result for result in results if result['error'] is None]
+        for i in range(0, len(deletable), MULTI_DELETE_MAX_KEYS):
+            self._delete_chunk(deletable[i:i + MULTI_DELETE_MAX_KEYS])
+
+        return bulk_summary('Deleted', self.bucket_name, results, monotonic() - start)
+
+    def archive_keys(self, paths, move_prefix=None, max_concurrency=10):
+        """Copy several files to their archive paths, as ``save`` does before overwriting a file
+
+        Copies are made in S3, up to ``max_concurrency`` at a time. Files that don't exist are skipped.
+
+        :param paths:       locations in S3 bucket of the files to archive
+        :param move_prefix: Prefix to give to the archived files, the current time by default
+
+        :return: dict of ``keys``, a list of {'path', 'archive_path', 'error'} for each path in order,
+                 with an ``archive_path`` of ``None`` for files that don't exist, and a ``summary``
+                 of the results (see ``bulk_summary``)
+        """
+        start = monotonic()
+        results = self._archive_keys(list(paths), move_prefix, max_concurrency)
+
+        return bulk_summary('Archived', self.bucket_name, results, monotonic() - start)
+
+    def _archive_keys(self, paths, move_prefix, max_concurrency):
+        if not paths:
+            return []
+        if move_prefix is None:
+            move_prefix = default_move_prefix()
+
+        def archive(path):
+            try:
+                return {'path': path, 'archive_path': self._copy_existing(path, move_prefix), 'error': None}
+            except (S3ResponseError, IOError) as e:
+                return {'path': path, 'archive_path': None, 'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(paths))) as executor:
+            return list(executor.map(archive, paths))
+
+    def _delete_chunk(self, results):
+        try:
+            response = self.bucket.delete_keys([result['path'] for result in results], quiet=True)
+        except (S3ResponseError, IOError) as e:
+            for result in results:
+                result['error'] = str(e)
+            return
+
+        # Only keys that failed to delete are listed in quiet mode.
+        errors = dict((error.key, '{}: {}'.format(error.code, error.message)) for error in response.errors)
+        for result in results:
+            result['error'] = errors.get(result['path'])
+            result['deleted'] = result['error'] is None
+
+    def list(self, prefix='', delimiter='', load_timestamps=False, max_concurrency=10):
         """
         return a list of file keys (ordered by last_modified date) from an s3 bucket
 
@@ -111,15 +440,102 @@ class S3(object):
         :param delimiter:      filter out files whose names contain the delimiter
         :param load_timestamp: by default custom timestamps are not loaded as they require an extra API call.
                                If you need to show the timestamp set this to True.
+        :param max_concurrency: custom timestamps not already cached are loaded this many at a time
         :return: list
         """
+        return sorted(
+            self.iter_list(prefix, delimiter, load_timestamps, max_concurrency),
+            key=lambda key: key['last_modified']
+        )
+
+    def iter_list(self, prefix='', delimiter='', load_timestamps=False, max_concurrency=10, page_size=1000):
+        """
+        yield file keys from an s3 bucket as they are listed, in key name order
+
+        Takes the same arguments as ``list``. Keys are listed a page at a time, so only a page of
+        keys is held in memory at once.
+
+        :param page_size: keys whose custom timestamps are loaded together, at most 1000 (one page
+                          of S3 listing results)
+        """
         # http://boto.readthedocs.org/en/latest/ref/s3.html#boto.s3.bucket.Bucket.list
-        list_of_keys = self.bucket.list(prefix, delimiter)
-        return sorted([
-            self._format_key(key, load_timestamps)
-            for key in list_of_keys
+        # lists keys lazily, requesting the next page of results once the previous one runs out.
+        keys = (
+            key for key in self.bucket.list(prefix, delimiter)
             if not (key.size == 0 and key.name[-1] == '/')
-        ], key=lambda key: key['last_modified'])
+        )
+        if not load_timestamps:
+            for key in keys:
+                yield self._format_key(key, False)
+            return
+
+        page = []
+        for key in keys:
+            page.append(key)
+            if len(page) == page_size:
+                for formatted in self._format_page(page, max_concurrency):
+                    yield formatted
+                page = []
+        for formatted in self._format_page(page, max_concurrency):
+            yield formatted
+
+    def newest(self, n, prefix='', delimiter='', load_timestamps=False, max_concurrency=10):
+        """
+        return the ``n`` most recently modified file keys, newest first
+
+        Only ``n`` keys are kept in memory while the bucket is listed, rather than sorting all of them.
+        Takes the same arguments as ``list``.
+        """
+        return heapq.nlargest(
+            n, self.iter_list(prefix, delimiter, load_timestamps, max_concurrency),
+            key=lambda key: key['last_modified']
+        )
+
+    def oldest(self, n, prefix='', delimiter='', load_timestamps=False, max_concurrency=10):
+        """
+        return the ``n`` least recently modified file keys, oldest first
+
+        Only ``n`` keys are kept in memory while the bucket is listed, rather than sorting all of them.
+        Takes the same arguments as ``list``.
+        """
+        return heapq.nsmallest(
+            n, self.iter_list(prefix, delimiter, load_timestamps, max_concurrency),
+            key=lambda key: key['last_modified']
+        )
+
+    def _format_page(self, keys, max_concurrency):
+        timestamps = self._load_timestamps(keys, max_concurrency)
+        return [self._format_key(key, False, timestamp) for key, timestamp in zip(keys, timestamps)]
+
+    def _load_timestamps(self, keys, max_concurrency):
+        """Custom timestamps of ``keys``, from the cache or fetched in parallel, in the same order."""
+        cache_keys = [(self.bucket_name, key.name, getattr(key, 'etag', None)) for key in keys]
+        timestamps = [None] * len(keys)
+        missing = []
+        for i, cache_key in enumerate(cache_keys):
+            # Without an etag there is no telling whether the object has changed.
+            hit, timestamp = timestamp_cache.lookup(cache_key) if cache_key[2] else (False, None)
+            if hit:
+                timestamps[i] = timestamp
+            else:
+                missing.append(i)
+
+        if not missing:
+            return timestamps
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(missing))) as executor:
+            loaded = executor.map(self._get_timestamp, [keys[i].name for i in missing])
+            for i, timestamp in zip(missing, loaded):
+                timestamps[i] = timestamp
+                if cache_keys[i][2]:
+                    timestamp_cache.set(cache_keys[i], timestamp)
+
+        return timestamps
+
+    def _get_timestamp(self, path):
+        key = self.bucket.get_key(path)
+        if key:
+            return key.get_metadata('timestamp')
 
     def _format_key(self, key, load_timestamps, timestamp=None):
         """
@@ -136,13 +552,12 @@ class S3(object):
             timestamp = key.get_metadata('timestamp')
 
         timestamp = timestamp or key.last_modified
-        timestamp = parse_time(timestamp)
 
         return {
             'path': key.name,
             'filename': filename,
             'ext': ext[1:],
-            'last_modified': timestamp.strftime(DATETIME_FORMAT),
+            'last_modified': format_timestamp(timestamp),
             'size': key.size
         }
 
@@ -151,12 +566,30 @@ class S3(object):
             move_prefix = default_move_prefix()
 
         if self.bucket.get_key(existing_path):
-            path, name = os.path.split(existing_path)
             self.bucket.copy_key(
-                os.path.join(path, '{}-{}'.format(move_prefix, name)),
+                archive_path(existing_path, move_prefix),
+                self.bucket_name,
+                existing_path
+            )
+
+    def _copy_existing(self, existing_path, move_prefix=None):
+        # Same as _move_existing in one request, by copying without checking the file exists first.
+        # Returns the path the file was copied to, or None if it doesn't exist.
+        if move_prefix is None:
+            move_prefix = default_move_prefix()
+
+        new_path = archive_path(existing_path, move_prefix)
+        try:
+            self.bucket.copy_key(
+                new_path,
                 self.bucket_name,
                 existing_path
             )
+        except S3ResponseError as e:
+            if e.status != 404:
+                raise
+            return None
+        return new_path
 
     def _get_mimetype(self, filename):
         mimetype, _ = mimetypes.guess_type(filename)
@@ -170,5 +603,94 @@ def get_file_size_up_to_maximum(file_contents):
     return size
 
 
+def bulk_summary(action, bucket_name, results, seconds):
+    """Summarise the per-key ``results`` of a bulk operation that took ``seconds``, and log it.
+
+    :return: dict of ``keys``, the ``results``, and a ``summary`` dict of the number of keys,
+             how many ``succeeded`` and ``failed``, the ``seconds`` taken and ``keys_per_second``
+    """
+    failed = sum(1 for result in results if result['error'] is not None)
+    summary = {
+        'keys': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'seconds': seconds,
+        'keys_per_second': len(results) / seconds if seconds else None,
+    }
+    logger.info(
+        "{action} {succeeded} of {keys} keys in {bucket} in {seconds:.3f}s",
+        extra=dict(summary, action=action, bucket=bucket_name))
+
+    return {'keys': results, 'summary': summary}
+
+
+def get_cached_signed_url(cache_key, expires_in, sign):
+    """Return a URL signed by ``sign()``, reusing one signed earlier for ``cache_key`` while it is still valid.
+
+    A cached URL is only reused while it is valid for at least half of ``expires_in``, so
+    anyone given a URL has at least that long to use it.
+    """
+    cache_key = cache_key + (expires_in,)
+    now = time.time()
+    hit, cached = signed_url_cache.lookup(cache_key)
+    if hit and cached[1] - now >= expires_in / 2.0:
+        return cached[0]
+
+    url = sign()
+    if url is not None:
+        signed_url_cache.set(cache_key, (url, now + expires_in))
+    return url
+
+
+def format_timestamp(timestamp):
+    """Reformat an S3 timestamp string in ``DATETIME_FORMAT``.
+
+    Timestamps in the formats S3 returns are reformatted directly; anything else is parsed
+    with dateutil. Time zones are ignored either way.
+    """
+    match = ISO_TIMESTAMP_PATTERN.match(timestamp)
+    if match:
+        year, month, day, hour, minute, second, fraction = match.groups()
+    else:
+        match = RFC1123_TIMESTAMP_PATTERN.match(timestamp)
+        if match is None or match.group(2) not in MONTHS:
+            return parse_time(timestamp).strftime(DATETIME_FORMAT)
+        day, month, year, hour, minute, second = match.groups()
+        month = MONTHS[month]
+        fraction = None
+
+    # Raises ValueError for dates that don't exist, as dateutil would.
+    datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+
+    return '{}-{}-{}T{}:{}:{}.{}Z'.format(
+        year, month, day, hour, minute, second, (fraction or '').ljust(6, '0'))
+
+
+def get_file_size(file):
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+
+    return size
+
+
+def _upload_part(upload, data, part_number, retries):
+    for attempt in range(retries + 1):
+        try:
+            return upload.upload_part_from_file(BytesIO(data), part_number, size=len(data))
+        except (S3ResponseError, IOError) as e:
+            if attempt == retries or (isinstance(e, S3ResponseError) and e.status < 500):
+                raise
+            logger.warning(
+                "Retrying part {part_number} of multipart upload: {error}",
+                extra={"part_number": part_number, "error": e})
+
+
 def default_move_prefix():
     return datetime.datetime.utcnow().isoformat()
+
+
+def archive_path(path, move_prefix):
+    """Path an existing file at ``path`` is moved to when it is overwritten."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, '{}-{}'.format(move_prefix, name))
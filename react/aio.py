@@ -0,0 +1,278 @@
+"""Render React components from asyncio code.
+
+Python 3.5+ only, and needs aiohttp. Renders go through ``AsyncRenderServer``, which shares
+its cache, circuit breaker, render server pool, bundle manifest and stats with a ``RenderServer``,
+so sync and async views of the same app see the same renders.
+
+``AsyncRenderServer`` doesn't use Flask's request context: each render is given the page's
+location and the visitor's csrf token, and the config comes from its ``RenderServer``. The
+``render_component_async`` functions take them from the current Flask request.
+"""
+import asyncio
+import json
+import weakref
+from contextlib import contextmanager
+
+import aiohttp
+from flask import request
+from dmutils.csrf import get_csrf_token
+from monotonic import monotonic
+
+from .exceptions import RenderServerError
+from .instrumentation import RenderTiming
+from .render_server import (
+    FORMATS_HEADER, RAW_PROPS_FORMAT, RenderedComponent, RenderServer, render_server,
+    _CircuitOpen, _compress, _is_failure, _render_args, _with_csrf_token,
+)
+
+
+class AsyncRenderServer(object):
+    """Renders through ``renderer``, or else a ``RenderServer`` with ``config``, or else ``render_server``."""
+
+    def __init__(self, renderer=None, config=None):
+        if renderer is None:
+            renderer = render_server if config is None else RenderServer(config=config)
+        self.renderer = renderer
+        # An aiohttp session only works on the event loop it was created on, so each loop
+        # has its own, kept until it is closed or the loop goes away.
+        self._sessions = weakref.WeakKeyDictionary()
+
+    @property
+    def session(self):
+        """aiohttp session for the running event loop, keeping ``REACT_RENDER_POOL_SIZE`` connections (default 10)."""
+        loop = asyncio.get_event_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            pool_size = self.renderer.config.get('REACT_RENDER_POOL_SIZE', 10)
+            session = self._sessions[loop] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size),
+                # The session is shared between every user of the app, see _BlockAllCookies.
+                cookie_jar=aiohttp.DummyCookieJar(),
+            )
+        return session
+
+    async def close(self):
+        """Close the running event loop's pooled connections. A new session is created on the next render."""
+        session = self._sessions.pop(asyncio.get_event_loop(), None)
+        if session is not None:
+            await session.close()
+
+    async def render(self, path, props=None, to_static_markup=False, request_headers=None, location='/',
+                     csrf_token=''):
+        """Render a component, as ``RenderServer.render`` does.
+
+        :param location: path of the page the component is rendered on, passed to it as ``_serverContext``
+        :param csrf_token: the visitor's csrf token, filled in to the component's ``form_options``
+        """
+        with self._timed(path) as timing:
+            with self._timing_of(timing):
+                serialized_props = self.renderer._serialize_props(
+                    props, location, csrf_token, shared=self.renderer.cache is not None)
+
+            if not self.renderer.config.get('REACT_RENDER', ''):
+                return _with_csrf_token(RenderedComponent('', serialized_props), csrf_token)
+
+            rendered = await self._render_serialized(path, serialized_props, to_static_markup, request_headers, timing)
+
+        return _with_csrf_token(rendered, csrf_token)
+
+    async def render_many(self, renders, request_headers=None, location='/', csrf_token=''):
+        """Render several components concurrently, as ``RenderServer.render_many`` does.
+
+        A component that fails to render is returned without markup, so that it is
+        rendered client-side, and the error is logged.
+        """
+        renders = [_render_args(args) for args in renders]
+        shared = self.renderer.cache is not None
+        serialized = [(path, self.renderer._serialize_props(props, location, csrf_token, shared), to_static_markup)
+                      for path, props, to_static_markup in renders]
+
+        if not self.renderer.config.get('REACT_RENDER', ''):
+            return [_with_csrf_token(RenderedComponent('', serialized_props), csrf_token)
+                    for _, serialized_props, _ in serialized]
+
+        rendered = await asyncio.gather(*[
+            self._render_isolated(path, serialized_props, to_static_markup, request_headers)
+            for path, serialized_props, to_static_markup in serialized
+        ])
+
+        return [_with_csrf_token(component, csrf_token) for component in rendered]
+
+    async def _render_isolated(self, path, serialized_props, to_static_markup, request_headers):
+        with self._timed(path) as timing:
+            if timing is not None:
+                timing.props_bytes = len(serialized_props)
+            try:
+                return await self._render_serialized(path, serialized_props, to_static_markup, request_headers, timing)
+            except Exception as e:
+                with self._timing_of(timing):
+                    return self.renderer._render_failed(path, serialized_props, e)
+
+    async def _render_serialized(self, path, serialized_props, to_static_markup, request_headers, timing):
+        renderer = self.renderer
+        with self._timing_of(timing):
+            encode_options, options_hash = renderer._serialize_options(path, serialized_props, to_static_markup)
+
+        cache = renderer.cache
+        if cache is not None:
+            cached = cache.get(path, options_hash)
+            if cached is not None:
+                if timing is not None:
+                    timing.cached = True
+                return cached
+
+        try:
+            obj = await self._post(encode_options, {'hash': options_hash}, request_headers, timing)
+        except _CircuitOpen:
+            with self._timing_of(timing):
+                return renderer._fallback(serialized_props)
+
+        with self._timing_of(timing):
+            rendered = renderer._load(obj, serialized_props)
+
+        if cache is not None:
+            cache.set(path, options_hash, rendered)
+        return rendered
+
+    async def _post(self, encode_data, params, request_headers, timing):
+        renderer = self.renderer
+        breaker = renderer.breaker
+        if breaker is not None and not breaker.allow():
+            raise _CircuitOpen()
+
+        endpoints = renderer.endpoints
+        endpoint = endpoints.acquire() if endpoints is not None else None
+        url = endpoint.url if endpoint is not None else renderer.url
+
+        start = monotonic()
+        error = None
+        try:
+            return await self._send(url, encode_data, params, request_headers, timing)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Always released and recorded, so the endpoint's outstanding renders and the
+            # breaker stay right whatever went wrong.
+            if isinstance(error, asyncio.CancelledError):
+                # The caller gave up, for example on a disconnect or its own deadline, which
+                # says nothing about the render server. A trial render still ends.
+                if endpoint is not None:
+                    endpoints.cancel(endpoint)
+                if breaker is not None:
+                    breaker.record_cancelled()
+            else:
+                self._record(url, endpoint, monotonic() - start, error)
+
+    def _record(self, url, endpoint, elapsed, error):
+        renderer = self.renderer
+        endpoints = renderer.endpoints
+        breaker = renderer.breaker
+        failed = error is not None and _is_failure(error)
+        if endpoint is not None and endpoints.release(endpoint, elapsed, failed=failed):
+            renderer.logger.warning(
+                'Render server at {url} is failing, not using it for {cooldown}s: {error}',
+                extra={'url': url, 'cooldown': endpoints.cooldown, 'error': error})
+        if breaker is not None:
+            if not failed:
+                breaker.record_success()
+            elif breaker.record_failure():
+                renderer.logger.warning(
+                    'Render server at {url} is failing, rendering client-side for {reset_timeout}s: {error}',
+                    extra={'url': url, 'reset_timeout': breaker.reset_timeout, 'error': error})
+
+    async def _send(self, url, encode_data, params, request_headers, timing):
+        all_request_headers = {'content-type': 'application/json'}
+        if request_headers is not None:
+            all_request_headers.update(request_headers)
+
+        raw_props_urls = self.renderer._raw_props_urls
+        data = encode_data(url in raw_props_urls).encode('utf-8')
+
+        config = self.renderer.config
+        encoding = config.get('REACT_RENDER_COMPRESSION')
+        if encoding and len(data) >= config.get('REACT_RENDER_COMPRESSION_THRESHOLD', 1024):
+            data = _compress(data, encoding, config.get('REACT_RENDER_COMPRESSION_LEVEL', 6))
+            all_request_headers['content-encoding'] = encoding
+
+        connect_timeout, read_timeout = self.renderer.timeout
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+        start = monotonic()
+        try:
+            async with self.session.post(
+                url, data=data, headers=all_request_headers, params=params, timeout=timeout
+            ) as res:
+                body = await res.text()
+        except asyncio.TimeoutError:
+            raise RenderServerError('Timed out waiting for render server at {}'.format(url))
+        except aiohttp.ClientError:
+            raise RenderServerError('Could not connect to render server at {}'.format(url))
+
+        if res.status != 200:
+            raise RenderServerError(
+                'Unexpected response from render server at {} - {}: {}'.format(url, res.status, body),
+                status_code=res.status
+            )
+
+        if RAW_PROPS_FORMAT in res.headers.get(FORMATS_HEADER, ''):
+            raw_props_urls.add(url)
+        else:
+            raw_props_urls.discard(url)
+
+        received = monotonic()
+        try:
+            obj = json.loads(body)
+        except ValueError:
+            raise RenderServerError('Render server at {} returned invalid JSON: {}'.format(url, body[:200]))
+        if timing is not None:
+            timing.network += received - start
+            timing.parse += monotonic() - received
+        return obj
+
+    @contextmanager
+    def _timed(self, path):
+        # RenderServer._timed keeps the timing in a thread local, which coroutines on the
+        # same thread would share, so each render's timing is passed around instead.
+        renderer = self.renderer
+        stats = renderer.stats
+        if stats is None:
+            yield None
+            return
+
+        timing = RenderTiming(path)
+        try:
+            yield timing
+        except Exception:
+            timing.error = True
+            raise
+        finally:
+            timing.finish()
+            stats.record(timing)
+            renderer._publish_stats(stats)
+
+    @contextmanager
+    def _timing_of(self, timing):
+        # Lets the RenderServer methods record into this render's timing. Only wraps
+        # code that doesn't await, so no other render can run in between.
+        self.renderer._local.timing = timing
+        try:
+            yield
+        finally:
+            self.renderer._local.timing = None
+
+
+async_render_server = AsyncRenderServer()
+
+
+async def render_component_async(path, props=None, to_static_markup=False, renderer=async_render_server,
+                                 request_headers=None):
+    """Render a component for the current Flask request."""
+    return await renderer.render(
+        path, props, to_static_markup, request_headers, location=request.path, csrf_token=get_csrf_token())
+
+
+async def render_component_many_async(renders, renderer=async_render_server, request_headers=None):
+    """Render several components for the current Flask request."""
+    return await renderer.render_many(
+        renders, request_headers, location=request.path, csrf_token=get_csrf_token())
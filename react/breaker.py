@@ -0,0 +1,89 @@
+import threading
+
+from monotonic import monotonic
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(object):
+    """Stops calls to a failing service until it has had time to recover.
+
+    The breaker opens after ``failure_threshold`` consecutive failures. While
+    open, ``allow()`` returns ``False`` until ``reset_timeout`` seconds have
+    passed; then a single trial call is allowed through. If it succeeds the
+    breaker closes, otherwise it opens again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+
+            if self._state == OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+
+            if self._state == HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._trial_in_progress = False
+            self.failures = 0
+
+    def record_cancelled(self):
+        """Record a call given up on by the caller, which says nothing about the service.
+
+        Ends a trial call, so that the next call can be a trial.
+        """
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        """Record a failed call. Returns ``True`` if this failure opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+
+            if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = monotonic()
+                self.trips += 1
+                return True
+            return False
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'failures': self.failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,147 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from monotonic import monotonic
+
+
+class RenderCache(object):
+    """Cache of rendered components, keyed by path and the render options hash.
+
+    Entries live in an in-process LRU tier bounded by ``max_size`` and ``ttl``
+    (seconds). If ``max_stale`` is set, expired entries are kept for that many
+    more seconds, and ``lookup`` returns them flagged as stale so that they can
+    be served while they are refreshed. If ``shared_cache`` is given (anything with Flask-Cache's ``get``,
+    ``set`` and ``delete``), it is used as a second tier shared between processes.
+
+    ``invalidate(path)`` drops every entry for a path from the local tier and
+    moves the path to a new generation in the shared tier, so other processes
+    stop seeing old shared entries straight away and old local entries within
+    ``ttl``.
+    """
+
+    def __init__(self, max_size=1000, ttl=300, shared_cache=None, shared_ttl=None, max_stale=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.shared_cache = shared_cache
+        self.shared_ttl = shared_ttl if shared_ttl is not None else ttl
+
+        self._entries = OrderedDict()
+        self._paths = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, options_hash):
+        """Return the cached ``RenderedComponent`` for a render, or ``None``."""
+        component, stale = self.lookup(path, options_hash, allow_stale=False)
+        return component
+
+    def lookup(self, path, options_hash, allow_stale=True):
+        """Return ``(component, stale)`` for a render, or ``(None, False)`` if it isn't cached."""
+        with self._lock:
+            entry = self._entries.pop(options_hash, None)
+            if entry is not None:
+                now = monotonic()
+                if entry[0] > now:
+                    # Re-insert to mark as most recently used.
+                    self._entries[options_hash] = entry
+                    self.hits += 1
+                    return entry[2], False
+                if entry[0] + self.max_stale > now:
+                    self._entries[options_hash] = entry
+                    if allow_stale:
+                        self.stale_hits += 1
+                        return entry[2], True
+                else:
+                    self._forget(entry[1], options_hash)
+
+        component = self._get_shared(path, options_hash)
+        with self._lock:
+            if component is None:
+                self.misses += 1
+                return None, False
+            self.shared_hits += 1
+            self._store(path, options_hash, component)
+        return component, False
+
+    def set(self, path, options_hash, component):
+        with self._lock:
+            self._store(path, options_hash, component)
+        self._set_shared(path, options_hash, component)
+
+    def invalidate(self, path):
+        with self._lock:
+            for options_hash in self._paths.pop(path, ()):
+                self._entries.pop(options_hash, None)
+        if self.shared_cache is not None:
+            self.shared_cache.set(self._generation_key(path), uuid.uuid4().hex, timeout=0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _store(self, path, options_hash, component):
+        self._entries.pop(options_hash, None)
+        self._entries[options_hash] = (monotonic() + self.ttl, path, component)
+        self._paths.setdefault(path, set()).add(options_hash)
+
+        while len(self._entries) > self.max_size:
+            oldest_hash, (_, oldest_path, _) = self._entries.popitem(last=False)
+            self._forget(oldest_path, oldest_hash, evicted=True)
+
+    def _forget(self, path, options_hash, evicted=False):
+        hashes = self._paths.get(path)
+        if hashes is not None:
+            hashes.discard(options_hash)
+            if not hashes:
+                del self._paths[path]
+        if evicted:
+            self.evictions += 1
+
+    def _generation_key(self, path):
+        return 'react-render-generation:{}'.format(path)
+
+    def _shared_key(self, path, options_hash):
+        generation = self.shared_cache.get(self._generation_key(path)) or '0'
+        return 'react-render:{}:{}:{}'.format(path, generation, options_hash)
+
+    def _get_shared(self, path, options_hash):
+        if self.shared_cache is None:
+            return None
+
+        value = self.shared_cache.get(self._shared_key(path, options_hash))
+        if value is None:
+            return None
+
+        # Imported here because render_server imports this module.
+        from .render_server import RenderedComponent
+        return RenderedComponent(value['markup'], value['props'], value['slug'], value['files'])
+
+    def _set_shared(self, path, options_hash, component):
+        if self.shared_cache is None:
+            return
+
+        self.shared_cache.set(self._shared_key(path, options_hash), {
+            'markup': component.markup,
+            'props': component.props,
+            'slug': component.slug,
+            'files': component.files,
+        }, timeout=self.shared_ttl)
@@ -0,0 +1,66 @@
+import sys
+import threading
+
+import six
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Shares one call between concurrent callers asking for the same key.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and get the same result, or the same exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException:
+                # Including exceptions such as SystemExit or gevent timeouts, so waiters
+                # never go on without a result.
+                call.exc_info = sys.exc_info()
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.exc_info is not None:
+            six.reraise(*call.exc_info)
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'waiting': sum(call.waiters for call in self._calls.values()),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,174 @@
+import errno
+import json
+import os
+import tempfile
+import threading
+
+from monotonic import monotonic
+
+
+class DiskRenderCache(object):
+    """Cache of static markup renders on disk, shareable between processes.
+
+    Each render is a JSON file named after its key. Files are written to a
+    temporary file and renamed into place, so readers never see a partial
+    render. Reads touch the file's modification time, and once the cache grows
+    past ``max_bytes`` the least recently used files are removed until it is
+    back under ``low_water`` of that size. Only one thread evicts at a time, and
+    other threads carry on reading and writing while it does.
+
+    Each process keeps a running total of the size of the files it writes, and
+    only counts the files other processes write when it re-reads the directory
+    size, every ``rescan_interval`` seconds. Until then, the processes sharing
+    the directory can take it past ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=100 * 1024 * 1024, low_water=0.9, rescan_interval=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.rescan_interval = rescan_interval
+
+        self._size = None
+        self._scanned_at = None
+        self._evicting = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return ``(markup, slug, files)`` for a render, or ``None``."""
+        filename = self._filename(key)
+        try:
+            with open(filename) as f:
+                value = json.load(f)
+            os.utime(filename, None)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value['markup'], value['slug'], value['files']
+
+    def set(self, key, markup, slug, files, path=None):
+        """Store a render, of the component at ``path`` if given, see ``invalidate``."""
+        filename = self._filename(key)
+        directory = os.path.dirname(filename)
+        _makedirs(directory)
+
+        fd, temp_filename = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            value = {'markup': markup, 'slug': slug, 'files': files}
+            if path is not None:
+                value['path'] = path
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            size = os.path.getsize(temp_filename)
+            replaced = _size(filename)
+            os.rename(temp_filename, filename)
+        except Exception:
+            os.remove(temp_filename)
+            raise
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size - replaced
+            rescan = self._size is None or monotonic() - self._scanned_at >= self.rescan_interval
+            if self._evicting or not (rescan or self._size > self.max_bytes):
+                return
+            self._evicting = True
+            size_before = self._size or 0
+
+        size_after = None
+        try:
+            size_after = self._evict()
+        finally:
+            with self._lock:
+                self._evicting = False
+                if size_after is not None:
+                    # Keep what was written while evicting.
+                    self._size = size_after + (self._size or 0) - size_before
+                    self._scanned_at = monotonic()
+
+    def invalidate(self, path):
+        """Remove the renders of the component at ``path``. Reads every file, so is slow for large caches."""
+        removed = 0
+        for filename, _, _ in self._files():
+            try:
+                with open(filename) as f:
+                    value = json.load(f)
+            except (IOError, OSError, ValueError):
+                continue
+            if value.get('path') == path and _remove(filename):
+                removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            for filename, _, _ in self._files():
+                _remove(filename)
+            self._size = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key[:2], '{}.json'.format(key))
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                if not name.endswith('.json'):
+                    continue
+                filename = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                yield filename, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        # Other processes share the directory, so work from what is on disk.
+        files = sorted(self._files(), key=lambda file: file[1])
+        size = sum(file[2] for file in files)
+        if size <= self.max_bytes:
+            return size
+        target = self.max_bytes * self.low_water
+
+        for filename, _, file_size in files:
+            if size <= target:
+                break
+            if _remove(filename):
+                self.evictions += 1
+            size -= file_size
+
+        return size
+
+
+def _makedirs(directory):
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _size(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,96 @@
+import threading
+
+from monotonic import monotonic
+
+
+class Endpoint(object):
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = None
+
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def is_ejected(self, now):
+        return self.ejected_until is not None and self.ejected_until > now
+
+    def stats(self, now):
+        return {
+            'url': self.url,
+            'outstanding': self.outstanding,
+            'ejected': self.is_ejected(now),
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejections': self.ejections,
+            'mean_latency': self.total_latency / self.requests if self.requests else None,
+            'max_latency': self.max_latency,
+        }
+
+
+class EndpointPool(object):
+    """Spreads requests over several endpoints of the same service.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    progress. An endpoint that fails ``max_failures`` times in a row is
+    ejected for ``cooldown`` seconds. If every endpoint is ejected, the one
+    that has been ejected the longest is used anyway, so requests keep
+    probing for a recovered endpoint.
+    """
+
+    def __init__(self, urls, max_failures=3, cooldown=30):
+        if not urls:
+            raise ValueError('At least one endpoint is required')
+
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Pick an endpoint for a request. Must be followed by ``release``."""
+        with self._lock:
+            now = monotonic()
+            healthy = [endpoint for endpoint in self.endpoints if not endpoint.is_ejected(now)]
+            if healthy:
+                endpoint = min(healthy, key=lambda endpoint: endpoint.outstanding)
+            else:
+                endpoint = min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+
+            endpoint.outstanding += 1
+            return endpoint
+
+    def cancel(self, endpoint):
+        """Release ``endpoint`` after a request the caller gave up on, without recording an outcome."""
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def release(self, endpoint, elapsed, failed=False):
+        """Record the outcome of a request to ``endpoint`` that took ``elapsed`` seconds."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.requests += 1
+            endpoint.total_latency += elapsed
+            endpoint.max_latency = max(endpoint.max_latency, elapsed)
+
+            if not failed:
+                endpoint.consecutive_failures = 0
+                endpoint.ejected_until = None
+                return False
+
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.max_failures:
+                endpoint.ejected_until = monotonic() + self.cooldown
+                endpoint.ejections += 1
+                return True
+            return False
+
+    def stats(self):
+        with self._lock:
+            now = monotonic()
+            return [endpoint.stats(now) for endpoint in self.endpoints]
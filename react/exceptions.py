@@ -7,4 +7,6 @@ class ReactRenderingError(Exception):
 
 
 class RenderServerError(Exception):
-    pass
+    def __init__(self, message, status_code=None):
+        super(RenderServerError, self).__init__(message)
+        self.status_code = status_code
@@ -0,0 +1,235 @@
+import glob
+import json
+import os
+import threading
+import time
+
+from monotonic import monotonic
+
+# Upper bounds of the render time histogram buckets, in seconds.
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float('inf'))
+
+TIMINGS = ('serialize', 'network', 'parse', 'total')
+SIZES = ('props_bytes', 'markup_bytes')
+COUNTS = ('renders', 'errors', 'fallbacks', 'cached')
+
+
+class Distribution(object):
+    def __init__(self, count=0, total=0, minimum=None, maximum=None, buckets=None):
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        self.buckets = buckets
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        if self.buckets is not None:
+            for i, bound in enumerate(TIME_BUCKETS):
+                if value <= bound:
+                    self.buckets[i] += 1
+                    break
+
+    def merge(self, other):
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                self.minimum = value if self.minimum is None else min(self.minimum, value)
+                self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.count += other.count
+        self.total += other.total
+        if self.buckets is not None and other.buckets is not None:
+            self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def to_dict(self):
+        data = {
+            'count': self.count,
+            'total': self.total,
+            'mean': float(self.total) / self.count if self.count else None,
+            'min': self.minimum,
+            'max': self.maximum,
+        }
+        if self.buckets is not None:
+            data['buckets'] = self.buckets
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['total'], data['min'], data['max'], data.get('buckets'))
+
+
+class PathStats(object):
+    def __init__(self):
+        self.counts = dict((name, 0) for name in COUNTS)
+        self.timings = dict((name, Distribution(buckets=[0] * len(TIME_BUCKETS))) for name in TIMINGS)
+        self.sizes = dict((name, Distribution()) for name in SIZES)
+
+    def add(self, timing):
+        self.counts['renders'] += 1
+        self.counts['errors'] += timing.error
+        self.counts['fallbacks'] += timing.fallback
+        self.counts['cached'] += timing.cached
+
+        for name in TIMINGS:
+            self.timings[name].add(getattr(timing, name))
+        for name in SIZES:
+            self.sizes[name].add(getattr(timing, name))
+
+    def merge(self, other):
+        for name in COUNTS:
+            self.counts[name] += other.counts[name]
+        for name in TIMINGS:
+            self.timings[name].merge(other.timings[name])
+        for name in SIZES:
+            self.sizes[name].merge(other.sizes[name])
+
+    def to_dict(self):
+        data = dict(self.counts)
+        data.update((name, self.timings[name].to_dict()) for name in TIMINGS)
+        data.update((name, self.sizes[name].to_dict()) for name in SIZES)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.counts = dict((name, data[name]) for name in COUNTS)
+        stats.timings = dict((name, Distribution.from_dict(data[name])) for name in TIMINGS)
+        stats.sizes = dict((name, Distribution.from_dict(data[name])) for name in SIZES)
+        return stats
+
+
+class RenderTiming(object):
+    """Where the time went in rendering one component, in seconds."""
+
+    def __init__(self, path, start=None):
+        self.path = path
+        self.start = monotonic() if start is None else start
+        self.serialize = 0
+        self.network = 0
+        self.parse = 0
+        self.total = 0
+        self.props_bytes = 0
+        self.markup_bytes = 0
+        self.error = False
+        self.fallback = False
+        self.cached = False
+
+    def finish(self):
+        self.total = monotonic() - self.start
+
+
+class RenderStats(object):
+    """Render timings, sizes and outcomes per component path.
+
+    Keeps a summary since the process started, plus the renders since the
+    last ``publish`` for sending to CloudWatch.
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self._unpublished = {}
+        self._last_published = monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, timing):
+        with self._lock:
+            for paths in (self._paths, self._unpublished):
+                if timing.path not in paths:
+                    paths[timing.path] = PathStats()
+                paths[timing.path].add(timing)
+
+    def summary(self):
+        with self._lock:
+            return dict((path, stats.to_dict()) for path, stats in self._paths.items())
+
+    def due(self, interval):
+        """Whether it has been ``interval`` seconds since the last publish."""
+        return monotonic() - self._last_published >= interval
+
+    def publish(self, metrics_client=None, summary_file=None):
+        """Send the renders since the last publish to CloudWatch and/or write the summary to a file.
+
+        :param metrics_client: a ``dmutils.metrics.CloudWatchClient``
+        :param summary_file: path to write this process's summary to, as JSON. The process id is
+                             appended, so each worker writes its own file; see ``load_summary``.
+        """
+        with self._lock:
+            unpublished, self._unpublished = self._unpublished, {}
+            self._last_published = monotonic()
+
+        if metrics_client is not None:
+            for path, stats in unpublished.items():
+                dimensions = {'component': path}
+                for name in COUNTS:
+                    metrics_client.put_count(
+                        'react.render.{}'.format(name), stats.counts[name], dimensions=dimensions)
+                for name, distribution, unit in (
+                    [(name, stats.timings[name], 'Seconds') for name in TIMINGS] +
+                    [(name, stats.sizes[name], 'Bytes') for name in SIZES]
+                ):
+                    metrics_client.put_statistics(
+                        'react.render.{}'.format(name),
+                        distribution.count, distribution.total, distribution.minimum, distribution.maximum,
+                        unit=unit, dimensions=dimensions)
+
+        if summary_file is not None:
+            filename = '{}.{}'.format(summary_file, os.getpid())
+            with open(filename + '.tmp', 'w') as f:
+                json.dump(self.summary(), f)
+            os.rename(filename + '.tmp', filename)
+
+
+def load_summary(summary_file, max_age=None):
+    """Merge the summaries written by ``RenderStats.publish`` from every process.
+
+    :param max_age: if set, summaries written longer than this many seconds ago are left out
+                    and removed, as they are from processes that have stopped. A process that
+                    hasn't rendered anything for that long is left out until it next publishes.
+    """
+    merged = {}
+    now = time.time()
+    for filename in glob.glob('{}.*[0-9]'.format(summary_file)):
+        try:
+            if max_age is not None and now - os.path.getmtime(filename) > max_age:
+                os.remove(filename)
+                continue
+            with open(filename) as f:
+                summary = json.load(f)
+        except (IOError, OSError, ValueError):
+            continue
+
+        for path, data in summary.items():
+            stats = PathStats.from_dict(data)
+            if path in merged:
+                merged[path].merge(stats)
+            else:
+                merged[path] = stats
+
+    return dict((path, stats.to_dict()) for path, stats in merged.items())
+
+
+def format_summary(summary, limit=20):
+    """Format a summary as a table, components taking the most total render time first."""
+    lines = ['{:40} {:>8} {:>7} {:>9} {:>10} {:>10} {:>10} {:>10} {:>10} {:>11} {:>12}'.format(
+        'component', 'renders', 'errors', 'fallbacks', 'cached', 'total s', 'mean ms', 'network ms', 'max ms',
+        'props B', 'markup B')]
+
+    by_total_time = sorted(summary.items(), key=lambda item: item[1]['total']['total'], reverse=True)
+    for path, stats in by_total_time[:limit]:
+        lines.append('{:40} {:>8} {:>7} {:>9} {:>10} {:>10.2f} {:>10.1f} {:>10.1f} {:>10.1f} {:>11.0f} {:>12.0f}'.format(
+            path,
+            stats['renders'],
+            stats['errors'],
+            stats['fallbacks'],
+            stats['cached'],
+            stats['total']['total'],
+            (stats['total']['mean'] or 0) * 1000,
+            (stats['network']['mean'] or 0) * 1000,
+            (stats['total']['max'] or 0) * 1000,
+            stats['props_bytes']['mean'] or 0,
+            stats['markup_bytes']['mean'] or 0,
+        ))
+
+    return '\n'.join(lines)
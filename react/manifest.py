@@ -0,0 +1,44 @@
+import threading
+
+
+class BundleManifest(object):
+    """Bundle file URLs of the render server's current build.
+
+    Every render response lists the files of the build that rendered it, but
+    they only change when a new build is deployed. The manifest keeps one copy
+    of the files and their URLs and hands the same objects to every rendered
+    component, building new ones only when a render reports different files
+    or the bundle URL changes.
+    """
+
+    def __init__(self):
+        self._current = ({}, None, {})
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, files, bundle_url):
+        """Return ``(files, urls)`` for the files listed by a render."""
+        current_files, current_bundle_url, current_urls = self._current
+        if files == current_files and bundle_url == current_bundle_url:
+            return current_files, current_urls
+
+        urls = bundle_urls(files, bundle_url)
+        with self._lock:
+            self._current = (files, bundle_url, urls)
+            self.builds += 1
+        return files, urls
+
+    @property
+    def files(self):
+        return self._current[0]
+
+    @property
+    def urls(self):
+        return self._current[2]
+
+
+def bundle_urls(files, bundle_url):
+    """URLs of each of a build's ``files`` under ``bundle_url``, with the default vendor bundle."""
+    urls = dict((key, bundle_url + filename) for key, filename in files.items())
+    urls.setdefault('vendor', bundle_url + 'vendor.js')
+    return urls
@@ -0,0 +1,79 @@
+import logging
+import threading
+
+from six.moves import queue
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRefresher(object):
+    """Runs refreshes on a background thread, from a bounded queue.
+
+    A key that is already waiting to be refreshed isn't queued again, and a
+    refresh is dropped rather than queued if the queue is full. Failed refreshes
+    are logged to ``logger``, which should be one the app's logging is set up for.
+    The worker thread is called ``name``.
+    """
+
+    def __init__(self, max_queue=100, logger=logger, name='react-render-refresh'):
+        self.logger = logger
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        self.refreshed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, key, fn):
+        """Queue ``fn`` to refresh ``key``. Returns ``False`` if it wasn't queued."""
+        with self._lock:
+            if key in self._pending:
+                return False
+
+            try:
+                self._queue.put_nowait((key, fn))
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+            self._pending.add(key)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name)
+                self._worker.daemon = True
+                self._worker.start()
+        return True
+
+    def _run(self):
+        while True:
+            key, fn = self._queue.get()
+            try:
+                fn()
+            except Exception as e:
+                self.logger.warning(
+                    'Background task {key} on {worker} failed: {error}',
+                    extra={'key': key, 'worker': self.name, 'error': e})
+                with self._lock:
+                    self.failed += 1
+            else:
+                with self._lock:
+                    self.refreshed += 1
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
+
+    def join(self):
+        """Wait for queued refreshes to finish."""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._pending),
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+            }
@@ -1,6 +1,23 @@
+from flask import Response, current_app, stream_with_context
 
 from .render_server import render_server
 
 
 def render_component(path, props=None, to_static_markup=False, renderer=render_server, request_headers=None):
     return renderer.render(path, props, to_static_markup, request_headers)
+
+
+def render_component_many(renders, renderer=render_server, request_headers=None):
+    return renderer.render_many(renders, request_headers)
+
+
+def render_component_stream(path, props=None, to_static_markup=False, renderer=render_server, request_headers=None):
+    return renderer.render_stream(path, props, to_static_markup, request_headers)
+
+
+def stream_template(template_name, **context):
+    """Respond with a template, sending each part of the page as soon as it has been rendered."""
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
@@ -1,42 +1,125 @@
 import json
 import hashlib
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
 import requests
-from flask import current_app
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from six.moves.http_cookiejar import DefaultCookiePolicy
+from flask import current_app, g
 from flask.json import JSONEncoder
-from flask import request
+from flask import request, copy_current_request_context, after_this_request, has_app_context, has_request_context
+from markupsafe import escape
 
+from .breaker import CircuitBreaker
+from .cache import RenderCache
+from .coalesce import SingleFlight
+from .disk_cache import DiskRenderCache
+from .endpoints import EndpointPool
+from .instrumentation import RenderStats, RenderTiming
+from .manifest import BundleManifest, bundle_urls
 from .exceptions import ReactRenderingError, RenderServerError
+from .refresh import BackgroundRefresher
+from dmutils import metrics
 from dmutils.csrf import get_csrf_token
 
-from six import python_2_unicode_compatible
+from monotonic import monotonic
+from six import python_2_unicode_compatible, string_types, text_type
+
+logger = logging.getLogger(__name__)
+
+# Render servers list the request formats they accept in this response header. Once
+# the render server accepts `raw-props`, props are sent as a JSON object under `props`
+# instead of as a JSON encoded string under `serializedProps`.
+FORMATS_HEADER = 'X-Render-Formats'
+RAW_PROPS_FORMAT = 'raw-props'
+
+# Streamed renders ask for `text/html`. Render servers that can stream send the markup
+# as the response body, as it is rendered, with the slug and files in these headers.
+# Render servers that can't stream answer with the usual JSON.
+STREAM_SLUG_HEADER = 'X-Render-Slug'
+STREAM_FILES_HEADER = 'X-Render-Files'
+
+# The csrf token is different for every visitor, so props are rendered, cached and shared with
+# this placeholder in its place. The placeholder is replaced by the visitor's token in the props
+# and markup of each component returned.
+CSRF_TOKEN_PLACEHOLDER = '__react_render_csrf_token__'
 
 
 @python_2_unicode_compatible
 class RenderedComponent(object):
-    def __init__(self, markup, props, slug=None, files=None):
-        self.markup = markup
+    def __init__(self, markup, props, slug=None, files=None, etag=None, urls=None, chunks=None):
+        self._markup = markup
+        self._chunks = chunks
         self.props = props
         self.slug = slug
         self.files = files or {}
+        self.etag = etag
+        self._urls = urls
 
     def __str__(self):
         return self.markup
 
+    @property
+    def markup(self):
+        if self._chunks is not None:
+            for _ in self.iter_markup():
+                pass
+        return self._markup
+
+    @markup.setter
+    def markup(self, markup):
+        self._markup = markup
+
+    def iter_markup(self):
+        """Yield the markup in chunks as a streaming render server sends them, or all at once.
+
+        Iterate over it in a streamed template, ``{% for chunk in component.iter_markup() %}``,
+        to send the page up to the component before the component has been rendered.
+        """
+        if self._chunks is None:
+            if self._markup:
+                yield self._markup
+            return
+
+        chunks, self._chunks = self._chunks, None
+        received = []
+        try:
+            for chunk in chunks:
+                received.append(chunk)
+                yield chunk
+        finally:
+            self._markup = ''.join(received)
+
+    @property
+    def urls(self):
+        """URLs of the files of the build that rendered this component, shared with the ``BundleManifest``."""
+        if self._urls is None:
+            self._urls = bundle_urls(self.files, current_app.config.get('REACT_BUNDLE_URL', '/'))
+        return self._urls
+
     def get_bundle(self):
-        bundle_url = current_app.config.get('REACT_BUNDLE_URL', '/')
-        return bundle_url + self.files.get(self.slug)
+        return self.urls.get(self.slug)
 
     def get_vendor_bundle(self):
-        bundle_url = current_app.config.get('REACT_BUNDLE_URL', '/')
-        return bundle_url + self.files.get('vendor', 'vendor.js')
+        return self.urls['vendor']
 
     def get_file(self, key=''):
         # If bundle doesn't contain requested file, don't return half a url.
         if key not in self.files:
             return None
 
-        bundle_url = current_app.config.get('REACT_BUNDLE_URL', '/')
-        return bundle_url + self.files.get(key)
+        return self.urls[key]
+
+    def preload_links(self):
+        """``Link`` header values asking browsers to start fetching this component's bundles."""
+        bundles = [self.get_vendor_bundle()]
+        if self.slug in self.files:
+            bundles.append(self.get_bundle())
+        return ['<{}>; rel=preload; as=script'.format(url) for url in bundles]
 
     def get_slug(self):
         return self.slug
@@ -48,13 +131,446 @@ class RenderedComponent(object):
         return str(self.markup)
 
 
+class _BlockAllCookies(DefaultCookiePolicy):
+    # The session is shared between every user of the app, so cookies set by
+    # the render server must never be sent back on someone else's render.
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
 class RenderServer(object):
+    def __init__(self, cache=None, breaker=None, config=None, logger=None):
+        self._config = config
+        self._logger = logger
+        self._session = None
+        self._lock = threading.Lock()
+        self._cache = cache
+        self._breaker = breaker
+        self._coalescer = SingleFlight()
+        self._refresher = None
+        self._stats_publisher = None
+        self._endpoints = None
+        self._stats = RenderStats()
+        self._manifest = BundleManifest()
+        self._disk_cache = None
+        self._local = threading.local()
+        self._batch_unsupported_until = None
+        self._raw_props_urls = set()
+
+    @property
+    def config(self):
+        """The config passed to the constructor, or else the current app's config."""
+        if self._config is not None:
+            return self._config
+        return current_app.config
+
+    @property
+    def logger(self):
+        """The logger passed to the constructor, or else the current app's logger."""
+        if self._logger is not None:
+            return self._logger
+        if has_app_context():
+            return current_app.logger
+        return logger
+
     @property
     def url(self):
-        return current_app.config.get('REACT_RENDER_URL', '')
+        return self.config.get('REACT_RENDER_URL', '')
+
+    @property
+    def endpoints(self):
+        """Pool of render servers, if ``REACT_RENDER_URL`` is a list of URLs rather than a single URL.
+
+        Renders go to the render server with the fewest renders in progress. One that fails
+        ``REACT_RENDER_EJECT_AFTER`` times in a row (default 3) is not used for
+        ``REACT_RENDER_EJECT_COOLDOWN`` seconds (default 30).
+        """
+        if self._endpoints is None and not isinstance(self.url, string_types):
+            with self._lock:
+                if self._endpoints is None:
+                    self._endpoints = EndpointPool(
+                        self.url,
+                        max_failures=self.config.get('REACT_RENDER_EJECT_AFTER', 3),
+                        cooldown=self.config.get('REACT_RENDER_EJECT_COOLDOWN', 30),
+                    )
+        return self._endpoints
+
+    @property
+    def timeout(self):
+        connect_timeout = self.config.get('REACT_RENDER_CONNECT_TIMEOUT', 3.05)
+        read_timeout = self.config.get('REACT_RENDER_READ_TIMEOUT', 10)
+
+        # Caps both timeouts. It is not a deadline for the whole render: connecting and each
+        # read can take up to this long, and connection retries start again.
+        max_timeout = self.config.get('REACT_RENDER_MAX_TIMEOUT')
+        if max_timeout is not None:
+            connect_timeout = min(connect_timeout, max_timeout)
+            read_timeout = min(read_timeout, max_timeout)
+
+        return connect_timeout, read_timeout
+
+    @property
+    def session(self):
+        """Long-lived keep-alive session shared by all threads using this render server.
+
+        Pool size and retry policy are read from the app config the first time
+        the session is used:
+
+        * ``REACT_RENDER_POOL_SIZE``: connections kept open per render host (default 10)
+        * ``REACT_RENDER_RETRIES``: connection retries per render (default 0)
+        * ``REACT_RENDER_RETRY_BACKOFF``: backoff factor between retries (default 0)
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        pool_size = self.config.get('REACT_RENDER_POOL_SIZE', 10)
+        retries = self.config.get('REACT_RENDER_RETRIES', 0)
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=0,
+                backoff_factor=self.config.get('REACT_RENDER_RETRY_BACKOFF', 0),
+            ),
+        )
+
+        session = requests.Session()
+        session.cookies.set_policy(_BlockAllCookies())
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def cache(self):
+        """Render cache, or ``None`` if renders are not cached.
+
+        A cache passed to the constructor is always used. Otherwise one is created
+        on first use if ``REACT_RENDER_CACHE`` is set, sized by ``REACT_RENDER_CACHE_SIZE``
+        and ``REACT_RENDER_CACHE_TTL``. Setting ``REACT_RENDER_SHARED_CACHE`` adds a shared
+        tier on top of the app's Flask-Cache.
+
+        Setting ``REACT_RENDER_CACHE_MAX_STALE`` serves expired renders for up to that many
+        seconds while they are re-rendered in the background (stale-while-revalidate).
+        """
+        if self._cache is None and self.config.get('REACT_RENDER_CACHE'):
+            with self._lock:
+                if self._cache is None:
+                    self._cache = self._create_cache()
+        return self._cache
+
+    def _create_cache(self):
+        shared_cache = None
+        if self.config.get('REACT_RENDER_SHARED_CACHE'):
+            shared_cache = next(iter(current_app.extensions['cache']))
+
+        return RenderCache(
+            max_size=self.config.get('REACT_RENDER_CACHE_SIZE', 1000),
+            ttl=self.config.get('REACT_RENDER_CACHE_TTL', 300),
+            shared_cache=shared_cache,
+            max_stale=self.config.get('REACT_RENDER_CACHE_MAX_STALE', 0),
+        )
+
+    @property
+    def disk_cache(self):
+        """Cache of static markup renders in ``REACT_RENDER_DISK_CACHE_DIR``, if it is set.
+
+        The cache can be shared by every process of the app, and is limited to
+        ``REACT_RENDER_DISK_CACHE_SIZE`` bytes (default 100MB).
+        """
+        if self._disk_cache is None and self.config.get('REACT_RENDER_DISK_CACHE_DIR'):
+            with self._lock:
+                if self._disk_cache is None:
+                    self._disk_cache = DiskRenderCache(
+                        self.config['REACT_RENDER_DISK_CACHE_DIR'],
+                        max_bytes=self.config.get('REACT_RENDER_DISK_CACHE_SIZE', 100 * 1024 * 1024),
+                    )
+        return self._disk_cache
+
+    def etag(self, path, props=None):
+        """The ETag a static markup render of ``path`` with ``props`` would have, without rendering it.
+
+        The ETag is the same for every visitor, unless the markup has the visitor's csrf token
+        in it, and changes with the render server's build. Returns ``None`` if static markup
+        renders aren't cached on disk, or if no render has reported the current build yet.
+        """
+        disk_cache = self.disk_cache
+        if disk_cache is None:
+            return None
+
+        serialized_props = self._serialize_props(props, shared=True)
+        options_hash = self._serialize_options(path, serialized_props, True)[1]
+        disk_key = self._disk_key(options_hash, self._manifest.files)
+        if disk_key is None:
+            return None
+        cached = disk_cache.get(disk_key)
+        if cached is None:
+            return disk_key
+        return _with_csrf_token_etag(disk_key, cached[0], get_csrf_token())
+
+    @property
+    def refresher(self):
+        """Background re-renders of stale cache entries, queued up to ``REACT_RENDER_REFRESH_QUEUE_SIZE``.
+
+        Failed re-renders are logged to the app's logger.
+        """
+        if self._refresher is None:
+            with self._lock:
+                if self._refresher is None:
+                    self._refresher = BackgroundRefresher(
+                        max_queue=self.config.get('REACT_RENDER_REFRESH_QUEUE_SIZE', 100),
+                        logger=self.logger)
+        return self._refresher
+
+    @property
+    def stats_publisher(self):
+        """Publishes render stats in the background, on its own thread so a full refresh queue doesn't drop them."""
+        if self._stats_publisher is None:
+            with self._lock:
+                if self._stats_publisher is None:
+                    self._stats_publisher = BackgroundRefresher(
+                        max_queue=1, logger=self.logger, name='react-render-stats')
+        return self._stats_publisher
+
+    @property
+    def breaker(self):
+        """Circuit breaker for the render server, or ``None`` if there isn't one.
+
+        A breaker passed to the constructor is always used. Otherwise one is created
+        on first use if ``REACT_RENDER_BREAKER_THRESHOLD`` is set: it opens after that
+        many consecutive failed renders and lets a trial render through after
+        ``REACT_RENDER_BREAKER_RESET`` seconds. While it is open, components are
+        returned without markup, to be rendered client-side.
+        """
+        if self._breaker is None and self.config.get('REACT_RENDER_BREAKER_THRESHOLD'):
+            with self._lock:
+                if self._breaker is None:
+                    self._breaker = CircuitBreaker(
+                        failure_threshold=self.config['REACT_RENDER_BREAKER_THRESHOLD'],
+                        reset_timeout=self.config.get('REACT_RENDER_BREAKER_RESET', 30),
+                    )
+        return self._breaker
+
+    @property
+    def coalescer(self):
+        """Shares render requests between concurrent identical renders if ``REACT_RENDER_COALESCE`` is set."""
+        if self.config.get('REACT_RENDER_COALESCE'):
+            return self._coalescer
+
+    @property
+    def stats(self):
+        """Render timings, sizes and outcomes per component, if ``REACT_RENDER_STATS`` is set.
+
+        Every ``REACT_RENDER_STATS_INTERVAL`` seconds (default 60) the stats are sent to
+        CloudWatch through ``dmutils.metrics`` if ``REACT_RENDER_STATS_CLOUDWATCH`` is set,
+        and the summary is written to ``REACT_RENDER_STATS_FILE`` if it is set.
+        """
+        if self.config.get('REACT_RENDER_STATS'):
+            return self._stats
+
+    @contextmanager
+    def _timed(self, path, start=None):
+        stats = self.stats
+        if stats is None:
+            yield None
+            return
+
+        timing = RenderTiming(path, start)
+        self._local.timing = timing
+        try:
+            yield timing
+        except Exception:
+            timing.error = True
+            raise
+        finally:
+            self._local.timing = None
+            timing.finish()
+            stats.record(timing)
+            self._publish_stats(stats)
+
+    @property
+    def manifest(self):
+        """Bundle files and URLs of the render server's current build."""
+        return self._manifest
+
+    @property
+    def _timing(self):
+        return getattr(self._local, 'timing', None)
+
+    def _publish_stats(self, stats):
+        config = self.config
+        if not stats.due(config.get('REACT_RENDER_STATS_INTERVAL', 60)):
+            return
+
+        metrics_client = None
+        if config.get('REACT_RENDER_STATS_CLOUDWATCH'):
+            metrics_client = metrics.client(
+                config.get('DM_METRICS_REGION', 'eu-west-1'),
+                config.get('DM_METRICS_NAMESPACE', config.get('DM_ENVIRONMENT', 'none')),
+                config.get('DM_METRICS_DIMENSIONS'),
+            )
+        summary_file = config.get('REACT_RENDER_STATS_FILE')
+
+        self.stats_publisher.submit('render-stats', lambda: stats.publish(metrics_client, summary_file))
+
+    def invalidate(self, path):
+        """Drop cached renders of the component at ``path``, in memory and on disk."""
+        cache = self.cache
+        if cache is not None:
+            cache.invalidate(path)
+
+        disk_cache = self.disk_cache
+        if disk_cache is not None:
+            disk_cache.invalidate(path)
+
+    def close(self):
+        """Close pooled connections. New ones are created on the next render."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
 
     def render(self, path, props=None, to_static_markup=False, request_headers=None):
-        url = self.url
+        csrf_token = get_csrf_token()
+        with self._timed(path):
+            serialized_props = self._serialize_props(
+                props, csrf_token=csrf_token, shared=self._shares_renders(to_static_markup))
+
+            if not self.config.get('REACT_RENDER', ''):
+                return _with_csrf_token(RenderedComponent('', serialized_props), csrf_token)
+
+            rendered = self._render_serialized(path, serialized_props, to_static_markup, request_headers)
+
+        rendered = _with_csrf_token(rendered, csrf_token)
+        self._preload([rendered])
+        return rendered
+
+    def render_stream(self, path, props=None, to_static_markup=False, request_headers=None):
+        """Render a component, returning as soon as the render server starts sending markup.
+
+        The markup is read as the returned component's ``iter_markup`` is iterated. If the
+        render server can't stream, the whole markup is read before returning, as for ``render``.
+        Streamed renders are not cached or coalesced, so are sent the visitor's csrf token.
+        """
+        with self._timed(path):
+            serialized_props = self._serialize_props(props)
+
+            if not self.config.get('REACT_RENDER', ''):
+                return RenderedComponent('', serialized_props)
+
+            encode_options, options_hash = self._serialize_options(path, serialized_props, to_static_markup)
+            try:
+                res = self._post(None, encode_options, {'hash': options_hash}, request_headers, stream=True)
+            except _CircuitOpen:
+                return self._fallback(serialized_props)
+
+            if isinstance(res, dict):
+                rendered = self._load(res, serialized_props)
+            else:
+                files, urls = self._bundle_files(json.loads(res.headers.get(STREAM_FILES_HEADER) or '{}'))
+                rendered = RenderedComponent(
+                    None, serialized_props, res.headers.get(STREAM_SLUG_HEADER, 'main'), files,
+                    urls=urls, chunks=_stream_chunks(res))
+
+        self._preload([rendered])
+        return rendered
+
+    def render_many(self, renders, request_headers=None):
+        """Render several components for the same page.
+
+        :param renders: list of ``(path, props, to_static_markup)`` tuples (``props`` and
+                        ``to_static_markup`` may be left off) or dicts with the same keys
+        :param request_headers: headers to send with each render request
+
+        :return: list of ``RenderedComponent``, in the same order as ``renders``. A component
+                 that fails to render is returned without markup, so that it is rendered
+                 client-side, and the error is logged.
+
+        If ``REACT_RENDER_BATCH_URL`` is set, all renders are sent to it in a single request.
+        Otherwise, or if the render service doesn't support batches, up to
+        ``REACT_RENDER_MAX_CONCURRENCY`` renders of this call are made in parallel.
+        """
+        csrf_token = get_csrf_token()
+        renders = [_render_args(args) for args in renders]
+        serialized = [
+            (path, self._serialize_props(props, csrf_token=csrf_token, shared=self._shares_renders(to_static_markup)),
+             to_static_markup)
+            for path, props, to_static_markup in renders
+        ]
+
+        if not self.config.get('REACT_RENDER', ''):
+            return [_with_csrf_token(RenderedComponent('', serialized_props), csrf_token)
+                    for _, serialized_props, _ in serialized]
+
+        batch_url = self.config.get('REACT_RENDER_BATCH_URL')
+        rendered = None
+        if batch_url and self._batch_supported():
+            try:
+                rendered = self._render_batch(batch_url, serialized, request_headers)
+            except _BatchNotSupported:
+                # Tried again after a while, as it might have been a proxy answering during a deploy.
+                cooldown = self.config.get('REACT_RENDER_BATCH_COOLDOWN', 300)
+                self.logger.warning(
+                    'Render server at {url} does not support batches, rendering in parallel for {cooldown}s',
+                    extra={'url': batch_url, 'cooldown': cooldown})
+                self._batch_unsupported_until = monotonic() + cooldown
+
+        if rendered is None:
+            rendered = self._render_parallel(serialized, request_headers)
+
+        rendered = [_with_csrf_token(component, csrf_token) for component in rendered]
+        self._preload(rendered)
+        return rendered
+
+    def _batch_supported(self):
+        until = self._batch_unsupported_until
+        return until is None or monotonic() >= until
+
+    def _preload(self, rendered):
+        """Add ``Link: rel=preload`` headers for the bundles of components rendered in this request."""
+        if not self.config.get('REACT_BUNDLE_PRELOAD') or not has_request_context():
+            return
+
+        links = getattr(g, '_react_preload_links', None)
+        if links is None:
+            links = g._react_preload_links = []
+
+            @after_this_request
+            def add_preload_links(response):
+                if links:
+                    response.headers.add('Link', ', '.join(links))
+                return response
+
+        for component in rendered:
+            for link in component.preload_links():
+                if link not in links:
+                    links.append(link)
+
+    def _shares_renders(self, to_static_markup):
+        # Renders that can be handed to other visitors are made with CSRF_TOKEN_PLACEHOLDER
+        # as the csrf token, which is replaced by each visitor's own afterwards.
+        return (
+            self.cache is not None or self.coalescer is not None or
+            (to_static_markup and self.disk_cache is not None)
+        )
+
+    def _serialize_props(self, props, location=None, csrf_token=None, shared=False):
+        """Serialize ``props`` with the default options, for a page at ``location`` (default: the current request's).
+
+        ``props`` are given ``csrf_token`` (default: the current session's), but if the render is
+        ``shared`` between visitors they are serialized with ``CSRF_TOKEN_PLACEHOLDER`` instead.
+        """
+        timing = self._timing
+        start = monotonic()
 
         if props is None:
             props = {}
@@ -62,63 +578,273 @@ class RenderServer(object):
         if 'form_options' not in props:
             props['form_options'] = {}
 
-        props['form_options']['csrf_token'] = get_csrf_token()
+        if csrf_token is None:
+            csrf_token = get_csrf_token()
+        props['form_options']['csrf_token'] = CSRF_TOKEN_PLACEHOLDER if shared else csrf_token
 
         # Add default options.
         opts = props.get('options', {})
         opts.update({
             'serverRender': True,
-            'apiUrl': current_app.config.get('SERVER_NAME', None)
+            'apiUrl': self.config.get('SERVER_NAME', None)
         })
 
         # Pass current route path for React router to use
         props.update({
             '_serverContext': {
-                'location': request.path
+                'location': request.path if location is None else location
             },
             'options': opts
         })
 
-        serialized_props = json.dumps(dict(props), cls=JSONEncoder, sort_keys=True)
+        serialized_props = self._dumps(dict(props))
+        props['form_options']['csrf_token'] = csrf_token
+
+        if timing is not None:
+            timing.serialize += monotonic() - start
+            timing.props_bytes = len(serialized_props)
+        return serialized_props
+
+    def _dumps(self, props):
+        dumps = self.config.get('REACT_RENDER_JSON_DUMPS')
+        if dumps is not None:
+            return dumps(props)
+        return json.dumps(props, cls=JSONEncoder, sort_keys=True)
+
+    def _serialize_options(self, path, serialized_props, to_static_markup):
+        """Return ``(encode_options, options_hash)`` for a render.
+
+        ``encode_options(raw_props)`` returns the render request body for a render server that
+        does or doesn't accept raw props, see ``_send``. The hash is the same either way.
+        """
+        timing = self._timing
+        start = monotonic()
+
+        raw_options = _encode_options(path, serialized_props, to_static_markup, True)
+        options_hash = hashlib.sha1(raw_options.encode('utf-8')).hexdigest()
+
+        def encode_options(raw_props):
+            if raw_props:
+                return raw_options
+            return _encode_options(path, serialized_props, to_static_markup, False)
+
+        if timing is not None:
+            timing.serialize += monotonic() - start
+        return encode_options, options_hash
+
+    def _render_serialized(self, path, serialized_props, to_static_markup, request_headers=None):
+        encode_options, options_hash = self._serialize_options(path, serialized_props, to_static_markup)
+
+        cache = self.cache
+        if cache is not None:
+            cached, stale = cache.lookup(path, options_hash)
+            if stale:
+                self._refresh(
+                    path, serialized_props, to_static_markup, encode_options, options_hash, request_headers)
+            if cached is not None:
+                if self._timing is not None:
+                    self._timing.cached = True
+                return cached
+
+        disk_cache = self.disk_cache if to_static_markup else None
+        disk_key = self._disk_key(options_hash, self._manifest.files) if disk_cache is not None else None
+        if disk_key is not None:
+            cached = disk_cache.get(disk_key)
+            if cached is not None:
+                if self._timing is not None:
+                    self._timing.cached = True
+                markup, slug, files = cached
+                if files == self._manifest.files:
+                    files, urls = self._bundle_files(files)
+                else:
+                    # Leaves the manifest to the builds render servers report.
+                    urls = bundle_urls(files, self.config.get('REACT_BUNDLE_URL', '/'))
+                rendered = RenderedComponent(markup, serialized_props, slug, files, etag=disk_key, urls=urls)
+                if cache is not None:
+                    cache.set(path, options_hash, rendered)
+                return rendered
+
+        coalescer = self.coalescer
+        if coalescer is None:
+            return self._fetch(
+                path, serialized_props, to_static_markup, encode_options, options_hash, request_headers)
+
+        return coalescer.do(
+            options_hash,
+            lambda: self._fetch(
+                path, serialized_props, to_static_markup, encode_options, options_hash, request_headers)
+        )
+
+    def _disk_key(self, options_hash, files):
+        """Key of a static markup render on disk, and its ETag, or ``None`` if the build isn't known.
 
-        if not current_app.config.get('REACT_RENDER', ''):
-            return RenderedComponent('', serialized_props)
+        Renders are only the same for the same build, identified by ``REACT_RENDER_BUILD_ID`` or
+        else by the bundle ``files`` it lists, so a new build doesn't get an old build's renders.
+        """
+        build = self.config.get('REACT_RENDER_BUILD_ID')
+        if build is None:
+            if not files:
+                return None
+            build = json.dumps(files, sort_keys=True)
+        return hashlib.sha1('{}:{}'.format(build, options_hash).encode('utf-8')).hexdigest()
 
-        options = {
-            'path': path,
-            'serializedProps': serialized_props,
-            'toStaticMarkup': to_static_markup
-        }
-        serialized_options = json.dumps(options, sort_keys=True)
-        options_hash = hashlib.sha1(serialized_options.encode('utf-8')).hexdigest()
+    def _refresh(self, path, serialized_props, to_static_markup, encode_options, options_hash, request_headers):
+        app = current_app._get_current_object()
 
+        def refresh():
+            with app.app_context():
+                self._fetch(
+                    path, serialized_props, to_static_markup, encode_options, options_hash, request_headers)
+
+        self.refresher.submit(options_hash, refresh)
+
+    def _fetch(self, path, serialized_props, to_static_markup, encode_options, options_hash, request_headers):
+        try:
+            obj = self._post(None, encode_options, {'hash': options_hash}, request_headers)
+        except _CircuitOpen:
+            return self._fallback(serialized_props)
+        rendered = self._load(obj, serialized_props)
+
+        disk_cache = self.disk_cache if to_static_markup else None
+        disk_key = self._disk_key(options_hash, rendered.files) if disk_cache is not None else None
+        if disk_key is not None:
+            disk_cache.set(disk_key, rendered.markup, rendered.slug, rendered.files, path)
+            rendered.etag = disk_key
+
+        cache = self.cache
+        if cache is not None:
+            cache.set(path, options_hash, rendered)
+
+        return rendered
+
+    def _post(self, url, encode_data, params, request_headers=None, stream=False):
+        """Send a render request to ``url``, or to one of the render servers if ``url`` is ``None``.
+
+        ``encode_data(raw_props)`` returns the request body, see ``_send``. Returns the decoded
+        JSON response or, if ``stream`` is set and the render server streams its markup, the
+        response itself.
+        """
+        breaker = self.breaker
+        if breaker is None:
+            return self._dispatch(url, encode_data, params, request_headers, stream)
+
+        if not breaker.allow():
+            raise _CircuitOpen()
+
+        try:
+            obj = self._dispatch(url, encode_data, params, request_headers, stream)
+        except Exception as e:
+            # Any error other than a client error is a failure, so that a trial render
+            # always ends, whatever went wrong.
+            if not _is_failure(e):
+                breaker.record_success()
+            elif breaker.record_failure():
+                self.logger.warning(
+                    'Render server at {url} is failing, rendering client-side for {reset_timeout}s: {error}',
+                    extra={'url': url or self.url, 'reset_timeout': breaker.reset_timeout, 'error': e})
+            raise
+
+        breaker.record_success()
+        return obj
+
+    def _dispatch(self, url, encode_data, params, request_headers=None, stream=False):
+        endpoints = self.endpoints if url is None else None
+        if endpoints is None:
+            return self._send(url or self.url, encode_data, params, request_headers, stream)
+
+        endpoint = endpoints.acquire()
+        start = monotonic()
+        error = None
+        try:
+            return self._send(endpoint.url, encode_data, params, request_headers, stream)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Always released, so the endpoint's outstanding renders stay right.
+            failed = error is not None and _is_failure(error)
+            if endpoints.release(endpoint, monotonic() - start, failed=failed):
+                self.logger.warning(
+                    'Render server at {url} is failing, not using it for {cooldown}s: {error}',
+                    extra={'url': endpoint.url, 'cooldown': endpoints.cooldown, 'error': error})
+
+    def _send(self, url, encode_data, params, request_headers=None, stream=False):
+        # Render servers are sent raw props once they have said they accept them. Each render
+        # server is tracked on its own, as they might not all be upgraded at the same time.
+        raw_props = url in self._raw_props_urls
         all_request_headers = {'content-type': 'application/json'}
+        if stream:
+            all_request_headers['accept'] = 'text/html, application/json'
 
         # Add additional requests headers if the requet_headers dictionary is specified
         if request_headers is not None:
             all_request_headers.update(request_headers)
 
+        timing = self._timing
+        start = monotonic()
+        data = encode_data(raw_props).encode('utf-8')
+        if timing is not None:
+            timing.serialize += monotonic() - start
+
+        encoding = self.config.get('REACT_RENDER_COMPRESSION')
+        if encoding and len(data) >= self.config.get('REACT_RENDER_COMPRESSION_THRESHOLD', 1024):
+            data = _compress(data, encoding, self.config.get('REACT_RENDER_COMPRESSION_LEVEL', 6))
+            all_request_headers['content-encoding'] = encoding
+
+        start = monotonic()
         try:
-            res = requests.post(
+            res = self.session.post(
                 url,
-                data=serialized_options,
+                data=data,
                 headers=all_request_headers,
-                params={'hash': options_hash}
+                params=params,
+                timeout=self.timeout,
+                stream=stream
             )
         except requests.exceptions.ConnectionError:
             raise RenderServerError('Could not connect to render server at {}'.format(url))
+        except requests.exceptions.Timeout:
+            raise RenderServerError('Timed out waiting for render server at {}'.format(url))
+        except requests.exceptions.RequestException as e:
+            raise RenderServerError('Request to render server at {} failed: {}'.format(url, e))
 
         if res.status_code != 200:
             raise RenderServerError(
-                'Unexpected response from render server at {} - {}: {}'.format(url, res.status_code, res.text)
+                'Unexpected response from render server at {} - {}: {}'.format(url, res.status_code, res.text),
+                status_code=res.status_code
             )
 
-        obj = res.json()
+        if RAW_PROPS_FORMAT in res.headers.get(FORMATS_HEADER, ''):
+            self._raw_props_urls.add(url)
+        else:
+            self._raw_props_urls.discard(url)
+
+        if stream and res.headers.get('content-type', '').startswith('text/html'):
+            if timing is not None:
+                timing.network += monotonic() - start
+            return res
+
+        received = monotonic()
+        try:
+            obj = res.json()
+        except ValueError:
+            raise RenderServerError(
+                'Render server at {} returned invalid JSON: {}'.format(url, res.text[:200]))
+
+        if timing is not None:
+            timing.network += received - start
+            timing.parse += monotonic() - received
+        return obj
+
+    def _load(self, obj, serialized_props):
+        timing = self._timing
+        if timing is not None:
+            timing.markup_bytes = len(obj.get('markup') or '')
 
         markup = obj.get('markup', None)
         err = obj.get('error', None)
         slug = obj.get('slug', 'main')
-        files = obj.get('files', dict())
+        files = obj.get('files') or {}
 
         if err:
             if 'message' in err and 'stack' in err:
@@ -130,7 +856,207 @@ class RenderServer(object):
         if markup is None:
             raise ReactRenderingError('Render server failed to return markup. Returned: {}'.format(obj))
 
-        return RenderedComponent(markup, serialized_props, slug, files)
+        files, urls = self._bundle_files(files)
+        return RenderedComponent(markup, serialized_props, slug, files, urls=urls)
+
+    def _bundle_files(self, files):
+        return self._manifest.get(files, self.config.get('REACT_BUNDLE_URL', '/'))
+
+    def _render_batch(self, url, serialized, request_headers):
+        results = [None] * len(serialized)
+        pending = []
+
+        cache = self.cache
+        for i, (path, serialized_props, to_static_markup) in enumerate(serialized):
+            encode_options, options_hash = self._serialize_options(path, serialized_props, to_static_markup)
+            if cache is not None:
+                results[i] = cache.get(path, options_hash)
+            if results[i] is None:
+                pending.append((i, path, encode_options, options_hash))
+
+        if not pending:
+            return results
+
+        # Time the batch request on its own, then share it out to each of the renders in it.
+        start = monotonic()
+        batch_timing = self._local.timing = RenderTiming('batch', start)
+        try:
+            objs = self._post(
+                url,
+                lambda raw_props: '[{}]'.format(', '.join(
+                    encode_options(raw_props) for _, _, encode_options, _ in pending)),
+                {'hash': [options_hash for _, _, _, options_hash in pending]},
+                request_headers
+            )
+        except _CircuitOpen as e:
+            objs = [e] * len(pending)
+        except RenderServerError as e:
+            if e.status_code in _BATCH_NOT_SUPPORTED_STATUSES:
+                raise _BatchNotSupported()
+            objs = [e] * len(pending)
+        finally:
+            self._local.timing = None
+
+        if not isinstance(objs, list) or len(objs) != len(pending):
+            error = RenderServerError('Render server at {} returned {} results for a batch of {} renders'.format(
+                url, len(objs) if isinstance(objs, list) else 'no list of', len(pending)))
+            objs = [error] * len(pending)
+
+        for (i, path, _, options_hash), obj in zip(pending, objs):
+            serialized_props = serialized[i][1]
+            with self._timed(path, start) as timing:
+                if timing is not None:
+                    timing.props_bytes = len(serialized_props)
+                    timing.network = batch_timing.network
+                    timing.parse = batch_timing.parse
+
+                if isinstance(obj, _CircuitOpen):
+                    results[i] = self._fallback(serialized_props)
+                    continue
+
+                try:
+                    if isinstance(obj, Exception):
+                        raise obj
+                    results[i] = self._load(obj, serialized_props)
+                except Exception as e:
+                    results[i] = self._render_failed(path, serialized_props, e)
+                else:
+                    if cache is not None:
+                        cache.set(path, options_hash, results[i])
+
+        return results
+
+    def _render_parallel(self, serialized, request_headers):
+        if len(serialized) == 1:
+            path, serialized_props, to_static_markup = serialized[0]
+            return [self._render_isolated(path, serialized_props, to_static_markup, request_headers)]
+
+        # A pool for each call, so that one page's renders never queue behind another's.
+        max_workers = min(self.config.get('REACT_RENDER_MAX_CONCURRENCY', 4), len(serialized))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    copy_current_request_context(self._render_isolated),
+                    path, serialized_props, to_static_markup, request_headers
+                )
+                for path, serialized_props, to_static_markup in serialized
+            ]
+            return [future.result() for future in futures]
+
+    def _render_isolated(self, path, serialized_props, to_static_markup, request_headers):
+        with self._timed(path) as timing:
+            if timing is not None:
+                timing.props_bytes = len(serialized_props)
+            try:
+                return self._render_serialized(path, serialized_props, to_static_markup, request_headers)
+            except Exception as e:
+                return self._render_failed(path, serialized_props, e)
+
+    def _render_failed(self, path, serialized_props, error):
+        self.logger.error(
+            'Failed to render {path}, falling back to client-side rendering: {error}',
+            extra={'path': path, 'error': error})
+        if self._timing is not None:
+            self._timing.error = True
+        return self._fallback(serialized_props)
+
+    def _fallback(self, serialized_props):
+        # Rendered without markup, so that the component is rendered client-side.
+        if self._timing is not None:
+            self._timing.fallback = True
+        return RenderedComponent('', serialized_props)
+
+
+def _with_csrf_token(rendered, csrf_token):
+    """A copy of ``rendered`` for the visitor with ``csrf_token``, leaving shared renders untouched."""
+    return RenderedComponent(
+        rendered.markup.replace(CSRF_TOKEN_PLACEHOLDER, text_type(escape(csrf_token))),
+        _with_csrf_token_props(rendered.props, csrf_token),
+        rendered.slug, rendered.files, _with_csrf_token_etag(rendered.etag, rendered.markup, csrf_token),
+        urls=rendered._urls
+    )
+
+
+def _with_csrf_token_etag(etag, markup, csrf_token):
+    # Markup with the visitor's csrf token in it is only the same for that visitor.
+    if etag is None or CSRF_TOKEN_PLACEHOLDER not in markup:
+        return etag
+    return hashlib.sha1('{}:{}'.format(etag, csrf_token).encode('utf-8')).hexdigest()
+
+
+def _with_csrf_token_props(serialized_props, csrf_token):
+    # The token as it appears inside a JSON string.
+    return serialized_props.replace(CSRF_TOKEN_PLACEHOLDER, json.dumps(csrf_token)[1:-1])
+
+
+class _BatchNotSupported(Exception):
+    pass
+
+
+class _CircuitOpen(RenderServerError):
+    def __init__(self):
+        super(_CircuitOpen, self).__init__('Render server circuit breaker is open')
+
+
+_BATCH_NOT_SUPPORTED_STATUSES = (404, 405, 501)
+
+
+def _compress(data, encoding, level):
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == 'deflate':
+        return zlib.compress(data, level)
+    raise ValueError('Unsupported REACT_RENDER_COMPRESSION: {}'.format(encoding))
+
+
+def _encode_options(path, serialized_props, to_static_markup, raw_props):
+    if raw_props:
+        # Embed the already serialized props as they are, rather than encoding them
+        # again as a string. Equivalent to `json.dumps(..., sort_keys=True)`.
+        return '{{"path": {}, "props": {}, "toStaticMarkup": {}}}'.format(
+            json.dumps(path), serialized_props, json.dumps(to_static_markup)
+        )
+
+    return json.dumps({
+        'path': path,
+        'serializedProps': serialized_props,
+        'toStaticMarkup': to_static_markup
+    }, sort_keys=True)
+
+
+def _is_failure(error):
+    # Any error other than a client error counts as a failure of the render server.
+    return not isinstance(error, RenderServerError) or _is_server_failure(error)
+
+
+def _is_server_failure(error):
+    # Client errors mean the render server is up, so only connection errors,
+    # timeouts and server errors count as failures.
+    return error.status_code is None or error.status_code >= 500
+
+
+def _stream_chunks(res):
+    if res.encoding is None:
+        res.encoding = 'utf-8'
+    try:
+        for chunk in res.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk:
+                yield chunk
+    except requests.exceptions.RequestException as e:
+        raise RenderServerError('Render server stopped streaming markup: {}'.format(e))
+    finally:
+        res.close()
+
+
+def _render_args(args):
+    if isinstance(args, dict):
+        return args['path'], args.get('props'), args.get('to_static_markup', False)
+    if isinstance(args, string_types):
+        return args, None, False
+
+    args = tuple(args)
+    return args[0], args[1] if len(args) > 1 else None, args[2] if len(args) > 2 else False
 
 
 render_server = RenderServer()
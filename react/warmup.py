@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+
+from monotonic import monotonic
+from six import string_types
+
+from .render_server import render_server
+
+
+def warm_up(app, renders=None, crawl=False, renderer=render_server, max_workers=4, timeout=None):
+    """Render components ahead of the first requests, so render servers and caches are warm.
+
+    :param app: Flask application
+    :param renders: list of ``(path, props)``, ``(path, props, to_static_markup)`` or
+                    ``(path, props, to_static_markup, url)`` to render. ``url`` is the page the
+                    component is rendered on (default ``/``), which is part of its props.
+    :param crawl: also request every GET route of the app that takes no arguments
+    :param renderer: render server to warm up
+    :param max_workers: renders and requests made in parallel
+    :param timeout: seconds to wait for the whole warm-up. Renders and requests that haven't
+                    finished by then are left to finish in the background, with a ``TimeoutError``.
+
+    :return: list of ``{'path': ..., 'seconds': ..., 'error': ...}``, one per render or route, in order
+    """
+    jobs = [(_render, args) for args in renders or []]
+    if crawl:
+        jobs.extend((_request, url) for url in crawl_urls(app))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(_timed, fn, app, renderer, args) for fn, args in jobs]
+        wait(futures, timeout)
+    finally:
+        executor.shutdown(wait=False)
+
+    results = []
+    for (fn, args), future in zip(jobs, futures):
+        if future.done():
+            results.append(future.result())
+        else:
+            future.cancel()
+            results.append({
+                'path': _path(args),
+                'seconds': timeout,
+                'error': TimeoutError('Warm-up timed out after {}s'.format(timeout)),
+            })
+    return results
+
+
+def warm_up_from_config(app, renderer=render_server):
+    """Warm up with ``REACT_RENDER_WARMUP`` renders and, if ``REACT_RENDER_WARMUP_CRAWL`` is set, app routes."""
+    renders = app.config.get('REACT_RENDER_WARMUP')
+    crawl = app.config.get('REACT_RENDER_WARMUP_CRAWL', False)
+    if not renders and not crawl:
+        return []
+
+    results = warm_up(
+        app, renders, crawl, renderer,
+        max_workers=app.config.get('REACT_RENDER_WARMUP_CONCURRENCY', 4),
+        timeout=app.config.get('REACT_RENDER_WARMUP_TIMEOUT', 30),
+    )
+    for result in results:
+        app.logger.info(
+            'Warmed up {path} in {milliseconds}ms{error}',
+            extra={
+                'path': result['path'],
+                'milliseconds': int(result['seconds'] * 1000),
+                'error': ': {}'.format(result['error']) if result['error'] else '',
+            })
+    return results
+
+
+def crawl_urls(app):
+    """URLs of every GET route of ``app`` that takes no arguments."""
+    return sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if 'GET' in rule.methods and not rule.arguments and rule.endpoint != 'static'
+    )
+
+
+def format_results(results):
+    """Format warm-up results as a table, slowest first."""
+    lines = ['{:60} {:>10}  {}'.format('path', 'ms', 'error')]
+    for result in sorted(results, key=lambda result: result['seconds'], reverse=True):
+        lines.append('{:60} {:>10.1f}  {}'.format(
+            result['path'], result['seconds'] * 1000, result['error'] or ''))
+    return '\n'.join(lines)
+
+
+def _path(args):
+    return args if isinstance(args, string_types) else args[0]
+
+
+def _timed(fn, app, renderer, args):
+    path = _path(args)
+    start = monotonic()
+    error = None
+    try:
+        fn(app, renderer, args)
+    except Exception as e:
+        error = e
+    return {'path': path, 'seconds': monotonic() - start, 'error': error}
+
+
+def _render(app, renderer, args):
+    path, props = args[:2]
+    to_static_markup = args[2] if len(args) > 2 else False
+    url = args[3] if len(args) > 3 else '/'
+    with app.test_request_context(url):
+        renderer.render(path, props, to_static_markup)
+
+
+def _request(app, renderer, url):
+    response = app.test_client().get(url)
+    if response.status_code >= 500:
+        raise Exception('{} responded with {}'.format(url, response.status_code))
@@ -29,6 +29,7 @@ setup(
         'flask_featureflags',
         'flask-login',
         'flask-script',
+        'futures; python_version < "3"',
         'monotonic',
         'markdown',
         'pytz',
@@ -38,5 +39,8 @@ setup(
         'pendulum',
         'rollbar',
         'blinker'
-    ]
+    ],
+    extras_require={
+        'async': ['aiohttp; python_version >= "3.5"'],
+    }
 )
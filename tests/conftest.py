@@ -1,3 +1,4 @@
+import sys
 import tempfile
 
 import pytest
@@ -7,6 +8,10 @@ from boto.ec2.cloudwatch import CloudWatchConnection
 
 from dmutils.logging import init_app
 
+# The async render client is Python 3 only.
+if sys.version_info < (3, 5):
+    collect_ignore = ['test_render_aio.py']
+
 
 @pytest.fixture
 def app():
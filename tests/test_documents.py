@@ -8,7 +8,7 @@ from freezegun import freeze_time
 from werkzeug.datastructures import ImmutableMultiDict
 
 from .helpers import mock_file
-from dmutils.s3 import S3ResponseError
+from dmutils.s3 import S3ResponseError, signed_url_cache, storage_pool
 
 from dmutils.documents import (
     generate_file_name, get_extension,
@@ -17,7 +17,7 @@ from dmutils.documents import (
     file_is_open_document_format,
     validate_documents,
     upload_document, upload_service_documents,
-    get_signed_url, get_agreement_document_path, get_document_path,
+    get_signed_url, get_signed_urls, get_agreement_document_path, get_document_path,
     sanitise_supplier_name, file_is_pdf, file_is_zip, file_is_image,
     file_is_csv)
 
@@ -292,6 +292,44 @@ def test_get_signed_url(base_url, expected):
     assert url == expected
 
 
+@pytest.yield_fixture
+def s3_client():
+    storage_pool.clear()
+    signed_url_cache.clear()
+    with patch('dmutils.s3.boto3.session.Session') as session:
+        yield session.return_value.client
+    storage_pool.clear()
+    signed_url_cache.clear()
+
+
+def test_get_signed_url_reuses_client(s3_client):
+    s3_client.return_value.generate_presigned_url.return_value = 'http://example/foo?after'
+
+    assert get_signed_url('bucket', 'foo', 'https://other') == 'https://other/foo?after'
+    get_signed_url('bucket', 'bar', None)
+
+    assert s3_client.call_count == 1
+    s3_client.return_value.generate_presigned_url.assert_called_with(
+        'get_object', Params={'Bucket': 'bucket', 'Key': 'bar'}, ExpiresIn=120)
+
+
+def test_get_signed_url_from_cache(s3_client):
+    s3_client.return_value.generate_presigned_url.side_effect = ['http://example/1', 'http://example/2']
+
+    assert get_signed_url('bucket', 'foo', None, cache=True) == 'http://example/1'
+    assert get_signed_url('bucket', 'foo', 'https://other', cache=True) == 'https://other/1'
+    assert get_signed_url('bucket', 'foo', None) == 'http://example/2'
+
+
+def test_get_signed_urls(s3_client):
+    s3_client.return_value.generate_presigned_url.side_effect = ['http://example/foo', 'http://example/bar']
+
+    assert get_signed_urls('bucket', ['foo', 'bar'], 'https://other') == {
+        'foo': 'https://other/foo',
+        'bar': 'https://other/bar',
+    }
+
+
 def test_get_agreement_document_path():
     assert get_agreement_document_path('g-cloud-7', 1234, 'foo.pdf') == \
         'g-cloud-7/agreements/1234/1234-foo.pdf'
@@ -2,6 +2,7 @@ import pytest
 import mock
 import botocore
 from dmutils.config import init_app
+from dmutils.s3 import storage_pool
 from dmutils.file import (
     s3_upload_fileObj, s3_upload_file_from_request, s3_download_file, s3_generate_unique_filename
 )
@@ -9,9 +10,11 @@ from dmutils.file import (
 
 @pytest.fixture
 def s3_resource():
-    with mock.patch('boto3.resource') as boto_resource:
-        instance = boto_resource.return_value
+    storage_pool.clear()
+    with mock.patch('dmutils.s3.boto3.session.Session') as session:
+        instance = session.return_value.resource.return_value
         yield instance
+    storage_pool.clear()
 
 
 @pytest.fixture
@@ -82,7 +85,7 @@ def test_s3_upload_from_request(upload):
     upload.assert_called_once_with('value', 'path')
 
 
-@mock.patch('dmutils.file.boto3.client')
+@mock.patch.object(storage_pool, 'get_client')
 def test_s3_download_with_correct_params(s3_client, file_app):
     with file_app.app_context():
         mock_s3 = mock.MagicMock()
@@ -115,3 +118,20 @@ def test_s3_upload_rename_instead_of_overwrite(s3_download_file, file_app, s3_re
         fileObj,
         "path/test_2.pdf"
     )
+
+
+@mock.patch('dmutils.file.s3_download_file')
+def test_s3_upload_in_parts(s3_download_file, file_app, s3_resource):
+    file_app.config['S3_UPLOAD_PART_SIZE'] = 8 * 1024 * 1024
+    file_app.config['S3_UPLOAD_CONCURRENCY'] = 4
+    with file_app.app_context():
+        fileObj = mock.MagicMock()
+        fileObj.filename = "test.pdf"
+        s3_download_file.side_effect = botocore.exceptions.ClientError({'Error': {}}, '')
+        s3_upload_fileObj(fileObj, 'path')
+
+    args, kwargs = s3_resource.Bucket().upload_fileobj.call_args
+    assert args == (fileObj, "path/test.pdf")
+    assert kwargs['Config'].multipart_threshold == 8 * 1024 * 1024
+    assert kwargs['Config'].multipart_chunksize == 8 * 1024 * 1024
+    assert kwargs['Config'].max_concurrency == 4
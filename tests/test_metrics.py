@@ -34,6 +34,41 @@ def test_put_metric(cloudwatch):
         statistics=None)
 
 
+def test_put_count(cloudwatch):
+    client = metrics.client("myregion", "mynamespace")
+    client.put_count("foo", 3, dimensions={"component": "App.js"})
+
+    cloudwatch.put_metric_data.assert_called_with(
+        namespace="mynamespace",
+        name="foo",
+        value=3,
+        timestamp=IsDatetime(),
+        unit="Count",
+        dimensions={"component": "App.js"},
+        statistics=None)
+
+
+def test_put_statistics(cloudwatch):
+    client = metrics.client("myregion", "mynamespace")
+    client.put_statistics("foo", 3, 6, 1, 3, unit="Seconds", dimensions={"component": "App.js"})
+
+    cloudwatch.put_metric_data.assert_called_with(
+        namespace="mynamespace",
+        name="foo",
+        value=None,
+        timestamp=IsDatetime(),
+        unit="Seconds",
+        dimensions={"component": "App.js"},
+        statistics={"samplecount": 3, "sum": 6, "minimum": 1, "maximum": 3})
+
+
+def test_put_statistics_skips_empty_set(cloudwatch):
+    client = metrics.client("myregion", "mynamespace")
+    client.put_statistics("foo", 0, 0, None, None)
+
+    cloudwatch.put_metric_data.assert_not_called()
+
+
 def test_timer(cloudwatch):
     client = metrics.client("myregion", "mynamespace")
     with client.timer("mytimer"):
@@ -0,0 +1,270 @@
+from __future__ import absolute_import
+
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from react.aio import AsyncRenderServer, render_component_async  # noqa: E402
+from react.cache import RenderCache  # noqa: E402
+from react.exceptions import RenderServerError  # noqa: E402
+from react.render_server import RenderServer  # noqa: E402
+from dmutils.csrf import get_csrf_token  # noqa: E402
+from .helpers import BaseApplicationTest  # noqa: E402
+from .test_render_server import RenderConfig  # noqa: E402
+
+
+def run_with_render_server(handler, test):
+    """Run ``test(url)`` against a render server answering with ``handler``."""
+    async def main():
+        app = web.Application()
+        app.router.add_post('/render', handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            return await test(str(server.make_url('/render')))
+        finally:
+            await server.close()
+
+    return asyncio.new_event_loop().run_until_complete(main())
+
+
+class TestAsyncRenderServer(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestAsyncRenderServer, self).setup()
+        self.requests = []
+
+    async def render_ok(self, request):
+        options = json.loads(await request.text())
+        self.requests.append((request, options))
+        props = json.loads(options['serializedProps'])
+        return web.json_response({'markup': '<p>{}</p>'.format(props.get('name')), 'files': {'main': 'main.js'}})
+
+    def test_render(self):
+        renderer = AsyncRenderServer(RenderServer())
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = url
+            try:
+                return await renderer.render('/path', {'name': 'one'}, location='/test', csrf_token='abc123')
+            finally:
+                await renderer.close()
+
+        with self.flask.app_context():
+            result = run_with_render_server(self.render_ok, test)
+
+        assert result.markup == '<p>one</p>'
+        assert result.get_bundle() == '/main.js'
+        assert json.loads(result.get_props())['form_options']['csrf_token'] == 'abc123'
+
+        request, options = self.requests[0]
+        assert request.query['hash']
+        props = json.loads(options['serializedProps'])
+        assert props['_serverContext'] == {'location': '/test'}
+        assert props['options'] == {'serverRender': True, 'apiUrl': 'http://api'}
+        assert 'csrf_token' in props['form_options']
+
+    def test_render_without_flask(self):
+        config = {'REACT_RENDER': True, 'SERVER_NAME': 'http://api'}
+        renderer = AsyncRenderServer(config=config)
+
+        async def test(url):
+            config['REACT_RENDER_URL'] = url
+            try:
+                return await asyncio.gather(
+                    renderer.render('/path', {'name': 'one'}, location='/one', csrf_token='token-one'),
+                    renderer.render('/path', {'name': 'two'}, location='/two', csrf_token='token-two'),
+                )
+            finally:
+                await renderer.close()
+
+        first, second = run_with_render_server(self.render_ok, test)
+
+        assert first.markup == '<p>one</p>'
+        assert json.loads(first.get_props())['form_options']['csrf_token'] == 'token-one'
+        assert json.loads(second.get_props())['form_options']['csrf_token'] == 'token-two'
+        assert sorted(json.loads(options['serializedProps'])['_serverContext']['location']
+                      for _, options in self.requests) == ['/one', '/two']
+
+    def test_render_component_async_uses_the_flask_request(self):
+        renderer = AsyncRenderServer(RenderServer())
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = url
+            try:
+                return await render_component_async('/path', {'name': 'one'}, renderer=renderer)
+            finally:
+                await renderer.close()
+
+        with self.flask.test_request_context('/test'):
+            result = run_with_render_server(self.render_ok, test)
+            csrf_token = get_csrf_token()
+
+        assert json.loads(result.get_props())['form_options']['csrf_token'] == csrf_token
+        assert json.loads(self.requests[0][1]['serializedProps'])['_serverContext'] == {'location': '/test'}
+
+    def test_render_many_runs_concurrently_in_order(self):
+        renderer = AsyncRenderServer(RenderServer())
+        in_flight = []
+        most_in_flight = []
+
+        async def render_slowly(request):
+            in_flight.append(request)
+            most_in_flight.append(len(in_flight))
+            await asyncio.sleep(0.05)
+            in_flight.remove(request)
+            return await self.render_ok(request)
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = url
+            try:
+                return await renderer.render_many([('/a', {'name': 'a'}), ('/b', {'name': 'b'}), '/c'])
+            finally:
+                await renderer.close()
+
+        with self.flask.test_request_context('/test'):
+            results = run_with_render_server(render_slowly, test)
+
+        assert [result.markup for result in results] == ['<p>a</p>', '<p>b</p>', '<p>None</p>']
+        assert max(most_in_flight) == 3
+
+    def test_render_many_falls_back_to_client_side(self):
+        renderer = AsyncRenderServer(RenderServer())
+
+        async def failing(request):
+            options = json.loads(await request.text())
+            if options['path'] == '/broken':
+                return web.Response(status=500, text='broken')
+            return await self.render_ok(request)
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = url
+            try:
+                return await renderer.render_many(['/ok', '/broken'])
+            finally:
+                await renderer.close()
+
+        with self.flask.test_request_context('/test'):
+            results = run_with_render_server(failing, test)
+
+        assert results[0].markup == '<p>None</p>'
+        assert results[1].markup == ''
+
+    def test_render_error(self):
+        renderer = AsyncRenderServer(RenderServer())
+
+        async def failing(request):
+            return web.Response(status=500, text='broken')
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = url
+            try:
+                with pytest.raises(RenderServerError) as e:
+                    await renderer.render('/path')
+                return e.value
+            finally:
+                await renderer.close()
+
+        with self.flask.test_request_context('/test'):
+            error = run_with_render_server(failing, test)
+
+        assert error.status_code == 500
+
+    def test_shares_cache_and_stats_with_sync_renderer(self):
+        self.flask.config['REACT_RENDER_STATS'] = True
+        sync_renderer = RenderServer(cache=RenderCache())
+        renderer = AsyncRenderServer(sync_renderer)
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = url
+            try:
+                first = await renderer.render('/path', {'name': 'one'}, location='/test')
+                second = await renderer.render('/path', {'name': 'one'}, location='/test')
+                return first, second
+            finally:
+                await renderer.close()
+
+        with self.flask.test_request_context('/test'):
+            first, second = run_with_render_server(self.render_ok, test)
+            cached = sync_renderer.render('/path', {'name': 'one'})
+            summary = sync_renderer.stats.summary()
+
+        assert len(self.requests) == 1
+        assert second.render() == first.render() == cached.render()
+        assert summary['/path']['renders'] == 3
+        assert summary['/path']['cached'] == 2
+        assert summary['/path']['network']['max'] > 0
+
+    def test_endpoint_and_breaker_are_released_on_errors_and_cancellation(self):
+        self.flask.config.update({'REACT_RENDER_BREAKER_THRESHOLD': 5})
+        renderer = AsyncRenderServer(RenderServer())
+
+        async def not_json(request):
+            return web.Response(text='not json')
+
+        async def hanging(request):
+            await asyncio.sleep(5)
+
+        async def test(url):
+            self.flask.config['REACT_RENDER_URL'] = [url, url]
+            try:
+                with pytest.raises(RenderServerError):
+                    await renderer.render('/path')
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(renderer.render('/other'), 0.1)
+            finally:
+                await renderer.close()
+
+        async def handler(request):
+            options = json.loads(await request.text())
+            respond = hanging if options['path'] == '/other' else not_json
+            return await respond(request)
+
+        with self.flask.app_context():
+            run_with_render_server(handler, test)
+            endpoints = renderer.renderer.endpoints.stats()
+            breaker = renderer.renderer.breaker.stats()
+
+        assert [endpoint['outstanding'] for endpoint in endpoints] == [0, 0]
+        # The caller giving up isn't a failure of the render server.
+        assert [endpoint['failures'] for endpoint in endpoints] == [1, 0]
+        assert breaker['failures'] == 1
+
+    def test_keeps_a_session_per_event_loop(self):
+        renderer = AsyncRenderServer(RenderServer())
+        first_loop = asyncio.new_event_loop()
+        second_loop = asyncio.new_event_loop()
+
+        async def session():
+            return renderer.session
+
+        async def close():
+            await renderer.close()
+
+        with self.flask.app_context():
+            first = first_loop.run_until_complete(session())
+            second = second_loop.run_until_complete(session())
+            again = first_loop.run_until_complete(session())
+            for loop in (first_loop, second_loop):
+                loop.run_until_complete(close())
+                loop.close()
+
+        assert first is again
+        assert first is not second
+        assert first.closed and second.closed
+
+    def test_react_render_not_set(self):
+        self.flask.config['REACT_RENDER'] = False
+        renderer = AsyncRenderServer(RenderServer())
+
+        with self.flask.test_request_context('/test'):
+            result = asyncio.new_event_loop().run_until_complete(renderer.render('/path'))
+
+        assert result.markup == ''
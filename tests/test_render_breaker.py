@@ -0,0 +1,68 @@
+from __future__ import absolute_import
+
+import mock
+
+from react.breaker import CircuitBreaker
+
+
+@mock.patch('react.breaker.monotonic')
+class TestCircuitBreaker(object):
+    def test_opens_after_consecutive_failures(self, monotonic):
+        monotonic.return_value = 0
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+        assert breaker.record_failure() is False
+        assert breaker.allow()
+        assert breaker.record_failure() is True
+
+        assert not breaker.allow()
+        assert breaker.stats() == {'state': 'open', 'failures': 2, 'trips': 1, 'rejected': 1}
+
+    def test_success_resets_failure_count(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=2)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == 'closed'
+
+    def test_allows_single_trial_after_reset_timeout(self, monotonic):
+        monotonic.return_value = 0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+
+        monotonic.return_value = 10
+        assert breaker.state == 'half-open'
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == 'closed'
+        assert breaker.allow()
+
+    def test_cancelled_trial_allows_another_trial(self, monotonic):
+        monotonic.return_value = 0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+
+        monotonic.return_value = 10
+        assert breaker.allow()
+        breaker.record_cancelled()
+
+        assert breaker.state == 'half-open'
+        assert breaker.failures == 1
+        assert breaker.allow()
+
+    def test_failed_trial_reopens(self, monotonic):
+        monotonic.return_value = 0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+
+        monotonic.return_value = 10
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == 'open'
+        assert not breaker.allow()
+        assert breaker.trips == 2
@@ -0,0 +1,100 @@
+from __future__ import absolute_import, unicode_literals
+
+import mock
+from werkzeug.contrib.cache import SimpleCache
+
+from react.cache import RenderCache
+from react.render_server import RenderedComponent
+
+
+def component(markup='<div/>'):
+    return RenderedComponent(markup, '{}', 'main', {'main': 'main.js'})
+
+
+class TestRenderCache(object):
+    def test_miss_then_hit(self):
+        cache = RenderCache()
+        rendered = component()
+
+        assert cache.get('/a.js', 'hash') is None
+        cache.set('/a.js', 'hash', rendered)
+        assert cache.get('/a.js', 'hash') is rendered
+
+        assert cache.stats() == {
+            'size': 1, 'hits': 1, 'stale_hits': 0, 'shared_hits': 0, 'misses': 1, 'evictions': 0
+        }
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RenderCache(max_size=2)
+        cache.set('/a.js', 'a', component())
+        cache.set('/b.js', 'b', component())
+        cache.get('/a.js', 'a')
+        cache.set('/c.js', 'c', component())
+
+        assert cache.get('/a.js', 'a') is not None
+        assert cache.get('/b.js', 'b') is None
+        assert cache.get('/c.js', 'c') is not None
+        assert cache.stats()['evictions'] == 1
+
+    @mock.patch('react.cache.monotonic')
+    def test_expired_entries_are_not_returned(self, monotonic):
+        monotonic.return_value = 100
+        cache = RenderCache(ttl=10)
+        cache.set('/a.js', 'a', component())
+
+        monotonic.return_value = 109
+        assert cache.get('/a.js', 'a') is not None
+
+        monotonic.return_value = 111
+        assert cache.get('/a.js', 'a') is None
+        assert cache.stats()['size'] == 0
+
+    @mock.patch('react.cache.monotonic')
+    def test_stale_entries_are_flagged_until_max_stale(self, monotonic):
+        monotonic.return_value = 100
+        cache = RenderCache(ttl=10, max_stale=20)
+        rendered = component()
+        cache.set('/a.js', 'a', rendered)
+
+        assert cache.lookup('/a.js', 'a') == (rendered, False)
+
+        monotonic.return_value = 120
+        assert cache.lookup('/a.js', 'a') == (rendered, True)
+        assert cache.get('/a.js', 'a') is None
+
+        monotonic.return_value = 131
+        assert cache.lookup('/a.js', 'a') == (None, False)
+        assert cache.stats()['stale_hits'] == 1
+
+    def test_invalidate_only_drops_entries_for_path(self):
+        cache = RenderCache()
+        cache.set('/a.js', 'a1', component())
+        cache.set('/a.js', 'a2', component())
+        cache.set('/b.js', 'b', component())
+
+        cache.invalidate('/a.js')
+
+        assert cache.get('/a.js', 'a1') is None
+        assert cache.get('/a.js', 'a2') is None
+        assert cache.get('/b.js', 'b') is not None
+
+    def test_shared_tier_is_used_on_local_miss(self):
+        shared = SimpleCache()
+        RenderCache(shared_cache=shared).set('/a.js', 'a', component('<p>shared</p>'))
+
+        cache = RenderCache(shared_cache=shared)
+        rendered = cache.get('/a.js', 'a')
+
+        assert rendered.markup == '<p>shared</p>'
+        assert rendered.files == {'main': 'main.js'}
+        assert cache.stats()['shared_hits'] == 1
+        # Now held locally as well
+        assert cache.get('/a.js', 'a') is rendered
+
+    def test_invalidate_moves_shared_tier_to_new_generation(self):
+        shared = SimpleCache()
+        RenderCache(shared_cache=shared).set('/a.js', 'a', component())
+
+        RenderCache(shared_cache=shared).invalidate('/a.js')
+
+        assert RenderCache(shared_cache=shared).get('/a.js', 'a') is None
@@ -0,0 +1,109 @@
+from __future__ import absolute_import
+
+import threading
+import time
+
+import pytest
+
+from react.coalesce import SingleFlight
+
+
+def wait_for_waiters(single_flight, waiters):
+    for _ in range(500):
+        if single_flight.stats()['waiting'] == waiters:
+            return
+        time.sleep(0.01)
+    raise AssertionError('waiters did not arrive')
+
+
+class TestSingleFlight(object):
+    def run_concurrently(self, single_flight, fn, callers=5, key='key'):
+        results = [None] * callers
+        errors = [None] * callers
+
+        def call(i):
+            try:
+                results[i] = single_flight.do(key, fn)
+            except Exception as e:
+                errors[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_callers_share_one_call(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait()
+            return object()
+
+        threads, results, errors = self.run_concurrently(single_flight, fn)
+        wait_for_waiters(single_flight, 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert single_flight.stats() == {'in_flight': 0, 'waiting': 0, 'calls': 1, 'coalesced': 4}
+
+    def test_waiters_get_the_same_exception(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        error = ValueError('failed')
+
+        def fn():
+            release.wait()
+            raise error
+
+        threads, results, errors = self.run_concurrently(single_flight, fn, callers=3)
+        wait_for_waiters(single_flight, 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert errors == [error] * 3
+
+    def test_sequential_calls_are_not_shared(self):
+        single_flight = SingleFlight()
+
+        assert single_flight.do('key', lambda: 1) == 1
+        assert single_flight.do('key', lambda: 2) == 2
+        assert single_flight.stats()['coalesced'] == 0
+
+    def test_exception_is_raised_to_caller(self):
+        with pytest.raises(ValueError):
+            SingleFlight().do('key', lambda: int('x'))
+
+    def test_waiters_get_base_exceptions_too(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        class Timeout(BaseException):
+            pass
+
+        def fn():
+            release.wait()
+            raise Timeout()
+
+        def call():
+            try:
+                single_flight.do('key', fn)
+            except Timeout as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for_waiters(single_flight, 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 3
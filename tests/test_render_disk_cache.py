@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+
+import os
+
+from react.disk_cache import DiskRenderCache
+
+
+class TestDiskRenderCache(object):
+    def test_miss_then_hit(self, tmpdir):
+        cache = DiskRenderCache(str(tmpdir))
+
+        assert cache.get('abcdef') is None
+        cache.set('abcdef', '<p>hi</p>', 'main', {'main': 'main.js'})
+
+        assert cache.get('abcdef') == ('<p>hi</p>', 'main', {'main': 'main.js'})
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0}
+
+    def test_shared_between_instances(self, tmpdir):
+        DiskRenderCache(str(tmpdir)).set('abcdef', '<p>hi</p>', 'main', {})
+
+        assert DiskRenderCache(str(tmpdir)).get('abcdef') == ('<p>hi</p>', 'main', {})
+
+    def test_leaves_no_temporary_files(self, tmpdir):
+        cache = DiskRenderCache(str(tmpdir))
+        cache.set('abcdef', '<p>hi</p>', 'main', {})
+
+        assert os.listdir(str(tmpdir.join('ab'))) == ['abcdef.json']
+
+    def test_least_recently_used_renders_are_evicted(self, tmpdir):
+        # Each render is about 90 bytes on disk
+        cache = DiskRenderCache(str(tmpdir), max_bytes=300, low_water=0.7)
+
+        for options_hash, mtime in [('aa1', 1), ('aa2', 3), ('aa3', 2)]:
+            cache.set(options_hash, 'x' * 50, 'main', {})
+            os.utime(str(tmpdir.join('aa', '{}.json'.format(options_hash))), (mtime, mtime))
+        cache.set('aa4', 'x' * 50, 'main', {})
+
+        assert cache.get('aa1') is None
+        assert cache.get('aa3') is None
+        assert cache.get('aa2') is not None
+        assert cache.get('aa4') is not None
+        assert cache.stats()['evictions'] == 2
+
+    def test_rewriting_a_render_does_not_count_it_twice(self, tmpdir):
+        cache = DiskRenderCache(str(tmpdir), max_bytes=150)
+
+        for _ in range(3):
+            cache.set('aa1', 'x' * 50, 'main', {})
+
+        assert cache.get('aa1') is not None
+        assert cache.stats()['evictions'] == 0
+
+    def test_files_written_by_other_processes_are_counted_on_rescan(self, tmpdir):
+        # Each render is about 90 bytes on disk
+        first = DiskRenderCache(str(tmpdir), max_bytes=300, rescan_interval=0)
+        second = DiskRenderCache(str(tmpdir), max_bytes=300, rescan_interval=0)
+
+        first.set('aa1', 'x' * 50, 'main', {})
+        first.set('aa2', 'x' * 50, 'main', {})
+        second.set('aa3', 'x' * 50, 'main', {})
+        second.set('aa4', 'x' * 50, 'main', {})
+
+        assert second.stats()['evictions'] > 0
+
+    def test_invalidate_removes_renders_of_path(self, tmpdir):
+        cache = DiskRenderCache(str(tmpdir))
+        cache.set('aa1', '<p>hi</p>', 'main', {}, path='/a.js')
+        cache.set('aa2', '<p>hi</p>', 'main', {}, path='/b.js')
+
+        assert cache.invalidate('/a.js') == 1
+        assert cache.get('aa1') is None
+        assert cache.get('aa2') is not None
+
+    def test_clear(self, tmpdir):
+        cache = DiskRenderCache(str(tmpdir))
+        cache.set('abcdef', '<p>hi</p>', 'main', {})
+
+        cache.clear()
+
+        assert cache.get('abcdef') is None
@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+from react.endpoints import EndpointPool
+
+
+@mock.patch('react.endpoints.monotonic')
+class TestEndpointPool(object):
+    def test_picks_endpoint_with_fewest_outstanding_requests(self, monotonic):
+        monotonic.return_value = 0
+        pool = EndpointPool(['http://a', 'http://b'])
+
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first, 0.1)
+        third = pool.acquire()
+
+        assert first.url == 'http://a'
+        assert second.url == 'http://b'
+        assert third.url == 'http://a'
+
+    def test_ejects_failing_endpoint_for_cooldown(self, monotonic):
+        monotonic.return_value = 0
+        pool = EndpointPool(['http://a', 'http://b'], max_failures=2, cooldown=30)
+        a = pool.endpoints[0]
+
+        assert pool.release(pool.acquire(), 0.1, failed=True) is False
+        assert pool.release(pool.acquire(), 0.1, failed=False) is False
+        assert pool.release(pool.acquire(), 0.1, failed=True) is False
+        assert pool.release(pool.acquire(), 0.1, failed=True) is True
+
+        assert all(pool.acquire() is not a for _ in range(3))
+
+        monotonic.return_value = 30
+        assert pool.acquire() is a
+
+    def test_uses_longest_ejected_endpoint_if_all_are_ejected(self, monotonic):
+        monotonic.return_value = 0
+        pool = EndpointPool(['http://a', 'http://b'], max_failures=1, cooldown=30)
+        a, b = pool.endpoints
+
+        pool.release(a, 0.1, failed=True)
+        monotonic.return_value = 5
+        pool.release(b, 0.1, failed=True)
+
+        assert pool.acquire() is a
+
+    def test_cancelled_requests_are_not_an_outcome(self, monotonic):
+        monotonic.return_value = 0
+        pool = EndpointPool(['http://a'], max_failures=2)
+        endpoint = pool.acquire()
+        pool.release(endpoint, 0.1, failed=True)
+
+        pool.cancel(pool.acquire())
+
+        assert pool.stats()[0]['outstanding'] == 0
+        assert pool.stats()[0]['requests'] == 1
+        assert endpoint.consecutive_failures == 1
+
+    def test_latency_stats(self, monotonic):
+        monotonic.return_value = 0
+        pool = EndpointPool(['http://a'], max_failures=1)
+
+        pool.release(pool.acquire(), 0.1)
+        pool.release(pool.acquire(), 0.3, failed=True)
+
+        assert pool.stats() == [{
+            'url': 'http://a',
+            'outstanding': 0,
+            'ejected': True,
+            'requests': 2,
+            'failures': 1,
+            'ejections': 1,
+            'mean_latency': pytest.approx(0.2),
+            'max_latency': 0.3,
+        }]
+
+    def test_needs_an_endpoint(self, monotonic):
+        with pytest.raises(ValueError):
+            EndpointPool([])
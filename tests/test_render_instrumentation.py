@@ -0,0 +1,113 @@
+from __future__ import absolute_import
+
+import os
+
+import mock
+
+from react.instrumentation import RenderStats, RenderTiming, format_summary, load_summary
+
+
+def timing(path='/a.js', total=0.02, network=0.015, **kwargs):
+    timing = RenderTiming(path)
+    timing.serialize = 0.001
+    timing.network = network
+    timing.parse = 0.002
+    timing.total = total
+    timing.props_bytes = 100
+    timing.markup_bytes = 1000
+    for key, value in kwargs.items():
+        setattr(timing, key, value)
+    return timing
+
+
+class TestRenderStats(object):
+    def test_summary(self):
+        stats = RenderStats()
+        stats.record(timing(total=0.02))
+        stats.record(timing(total=0.04, error=True))
+        stats.record(timing(total=0.001, fallback=True, cached=True))
+
+        summary = stats.summary()['/a.js']
+
+        assert summary['renders'] == 3
+        assert summary['errors'] == 1
+        assert summary['fallbacks'] == 1
+        assert summary['cached'] == 1
+        assert summary['total']['count'] == 3
+        assert summary['total']['max'] == 0.04
+        assert summary['total']['min'] == 0.001
+        assert summary['total']['buckets'][:4] == [1, 0, 1, 1]
+        assert summary['props_bytes']['mean'] == 100
+
+    def test_publish_sends_renders_since_last_publish(self):
+        stats = RenderStats()
+        client = mock.Mock()
+
+        stats.record(timing())
+        stats.publish(client)
+        client.put_count.assert_any_call('react.render.renders', 1, dimensions={'component': '/a.js'})
+        client.put_statistics.assert_any_call(
+            'react.render.network', 1, 0.015, 0.015, 0.015, unit='Seconds', dimensions={'component': '/a.js'})
+
+        client.reset_mock()
+        stats.publish(client)
+        assert not client.put_count.called
+        assert stats.summary()['/a.js']['renders'] == 1
+
+    def test_due(self):
+        with mock.patch('react.instrumentation.monotonic') as monotonic:
+            monotonic.return_value = 0
+            stats = RenderStats()
+
+            monotonic.return_value = 59
+            assert not stats.due(60)
+            monotonic.return_value = 60
+            assert stats.due(60)
+
+    def test_summary_files_from_each_process_are_merged(self, tmpdir):
+        summary_file = str(tmpdir.join('render-stats'))
+
+        first = RenderStats()
+        first.record(timing(total=0.02))
+        second = RenderStats()
+        second.record(timing(total=0.04))
+        second.record(timing(path='/b.js'))
+
+        with mock.patch('os.getpid', return_value=1):
+            first.publish(summary_file=summary_file)
+        with mock.patch('os.getpid', return_value=2):
+            second.publish(summary_file=summary_file)
+
+        summary = load_summary(summary_file)
+
+        assert summary['/a.js']['renders'] == 2
+        assert summary['/a.js']['total']['max'] == 0.04
+        assert summary['/a.js']['total']['min'] == 0.02
+        assert summary['/b.js']['renders'] == 1
+
+    def test_old_summary_files_are_left_out_and_removed(self, tmpdir):
+        summary_file = str(tmpdir.join('render-stats'))
+        stats = RenderStats()
+        stats.record(timing())
+
+        for pid in (1, 2):
+            with mock.patch('os.getpid', return_value=pid):
+                stats.publish(summary_file=summary_file)
+        os.utime(summary_file + '.1', (0, 0))
+
+        summary = load_summary(summary_file, max_age=180)
+
+        assert summary['/a.js']['renders'] == 1
+        assert not os.path.exists(summary_file + '.1')
+        assert os.path.exists(summary_file + '.2')
+
+    def test_format_summary_orders_by_total_time(self):
+        stats = RenderStats()
+        stats.record(timing(path='/fast.js', total=0.001))
+        stats.record(timing(path='/slow.js', total=0.5))
+
+        lines = format_summary(stats.summary()).splitlines()
+
+        assert lines[0].startswith('component')
+        assert lines[1].startswith('/slow.js')
+        assert lines[2].startswith('/fast.js')
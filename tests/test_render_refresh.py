@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+
+import threading
+
+import mock
+
+from react.refresh import BackgroundRefresher
+
+
+class TestBackgroundRefresher(object):
+    def test_runs_refreshes_in_background(self):
+        refresher = BackgroundRefresher()
+        refreshed = []
+
+        assert refresher.submit('a', lambda: refreshed.append(threading.current_thread().name))
+        refresher.join()
+
+        assert refreshed == ['react-render-refresh']
+        assert refresher.stats() == {'queued': 0, 'refreshed': 1, 'failed': 0, 'dropped': 0}
+
+    def test_does_not_queue_key_twice_or_past_max_queue(self):
+        refresher = BackgroundRefresher(max_queue=2)
+        started = threading.Event()
+        release = threading.Event()
+
+        def first():
+            started.set()
+            release.wait()
+
+        assert refresher.submit('a', first)
+        started.wait()
+        assert not refresher.submit('a', release.wait)
+        assert refresher.submit('b', release.wait)
+        assert refresher.submit('c', release.wait)
+        assert not refresher.submit('d', release.wait)
+
+        release.set()
+        refresher.join()
+        assert refresher.stats() == {'queued': 0, 'refreshed': 3, 'failed': 0, 'dropped': 1}
+
+    def test_failed_refreshes_are_counted(self):
+        refresher = BackgroundRefresher()
+
+        refresher.submit('a', lambda: int('x'))
+        refresher.join()
+
+        assert refresher.stats()['failed'] == 1
+
+    def test_failed_refreshes_are_logged(self):
+        logger = mock.Mock()
+        refresher = BackgroundRefresher(logger=logger)
+
+        refresher.submit('a', lambda: int('x'))
+        refresher.join()
+
+        assert logger.warning.call_count == 1
+        assert logger.warning.call_args[1]['extra']['key'] == 'a'
@@ -2,10 +2,16 @@ from __future__ import absolute_import, unicode_literals
 
 from mock import patch
 from .helpers import BaseApplicationTest, Config
-from react.render_server import render_server
+from .test_render_coalesce import wait_for_waiters
+from react.render import render_component_many, stream_template
+from react.render_server import render_server, RenderServer, RenderedComponent, CSRF_TOKEN_PLACEHOLDER
 from hashlib import sha1
+import json
+import threading
+import zlib
 import pytest
 from react.exceptions import RenderServerError, ReactRenderingError
+from dmutils.csrf import get_csrf_token
 from react.response import validate_form_data, from_response
 from flask import request
 from werkzeug.datastructures import MultiDict
@@ -47,7 +53,7 @@ class TestRenderServer(BaseApplicationTest):
 
             assert req.url == self.config.REACT_RENDER_URL + '?' + urls.urlencode(params)
             assert req.headers['content-type'] == 'application/json'
-            assert req.body == '{"path": "' + path + '", ''"serializedProps": "{\\"_serverContext\\": ' \
+            assert req.body.decode('utf-8') == '{"path": "' + path + '", ''"serializedProps": "{\\"_serverContext\\": ' \
                 '{\\"location\\": \\"/test\\"}, \\"form_options\\": {\\"csrf_token\\": \\"abc123\\"}, ' \
                 '\\"options\\": ' \
                 '{\\"apiUrl\\": \\"http://api\\", \\"serverRender\\": true}}", ' \
@@ -104,6 +110,1084 @@ class TestRenderServer(BaseApplicationTest):
             with pytest.raises(ReactRenderingError):
                 render_server.render('/path')
 
+    @responses.activate
+    def test_timeout(self):
+        e = requests.exceptions.ReadTimeout('mock timeout!')
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, body=e)
+
+            with pytest.raises(RenderServerError):
+                render_server.render('/path')
+
+
+class TestRenderServerSession(BaseApplicationTest):
+    config = RenderConfig()
+
+    def test_session_is_reused(self):
+        renderer = RenderServer()
+        with self.flask.app_context():
+            assert renderer.session is renderer.session
+
+    def test_session_pool_is_configured_from_app(self):
+        self.flask.config.update({'REACT_RENDER_POOL_SIZE': 3, 'REACT_RENDER_RETRIES': 2})
+        renderer = RenderServer()
+
+        with self.flask.app_context():
+            adapter = renderer.session.get_adapter(self.config.REACT_RENDER_URL)
+
+        assert adapter._pool_maxsize == 3
+        assert adapter.max_retries.total == 2
+        assert adapter.max_retries.connect == 2
+
+    def test_close_discards_session(self):
+        renderer = RenderServer()
+        with self.flask.app_context():
+            session = renderer.session
+            renderer.close()
+            assert renderer.session is not session
+
+    @responses.activate
+    def test_render_uses_configured_timeouts(self):
+        self.flask.config.update({'REACT_RENDER_CONNECT_TIMEOUT': 1, 'REACT_RENDER_READ_TIMEOUT': 2})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+
+            with patch.object(renderer.session, 'post', wraps=renderer.session.post) as post:
+                renderer.render('/path')
+
+        assert post.call_args[1]['timeout'] == (1, 2)
+
+    @responses.activate
+    def test_render_server_cookies_are_not_kept(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'},
+                          headers={'Set-Cookie': 'session=secret'})
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+
+            renderer.render('/path')
+            renderer.render('/path')
+
+        assert 'Cookie' not in responses.calls[1].request.headers
+
+
+class TestRenderServerCache(BaseApplicationTest):
+    config = RenderConfig()
+
+    @responses.activate
+    def test_identical_renders_are_served_from_cache(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello', 'slug': 'widget'})
+
+            first = renderer.render('/widget.js', {'foo': 'bar'})
+            second = renderer.render('/widget.js', {'foo': 'bar'})
+            renderer.render('/widget.js', {'foo': 'baz'})
+
+        assert len(responses.calls) == 2
+        assert second.render() == first.render() == 'hello'
+        assert second.get_slug() == 'widget'
+        assert renderer.cache.stats()['hits'] == 1
+
+    @responses.activate
+    def test_renders_are_shared_between_visitors(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        def render_form(request):
+            props = json.loads(json.loads(request.body.decode('utf-8'))['serializedProps'])
+            markup = '<input name="csrf_token" value="{}">'.format(props['form_options']['csrf_token'])
+            return (200, {}, json.dumps({'markup': markup}))
+
+        responses.add_callback(responses.POST, self.config.REACT_RENDER_URL, callback=render_form)
+
+        results = []
+        for _ in range(3):
+            # Each request context has a new session, with its own csrf token.
+            with self.flask.test_request_context('/test'):
+                results.append((get_csrf_token(), renderer.render('/widget.js', {'foo': 'bar'})))
+
+        assert len(responses.calls) == 1
+        with self.flask.app_context():
+            assert renderer.cache.stats()['hits'] == 2
+        assert len(set(csrf_token for csrf_token, _ in results)) == 3
+        for csrf_token, result in results:
+            assert result.render() == '<input name="csrf_token" value="{}">'.format(csrf_token)
+            assert json.loads(result.get_props())['form_options']['csrf_token'] == csrf_token
+
+    @responses.activate
+    def test_uncached_renders_are_sent_the_csrf_token(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': False})
+        renderer = RenderServer()
+        props = {'form_options': {}}
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': 'hello'})
+            renderer.render('/widget.js', props)
+            csrf_token = get_csrf_token()
+
+        sent = json.loads(json.loads(responses.calls[0].request.body.decode('utf-8'))['serializedProps'])
+        assert sent['form_options']['csrf_token'] == csrf_token
+        assert props['form_options']['csrf_token'] == csrf_token
+
+    @responses.activate
+    def test_cached_renders_leave_the_csrf_token_in_props(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+        props = {'form_options': {}}
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': 'hello'})
+            renderer.render('/widget.js', props)
+            csrf_token = get_csrf_token()
+
+        sent = json.loads(json.loads(responses.calls[0].request.body.decode('utf-8'))['serializedProps'])
+        assert sent['form_options']['csrf_token'] == CSRF_TOKEN_PLACEHOLDER
+        assert props['form_options']['csrf_token'] == csrf_token
+
+    @responses.activate
+    def test_invalidate_path(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+
+            renderer.render('/widget.js')
+            renderer.invalidate('/widget.js')
+            renderer.render('/widget.js')
+
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    @patch('react.cache.monotonic')
+    def test_stale_render_is_served_while_refreshed(self, monotonic):
+        monotonic.return_value = 0
+        self.flask.config.update({
+            'REACT_RENDER_CACHE': True,
+            'REACT_RENDER_CACHE_TTL': 10,
+            'REACT_RENDER_CACHE_MAX_STALE': 60,
+        })
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'old'})
+            responses.add(responses.POST, renderer.url, json={'markup': 'new'})
+
+            renderer.render('/widget.js')
+
+            monotonic.return_value = 20
+            assert renderer.render('/widget.js').render() == 'old'
+            renderer.refresher.join()
+            assert renderer.render('/widget.js').render() == 'new'
+
+        assert len(responses.calls) == 2
+        assert renderer.refresher.stats()['refreshed'] == 1
+
+    def test_failed_refreshes_are_logged_to_the_app_logger(self):
+        with self.flask.app_context():
+            assert RenderServer().refresher.logger is self.flask.logger
+
+    @responses.activate
+    def test_static_markup_is_cached_on_disk_with_etag(self, tmpdir):
+        self.flask.config.update({'REACT_RENDER_DISK_CACHE_DIR': str(tmpdir), 'REACT_RENDER_BUILD_ID': 'build-1'})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': 'hello'})
+
+            first = RenderServer().render('/widget.js', {'foo': 'bar'}, to_static_markup=True)
+            second = RenderServer().render('/widget.js', {'foo': 'bar'}, to_static_markup=True)
+            etag = RenderServer().etag('/widget.js', {'foo': 'bar'})
+
+        assert len(responses.calls) == 1
+        assert second.render() == 'hello'
+        assert second.get_props() == first.get_props()
+        assert first.etag == second.etag == etag
+        options_hash = urls.parse_qs(urls.urlparse(responses.calls[0].request.url).query)['hash'][0]
+        assert etag == sha1('build-1:{}'.format(options_hash).encode('utf-8')).hexdigest()
+
+    @responses.activate
+    def test_new_build_does_not_get_renders_on_disk_from_old_build(self, tmpdir):
+        self.flask.config.update({'REACT_RENDER_DISK_CACHE_DIR': str(tmpdir)})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, self.config.REACT_RENDER_URL,
+                          json={'markup': '<p>v1</p>', 'files': {'main': 'main.abc.js'}})
+            old = RenderServer()
+            first = old.render('/w.js', to_static_markup=True)
+            assert old.etag('/w.js') == first.etag
+
+            responses.replace(responses.POST, self.config.REACT_RENDER_URL,
+                              json={'markup': '<p>v2</p>', 'files': {'main': 'main.def.js'}})
+            new = RenderServer()
+            assert new.etag('/w.js') is None
+            second = new.render('/w.js', to_static_markup=True)
+            third = new.render('/w.js', to_static_markup=True)
+
+        assert len(responses.calls) == 2
+        assert second.render() == third.render() == '<p>v2</p>'
+        assert second.get_bundle() == '/main.def.js'
+        assert second.etag == third.etag != first.etag
+
+    @responses.activate
+    def test_changing_build_id_does_not_get_old_renders_from_disk(self, tmpdir):
+        self.flask.config.update({'REACT_RENDER_DISK_CACHE_DIR': str(tmpdir), 'REACT_RENDER_BUILD_ID': 'build-1'})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': '<p>v1</p>'})
+            RenderServer().render('/w.js', to_static_markup=True)
+
+            self.flask.config['REACT_RENDER_BUILD_ID'] = 'build-2'
+            responses.replace(responses.POST, self.config.REACT_RENDER_URL, json={'markup': '<p>v2</p>'})
+            result = RenderServer().render('/w.js', to_static_markup=True)
+
+        assert result.render() == '<p>v2</p>'
+
+    @responses.activate
+    def test_invalidate_drops_renders_on_disk(self, tmpdir):
+        self.flask.config.update({'REACT_RENDER_DISK_CACHE_DIR': str(tmpdir), 'REACT_RENDER_BUILD_ID': 'build-1'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': 'hello'})
+            renderer.render('/w.js', to_static_markup=True)
+            renderer.render('/other.js', to_static_markup=True)
+            renderer.invalidate('/w.js')
+            RenderServer().render('/w.js', to_static_markup=True)
+            RenderServer().render('/other.js', to_static_markup=True)
+
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_static_markup_on_disk_is_shared_between_visitors(self, tmpdir):
+        self.flask.config.update({'REACT_RENDER_DISK_CACHE_DIR': str(tmpdir), 'REACT_RENDER_BUILD_ID': 'build-1'})
+
+        def render(request):
+            props = json.loads(json.loads(request.body.decode('utf-8'))['serializedProps'])
+            if props.get('form'):
+                markup = '<input value="{}">'.format(props['form_options']['csrf_token'])
+                return (200, {}, json.dumps({'markup': markup}))
+            return (200, {}, json.dumps({'markup': 'hello'}))
+
+        responses.add_callback(responses.POST, self.config.REACT_RENDER_URL, callback=render)
+
+        results = []
+        for _ in range(2):
+            # Each request context has a new session, with its own csrf token.
+            with self.flask.test_request_context('/test'):
+                plain = RenderServer().render('/widget.js', {'form': False}, to_static_markup=True)
+                form = RenderServer().render('/widget.js', {'form': True}, to_static_markup=True)
+                results.append((plain, form, RenderServer().etag('/widget.js', {'form': True})))
+
+        assert len(responses.calls) == 2
+        assert len(tmpdir.listdir()) == 2
+        (first_plain, first_form, first_etag), (second_plain, second_form, second_etag) = results
+        assert first_plain.etag == second_plain.etag
+        assert first_form.render() != second_form.render()
+        assert first_form.etag == first_etag
+        assert second_form.etag == second_etag
+        assert first_etag != second_etag
+
+    @responses.activate
+    def test_react_markup_is_not_cached_on_disk(self, tmpdir):
+        self.flask.config.update({'REACT_RENDER_DISK_CACHE_DIR': str(tmpdir)})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+
+            result = renderer.render('/widget.js')
+            renderer.render('/widget.js')
+
+        assert len(responses.calls) == 2
+        assert result.etag is None
+
+    def test_no_etag_without_disk_cache(self):
+        with self.flask.test_request_context('/test'):
+            assert RenderServer().etag('/widget.js') is None
+
+    @responses.activate
+    def test_no_cache_by_default(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+
+            renderer.render('/widget.js')
+            renderer.render('/widget.js')
+
+            assert renderer.cache is None
+        assert len(responses.calls) == 2
+
+
+class TestRenderServerCoalescing(BaseApplicationTest):
+    config = RenderConfig()
+
+    @responses.activate
+    @patch('react.render_server.get_csrf_token')
+    def test_concurrent_identical_renders_share_a_request(self, get_csrf_token):
+        get_csrf_token.return_value = 'abc123'
+        self.flask.config.update({'REACT_RENDER_COALESCE': True})
+        renderer = RenderServer()
+        release = threading.Event()
+
+        def slow_render(request):
+            release.wait()
+            return (200, {}, json.dumps({'markup': 'hello'}))
+
+        responses.add_callback(responses.POST, self.config.REACT_RENDER_URL, callback=slow_render)
+
+        results = []
+
+        def render():
+            with self.flask.test_request_context('/test'):
+                results.append(renderer.render('/path', {'foo': 'bar'}))
+
+        threads = [threading.Thread(target=render) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+
+        with self.flask.app_context():
+            wait_for_waiters(renderer.coalescer, 2)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+            assert renderer.coalescer.stats()['coalesced'] == 2
+
+        assert len(responses.calls) == 1
+        assert len(results) == 3
+        assert all(result.render() == 'hello' for result in results)
+
+    @responses.activate
+    def test_concurrent_renders_for_different_visitors_share_a_request(self):
+        self.flask.config.update({'REACT_RENDER_COALESCE': True})
+        renderer = RenderServer()
+        release = threading.Event()
+
+        def slow_render(request):
+            release.wait()
+            props = json.loads(json.loads(request.body.decode('utf-8'))['serializedProps'])
+            return (200, {}, json.dumps({'markup': props['form_options']['csrf_token']}))
+
+        responses.add_callback(responses.POST, self.config.REACT_RENDER_URL, callback=slow_render)
+
+        results = []
+
+        def render():
+            # A new session, so a csrf token of its own.
+            with self.flask.test_request_context('/test'):
+                results.append((get_csrf_token(), renderer.render('/path', {'foo': 'bar'})))
+
+        threads = [threading.Thread(target=render) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+
+        with self.flask.app_context():
+            wait_for_waiters(renderer.coalescer, 2)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert len(responses.calls) == 1
+        assert len(set(csrf_token for csrf_token, _ in results)) == 3
+        assert all(result.render() == csrf_token for csrf_token, result in results)
+
+
+class TestRenderServerEndpoints(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestRenderServerEndpoints, self).setup()
+        self.flask.config.update({
+            'REACT_RENDER_URL': ['http://a.example.com/render', 'http://b.example.com/render'],
+            'REACT_RENDER_EJECT_AFTER': 1,
+        })
+
+    @responses.activate
+    def test_renders_are_spread_over_endpoints(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://a.example.com/render', json={'markup': 'a'})
+            responses.add(responses.POST, 'http://b.example.com/render', json={'markup': 'b'})
+
+            assert renderer.render('/path').render() == 'a'
+            assert renderer.render('/path').render() == 'a'
+
+            stats = renderer.endpoints.stats()
+
+        assert [endpoint['requests'] for endpoint in stats] == [2, 0]
+
+    @responses.activate
+    def test_failing_endpoint_is_ejected(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://a.example.com/render', status=502)
+            responses.add(responses.POST, 'http://b.example.com/render', json={'markup': 'b'})
+
+            with pytest.raises(RenderServerError):
+                renderer.render('/path')
+            assert renderer.render('/path').render() == 'b'
+            assert renderer.render('/path').render() == 'b'
+
+            stats = renderer.endpoints.stats()
+
+        assert [(endpoint['ejected'], endpoint['requests']) for endpoint in stats] == [(True, 1), (False, 2)]
+
+    @responses.activate
+    def test_client_errors_do_not_eject_endpoint(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://a.example.com/render', status=400)
+
+            with pytest.raises(RenderServerError):
+                renderer.render('/path')
+
+            assert not renderer.endpoints.stats()[0]['ejected']
+
+    @responses.activate
+    def test_raw_props_are_only_sent_to_render_servers_that_accept_them(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://a.example.com/render', json={'markup': 'a'},
+                          headers={'X-Render-Formats': 'serialized-props, raw-props'})
+            responses.add(responses.POST, 'http://a.example.com/render', status=502)
+            responses.add(responses.POST, 'http://b.example.com/render', json={'markup': 'b'})
+
+            renderer.render('/path', {'foo': 'bar'})
+            with pytest.raises(RenderServerError):
+                renderer.render('/path', {'foo': 'bar'})
+            assert renderer.render('/path', {'foo': 'bar'}).render() == 'b'
+
+        bodies = [json.loads(call.request.body.decode('utf-8')) for call in responses.calls]
+        assert 'props' in bodies[1]
+        assert 'serializedProps' in bodies[2]
+
+    @responses.activate
+    def test_endpoint_is_released_on_unexpected_errors(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://a.example.com/render', body='not json')
+
+            with pytest.raises(RenderServerError):
+                renderer.render('/path')
+            with patch.object(renderer, '_send', side_effect=KeyError('markup')):
+                with pytest.raises(KeyError):
+                    renderer.render('/path')
+
+            stats = renderer.endpoints.stats()
+
+        assert [endpoint['outstanding'] for endpoint in stats] == [0, 0]
+        assert [endpoint['failures'] for endpoint in stats] == [1, 1]
+
+    def test_single_url_has_no_endpoint_pool(self):
+        self.flask.config.update({'REACT_RENDER_URL': 'http://example.com/render'})
+
+        with self.flask.app_context():
+            assert RenderServer().endpoints is None
+
+
+class TestRenderServerStats(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestRenderServerStats, self).setup()
+        self.flask.config.update({'REACT_RENDER_STATS': True})
+
+    @responses.activate
+    def test_records_render_timings_and_sizes(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            responses.add(responses.POST, renderer.url, status=500)
+
+            result = renderer.render('/widget.js', {'foo': 'bar'})
+            with pytest.raises(RenderServerError):
+                renderer.render('/widget.js', {'foo': 'bar'})
+
+            summary = renderer.stats.summary()['/widget.js']
+
+        assert summary['renders'] == 2
+        assert summary['errors'] == 1
+        assert summary['props_bytes']['max'] == len(result.get_props())
+        assert summary['markup_bytes']['max'] == len('hello')
+        assert summary['network']['count'] == 2
+        assert summary['network']['total'] > 0
+        assert summary['parse']['total'] > 0
+        assert summary['serialize']['total'] > 0
+        assert summary['total']['total'] >= summary['network']['total']
+
+    @responses.activate
+    def test_records_fallbacks_in_render_many(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, status=500)
+
+            renderer.render_many(['/a.js', '/b.js'])
+
+            summary = renderer.stats.summary()
+
+        assert summary['/a.js']['fallbacks'] == 1
+        assert summary['/b.js']['errors'] == 1
+
+    @responses.activate
+    def test_records_batch_renders(self):
+        self.flask.config.update({'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://example.com/render-batch', json=[{'markup': 'a'}, {'markup': 'bb'}])
+
+            renderer.render_many(['/a.js', '/b.js'])
+
+            summary = renderer.stats.summary()
+
+        assert summary['/a.js']['markup_bytes']['total'] == 1
+        assert summary['/b.js']['markup_bytes']['total'] == 2
+        assert summary['/b.js']['network']['total'] == summary['/a.js']['network']['total'] > 0
+
+    @responses.activate
+    @patch('react.render_server.metrics')
+    def test_stats_are_published_in_background(self, metrics):
+        self.flask.config.update({'REACT_RENDER_STATS_INTERVAL': 0, 'REACT_RENDER_STATS_CLOUDWATCH': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            renderer.render('/widget.js')
+            renderer.stats_publisher.join()
+
+            assert renderer.refresher.stats()['refreshed'] == 0
+            assert renderer.stats_publisher.stats()['refreshed'] == 1
+            assert renderer.stats_publisher.logger is self.flask.logger
+
+        metrics.client.return_value.put_count.assert_any_call(
+            'react.render.renders', 1, dimensions={'component': '/widget.js'})
+
+    def test_no_stats_by_default(self):
+        self.flask.config.update({'REACT_RENDER_STATS': False})
+
+        with self.flask.app_context():
+            assert RenderServer().stats is None
+
+
+class TestRenderServerWireFormat(BaseApplicationTest):
+    config = RenderConfig()
+
+    @responses.activate
+    def test_switches_to_raw_props_once_render_server_accepts_them(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'},
+                          headers={'X-Render-Formats': 'serialized-props, raw-props'})
+
+            renderer.render('/path', {'foo': 'bar'})
+            result = renderer.render('/path', {'foo': 'bar'})
+
+        first = json.loads(responses.calls[0].request.body.decode('utf-8'))
+        second = json.loads(responses.calls[1].request.body.decode('utf-8'))
+
+        assert json.loads(first['serializedProps'])['foo'] == 'bar'
+        assert 'props' not in first
+        assert second['props']['foo'] == 'bar'
+        assert 'serializedProps' not in second
+        assert second['path'] == '/path'
+        assert second['toStaticMarkup'] is False
+        assert result.get_props() == first['serializedProps']
+
+    @responses.activate
+    def test_raw_props_body_matches_sorted_json(self):
+        renderer = RenderServer()
+        renderer._raw_props_urls.add(self.config.REACT_RENDER_URL)
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            result = renderer.render('/path', {'foo': 'bar'}, to_static_markup=True)
+
+        body = responses.calls[0].request.body.decode('utf-8')
+        assert body == json.dumps({
+            'path': '/path',
+            'props': json.loads(result.get_props()),
+            'toStaticMarkup': True
+        }, sort_keys=True)
+
+    @responses.activate
+    def test_keeps_serialized_props_for_older_render_servers(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+
+            renderer.render('/path')
+            renderer.render('/path')
+
+        assert 'serializedProps' in json.loads(responses.calls[1].request.body.decode('utf-8'))
+
+    @responses.activate
+    def test_custom_json_encoder(self):
+        self.flask.config.update({'REACT_RENDER_JSON_DUMPS': lambda props: json.dumps(props, sort_keys=True)})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            result = renderer.render('/path', {'name': u'Caf\xe9'})
+
+        assert json.loads(result.get_props())['name'] == u'Caf\xe9'
+        assert json.loads(responses.calls[0].request.body.decode('utf-8'))['serializedProps'] == result.get_props()
+
+
+class TestRenderServerCompression(BaseApplicationTest):
+    config = RenderConfig()
+
+    @responses.activate
+    def test_large_bodies_are_compressed(self):
+        self.flask.config.update({'REACT_RENDER_COMPRESSION': 'gzip', 'REACT_RENDER_COMPRESSION_THRESHOLD': 100})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            result = renderer.render('/path', {'items': ['item'] * 100})
+
+        request = responses.calls[0].request
+        assert request.headers['content-encoding'] == 'gzip'
+        options = json.loads(zlib.decompress(request.body, 16 + zlib.MAX_WBITS).decode('utf-8'))
+        assert options['serializedProps'] == result.get_props()
+
+    @responses.activate
+    def test_deflate(self):
+        self.flask.config.update({'REACT_RENDER_COMPRESSION': 'deflate', 'REACT_RENDER_COMPRESSION_THRESHOLD': 0})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            renderer.render('/path')
+
+        request = responses.calls[0].request
+        assert request.headers['content-encoding'] == 'deflate'
+        assert json.loads(zlib.decompress(request.body).decode('utf-8'))['path'] == '/path'
+
+    @responses.activate
+    def test_small_bodies_are_not_compressed(self):
+        self.flask.config.update({'REACT_RENDER_COMPRESSION': 'gzip'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            renderer.render('/path')
+
+        request = responses.calls[0].request
+        assert 'content-encoding' not in request.headers
+        assert json.loads(request.body.decode('utf-8'))['path'] == '/path'
+
+
+class TestRenderServerBundles(BaseApplicationTest):
+    config = RenderConfig()
+
+    files = {'main': 'main.abc.js', 'vendor': 'vendor.def.js'}
+
+    @responses.activate
+    def test_bundle_urls(self):
+        self.flask.config['REACT_BUNDLE_URL'] = '/static/'
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello', 'files': self.files})
+            result = renderer.render('/path')
+
+            assert result.get_bundle() == '/static/main.abc.js'
+            assert result.get_vendor_bundle() == '/static/vendor.def.js'
+            assert result.get_file('main') == '/static/main.abc.js'
+            assert result.get_file('missing') is None
+
+    def test_bundle_urls_without_render(self):
+        with self.flask.app_context():
+            result = RenderedComponent('', '{}')
+
+            assert result.get_vendor_bundle() == '/vendor.js'
+            assert result.get_bundle() is None
+
+    @responses.activate
+    def test_manifest_is_shared_until_a_new_build(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello', 'files': self.files})
+            first = renderer.render('/path', {'a': 1})
+            second = renderer.render('/path', {'a': 2})
+
+            assert second.files is first.files
+            assert second.urls is first.urls
+            assert renderer.manifest.builds == 1
+
+            responses.replace(
+                responses.POST, renderer.url, json={'markup': 'hello', 'files': {'main': 'main.123.js'}})
+            third = renderer.render('/path', {'a': 3})
+
+            assert third.get_bundle() == '/main.123.js'
+            assert first.get_bundle() == '/main.abc.js'
+            assert renderer.manifest.builds == 2
+
+    @responses.activate
+    def test_preload_link_headers(self):
+        self.flask.config['REACT_BUNDLE_PRELOAD'] = True
+        renderer = RenderServer()
+        responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': 'hello', 'files': self.files})
+
+        with self.flask.test_request_context('/test'):
+            renderer.render('/path', {'a': 1})
+            renderer.render_many([('/path', {'a': 2})])
+            response = self.flask.process_response(self.flask.make_response('ok'))
+
+        assert response.headers.getlist('Link') == [
+            '</vendor.def.js>; rel=preload; as=script, </main.abc.js>; rel=preload; as=script']
+
+    @responses.activate
+    def test_no_preload_link_headers_by_default(self):
+        renderer = RenderServer()
+        responses.add(responses.POST, self.config.REACT_RENDER_URL, json={'markup': 'hello', 'files': self.files})
+
+        with self.flask.test_request_context('/test'):
+            renderer.render('/path')
+            response = self.flask.process_response(self.flask.make_response('ok'))
+
+        assert 'Link' not in response.headers
+
+
+class TestRenderServerStreaming(BaseApplicationTest):
+    config = RenderConfig()
+
+    @responses.activate
+    def test_markup_is_streamed(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(
+                responses.POST, renderer.url, body='<p>hello</p>', content_type='text/html; charset=utf-8',
+                headers={'X-Render-Slug': 'listing', 'X-Render-Files': '{"listing": "listing.abc.js"}'})
+            result = renderer.render_stream('/path')
+
+            assert ''.join(result.iter_markup()) == '<p>hello</p>'
+            assert result.markup == '<p>hello</p>'
+            assert result.get_bundle() == '/listing.abc.js'
+
+        assert responses.calls[0].request.headers['accept'] == 'text/html, application/json'
+
+    @responses.activate
+    def test_markup_is_read_when_not_iterated(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, body='<p>hello</p>', content_type='text/html')
+            result = renderer.render_stream('/path')
+
+        assert str(result) == '<p>hello</p>'
+        assert list(result.iter_markup()) == ['<p>hello</p>']
+
+    @responses.activate
+    def test_render_servers_that_cannot_stream(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': '<p>hello</p>', 'slug': 'main'})
+            result = renderer.render_stream('/path')
+
+        assert list(result.iter_markup()) == ['<p>hello</p>']
+
+    def test_stream_template_sends_page_before_component(self):
+        pulled = []
+
+        def chunks():
+            pulled.append(True)
+            yield '<p>hello</p>'
+
+        component = RenderedComponent(None, '{}', chunks=chunks())
+
+        with self.flask.test_request_context('/test'):
+            response = stream_template('test_stream.html', component=component)
+            body = iter(response.response)
+
+            assert '<head>' in next(body)
+            assert not pulled
+            assert '<p>hello</p>' in ''.join(body)
+
+
+class TestRenderMany(BaseApplicationTest):
+    config = RenderConfig()
+
+    def markup_for_path(self, request):
+        options = json.loads(request.body)
+        if options['path'] == '/broken.js':
+            return (500, {}, 'oops')
+        return (200, {}, json.dumps({'markup': 'rendered ' + options['path']}))
+
+    @responses.activate
+    def test_renders_in_parallel_in_order(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add_callback(responses.POST, renderer.url, callback=self.markup_for_path)
+
+            results = render_component_many(
+                ['/a.js', ('/b.js', {'foo': 'bar'}), {'path': '/c.js', 'to_static_markup': True}],
+                renderer=renderer
+            )
+
+        assert [result.render() for result in results] == ['rendered /a.js', 'rendered /b.js', 'rendered /c.js']
+        assert json.loads(results[1].get_props())['foo'] == 'bar'
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_failed_render_falls_back_to_client_side(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add_callback(responses.POST, renderer.url, callback=self.markup_for_path)
+
+            results = renderer.render_many([('/a.js', {'foo': 'bar'}), ('/broken.js', {'foo': 'baz'})])
+
+        assert results[0].render() == 'rendered /a.js'
+        assert results[1].render() == ''
+        assert json.loads(results[1].get_props())['foo'] == 'baz'
+
+    @responses.activate
+    def test_batch_render(self):
+        self.flask.config.update({'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://example.com/render-batch', json=[
+                {'markup': 'a', 'slug': 'a'},
+                {'error': 'an error'},
+                {'markup': 'c'},
+            ])
+
+            results = renderer.render_many(['/a.js', '/b.js', '/c.js'])
+
+        assert [result.render() for result in results] == ['a', '', 'c']
+        assert results[0].get_slug() == 'a'
+        assert len(responses.calls) == 1
+        assert [options['path'] for options in json.loads(responses.calls[0].request.body)] == \
+            ['/a.js', '/b.js', '/c.js']
+
+    @pytest.mark.parametrize('response', [[{'markup': 'a'}], {'markup': 'a'}])
+    @responses.activate
+    def test_malformed_batch_response_falls_back_to_client_side(self, response):
+        self.flask.config.update({'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://example.com/render-batch', json=response)
+
+            results = renderer.render_many(['/a.js', '/b.js'])
+
+        assert [result.render() for result in results] == ['', '']
+
+    @responses.activate
+    def test_parallel_renders_are_bounded_per_call(self):
+        self.flask.config.update({'REACT_RENDER_MAX_CONCURRENCY': 1})
+        renderer = RenderServer()
+        release = threading.Event()
+
+        def slow_render(request):
+            options = json.loads(request.body)
+            if options['path'] == '/slow.js':
+                release.wait(5)
+            return (200, {}, json.dumps({'markup': 'rendered {}'.format(options['path'])}))
+
+        responses.add_callback(responses.POST, self.config.REACT_RENDER_URL, callback=slow_render)
+
+        def render_slow_page():
+            with self.flask.test_request_context('/slow'):
+                renderer.render_many(['/slow.js', '/slow.js'])
+
+        slow_page = threading.Thread(target=render_slow_page)
+        slow_page.start()
+        try:
+            with self.flask.test_request_context('/test'):
+                results = renderer.render_many(['/a.js', '/b.js'])
+            # Rendered while the slow page's renders are still waiting.
+            assert slow_page.is_alive()
+        finally:
+            release.set()
+            slow_page.join()
+
+        assert [result.render() for result in results] == ['rendered /a.js', 'rendered /b.js']
+
+    @responses.activate
+    def test_batch_render_uses_cache(self):
+        self.flask.config.update({
+            'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch',
+            'REACT_RENDER_CACHE': True,
+        })
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, json={'markup': 'cached'})
+            responses.add(responses.POST, 'http://example.com/render-batch', json=[{'markup': 'b'}])
+
+            renderer.render('/a.js')
+            results = renderer.render_many(['/a.js', '/b.js'])
+
+        assert [result.render() for result in results] == ['cached', 'b']
+        assert len(json.loads(responses.calls[1].request.body)) == 1
+
+    @responses.activate
+    def test_falls_back_to_parallel_if_batches_are_not_supported(self):
+        self.flask.config.update({'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://example.com/render-batch', status=404)
+            responses.add_callback(responses.POST, renderer.url, callback=self.markup_for_path)
+
+            renderer.render_many(['/a.js', '/b.js'])
+            results = renderer.render_many(['/a.js', '/b.js'])
+
+        assert [result.render() for result in results] == ['rendered /a.js', 'rendered /b.js']
+        assert len([call for call in responses.calls if 'render-batch' in call.request.url]) == 1
+
+    @responses.activate
+    @patch('react.render_server.monotonic')
+    def test_batches_are_tried_again_after_cooldown(self, monotonic):
+        monotonic.return_value = 0
+        self.flask.config.update({
+            'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch',
+            'REACT_RENDER_BATCH_COOLDOWN': 60,
+        })
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://example.com/render-batch', status=404)
+            responses.add(responses.POST, 'http://example.com/render-batch', json=[{'markup': 'a'}, {'markup': 'b'}])
+            responses.add_callback(responses.POST, renderer.url, callback=self.markup_for_path)
+
+            renderer.render_many(['/a.js', '/b.js'])
+            monotonic.return_value = 30
+            renderer.render_many(['/a.js', '/b.js'])
+            monotonic.return_value = 61
+            results = renderer.render_many(['/a.js', '/b.js'])
+
+        assert [result.render() for result in results] == ['a', 'b']
+        assert len([call for call in responses.calls if 'render-batch' in call.request.url]) == 2
+
+    @patch('react.render_server.get_csrf_token')
+    def test_react_render_not_set(self, get_csrf_token):
+        get_csrf_token.return_value = 'abc123'
+        self.flask.config.update({'REACT_RENDER': None})
+
+        with self.flask.test_request_context('/test'):
+            results = render_component_many(['/a.js', '/b.js'], renderer=RenderServer())
+
+        assert [result.render() for result in results] == ['', '']
+        assert json.loads(results[0].get_props())['form_options'] == {'csrf_token': 'abc123'}
+
+
+class TestRenderServerBreaker(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestRenderServerBreaker, self).setup()
+        self.flask.config.update({'REACT_RENDER_BREAKER_THRESHOLD': 2})
+
+    def test_max_timeout_caps_timeouts(self):
+        self.flask.config.update({'REACT_RENDER_MAX_TIMEOUT': 0.5, 'REACT_RENDER_CONNECT_TIMEOUT': 0.2})
+
+        with self.flask.app_context():
+            assert RenderServer().timeout == (0.2, 0.5)
+
+    @responses.activate
+    def test_invalid_json_is_a_failure(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, body='<html>Bad gateway</html>')
+
+            with pytest.raises(RenderServerError):
+                renderer.render('/path')
+
+            assert renderer.breaker.stats()['failures'] == 1
+
+    @responses.activate
+    def test_unexpected_error_ends_trial_render(self):
+        self.flask.config.update({'REACT_RENDER_BREAKER_RESET': 0})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, body=requests.exceptions.ReadTimeout())
+            responses.add(responses.POST, renderer.url, body=requests.exceptions.ReadTimeout())
+            responses.add(responses.POST, renderer.url, json={'markup': 'hello'})
+            for _ in range(2):
+                with pytest.raises(RenderServerError):
+                    renderer.render('/path')
+
+            with patch.object(renderer, '_send', side_effect=KeyError('markup')):
+                with pytest.raises(KeyError):
+                    renderer.render('/path')
+
+            assert renderer.render('/path').render() == 'hello'
+            assert renderer.breaker.stats()['state'] == 'closed'
+
+    @responses.activate
+    def test_falls_back_to_client_side_while_open(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, body=requests.exceptions.ReadTimeout())
+
+            for _ in range(2):
+                with pytest.raises(RenderServerError):
+                    renderer.render('/path', {'foo': 'bar'})
+
+            result = renderer.render('/path', {'foo': 'bar'})
+
+        assert result.render() == ''
+        assert json.loads(result.get_props())['foo'] == 'bar'
+        assert len(responses.calls) == 2
+        assert renderer.breaker.stats() == {'state': 'open', 'failures': 2, 'trips': 1, 'rejected': 1}
+
+    @responses.activate
+    def test_client_errors_do_not_open_breaker(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, renderer.url, status=400)
+
+            for _ in range(3):
+                with pytest.raises(RenderServerError):
+                    renderer.render('/path')
+
+        assert renderer.breaker.state == 'closed'
+
+    @responses.activate
+    def test_batch_falls_back_while_open(self):
+        self.flask.config.update({'REACT_RENDER_BATCH_URL': 'http://example.com/render-batch'})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, 'http://example.com/render-batch', status=503)
+
+            renderer.render_many(['/a.js', '/b.js'])
+            renderer.render_many(['/a.js', '/b.js'])
+            results = renderer.render_many(['/a.js', '/b.js'])
+
+        assert [result.render() for result in results] == ['', '']
+        assert len(responses.calls) == 2
+        assert renderer.breaker.stats()['rejected'] == 1
+
 
 class TestReactResponse(BaseApplicationTest):
     def test_extract_json_response(self):
@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+
+from monotonic import monotonic
+
+from benchmarks.stand_in_server import StandInRenderServer
+from react.render_server import RenderServer
+from .helpers import BaseApplicationTest
+from .test_render_server import RenderConfig
+
+
+class TestStandInRenderServer(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestStandInRenderServer, self).setup()
+        self.server = StandInRenderServer(latency=0.05, markup_size=100).start()
+        self.flask.config['REACT_RENDER_URL'] = self.server.url
+
+    def teardown(self):
+        self.server.stop()
+
+    def test_renders_with_configured_latency_and_markup_size(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            start = monotonic()
+            result = renderer.render('/widget/component.js', {'foo': 'bar'})
+            elapsed = monotonic() - start
+
+        assert result.markup == '<div>/widget/component.js{}</div>'.format('x' * 100)
+        assert result.files == {'main': 'main.js', 'vendor': 'vendor.js'}
+        assert elapsed >= 0.05
+        renderer.close()
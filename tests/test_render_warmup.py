@@ -0,0 +1,112 @@
+from __future__ import absolute_import
+
+import threading
+from concurrent.futures import TimeoutError
+
+import mock
+from flask import request
+
+from react.exceptions import RenderServerError
+from react.warmup import crawl_urls, format_results, warm_up, warm_up_from_config
+
+
+def _add_routes(app, requested):
+    @app.route('/')
+    def index():
+        requested.append('/')
+        return 'ok'
+
+    @app.route('/broken')
+    def broken():
+        requested.append('/broken')
+        raise Exception('broken')
+
+    @app.route('/items/<int:item_id>')
+    def item(item_id):
+        return 'ok'
+
+    @app.route('/submit', methods=['POST'])
+    def submit():
+        return 'ok'
+
+
+class TestWarmUp(object):
+    def test_renders_each_component_in_a_request_context(self, app):
+        renderer = mock.Mock()
+        renderer.render.side_effect = lambda path, props, to_static_markup: request.path
+
+        results = warm_up(app, [('A.js', {'a': 1}), ('B.js', {}, True)], renderer=renderer)
+
+        assert [result['path'] for result in results] == ['A.js', 'B.js']
+        assert all(result['error'] is None and result['seconds'] >= 0 for result in results)
+        renderer.render.assert_has_calls(
+            [mock.call('A.js', {'a': 1}, False), mock.call('B.js', {}, True)], any_order=True)
+
+    def test_renders_on_the_given_url(self, app):
+        rendered_on = []
+        renderer = mock.Mock()
+        renderer.render.side_effect = lambda path, props, to_static_markup: rendered_on.append(request.path)
+
+        warm_up(app, [('A.js', {}), ('B.js', {}, False, '/listing')], renderer=renderer)
+
+        assert sorted(rendered_on) == ['/', '/listing']
+
+    def test_stops_waiting_after_timeout(self, app):
+        release = threading.Event()
+        renderer = mock.Mock()
+        renderer.render.side_effect = lambda path, props, to_static_markup: path == 'B.js' and release.wait(5)
+
+        try:
+            results = warm_up(app, [('A.js', {}), ('B.js', {})], renderer=renderer, timeout=0.1)
+        finally:
+            release.set()
+
+        assert results[0]['error'] is None
+        assert results[1]['path'] == 'B.js'
+        assert isinstance(results[1]['error'], TimeoutError)
+
+    def test_reports_render_errors(self, app):
+        renderer = mock.Mock()
+        renderer.render.side_effect = RenderServerError('down')
+
+        results = warm_up(app, [('A.js', {})], renderer=renderer)
+
+        assert isinstance(results[0]['error'], RenderServerError)
+
+    def test_crawl_requests_get_routes_without_arguments(self, app):
+        requested = []
+        _add_routes(app, requested)
+
+        assert crawl_urls(app) == ['/', '/broken']
+
+        results = warm_up(app, crawl=True, renderer=mock.Mock())
+
+        assert sorted(requested) == ['/', '/broken']
+        assert results[0]['error'] is None
+        assert '500' in str(results[1]['error'])
+
+    def test_from_config_does_nothing_unless_configured(self, app):
+        renderer = mock.Mock()
+
+        assert warm_up_from_config(app, renderer) == []
+        renderer.render.assert_not_called()
+
+    def test_from_config(self, app_with_logging):
+        app_with_logging.config['REACT_RENDER_WARMUP'] = [('A.js', {})]
+        renderer = mock.Mock()
+
+        results = warm_up_from_config(app_with_logging, renderer)
+
+        assert [result['path'] for result in results] == ['A.js']
+        renderer.render.assert_called_once_with('A.js', {}, False)
+
+
+def test_format_results_slowest_first():
+    output = format_results([
+        {'path': 'A.js', 'seconds': 0.01, 'error': None},
+        {'path': 'B.js', 'seconds': 0.5, 'error': RenderServerError('down')},
+    ])
+
+    lines = output.splitlines()
+    assert lines[1].startswith('B.js') and lines[1].endswith('down')
+    assert lines[2].startswith('A.js')
@@ -1,3 +1,6 @@
+import io
+import threading
+import time
 import unittest
 import datetime
 
@@ -5,7 +8,13 @@ import mock
 import pytest
 from freezegun import freeze_time
 from .helpers import mock_file
-from dmutils.s3 import S3, get_file_size_up_to_maximum
+from dmutils import s3 as dmutils_s3
+from dmutils.s3 import (
+    MULTIPART_MIN_PART_SIZE, S3, S3ResponseError, StoragePool, format_timestamp, get_file_size_up_to_maximum,
+    init_app, signed_url_cache, storage_pool, timestamp_cache
+)
+from dmutils.formats import DATETIME_FORMAT
+from dateutil.parser import parse as parse_time
 
 
 class TestS3Uploader(unittest.TestCase):
@@ -16,14 +25,46 @@ class TestS3Uploader(unittest.TestCase):
             return_value=self.s3_mock
         )
         self._boto_patch.start()
+        storage_pool.clear()
+        timestamp_cache.clear()
+        signed_url_cache.clear()
 
     def tearDown(self):
         self._boto_patch.stop()
+        storage_pool.clear()
+        timestamp_cache.clear()
+        signed_url_cache.clear()
 
     def test_get_bucket(self):
         S3('test-bucket')
         self.s3_mock.get_bucket.assert_called_with('test-bucket')
 
+    def test_connection_and_bucket_are_reused(self):
+        assert S3('test-bucket').bucket is S3('test-bucket').bucket
+        S3('other-bucket')
+
+        assert self.s3_mock.get_bucket.call_count == 2
+        assert dmutils_s3.boto.connect_s3.call_count == 1
+
+    def test_buckets_are_cached_per_host(self):
+        S3('test-bucket')
+        S3('test-bucket', host='s3-ap-southeast-2.amazonaws.com')
+
+        assert self.s3_mock.get_bucket.call_count == 2
+
+    def test_lazy_validation(self):
+        S3('test-bucket', validate=False)
+        self.s3_mock.get_bucket.assert_called_with('test-bucket', validate=False)
+
+    def test_failed_validation_is_not_cached(self):
+        self.s3_mock.get_bucket.side_effect = [S3ResponseError(404, 'Not Found'), FakeBucket()]
+
+        with pytest.raises(S3ResponseError):
+            S3('test-bucket')
+        S3('test-bucket')
+
+        assert self.s3_mock.get_bucket.call_count == 2
+
     def test_path_exists(self):
         mock_bucket = FakeBucket()
         self.s3_mock.get_bucket.return_value = mock_bucket
@@ -63,6 +104,50 @@ class TestS3Uploader(unittest.TestCase):
         S3('test-bucket').get_signed_url('documents/file.pdf', 10)
         mock_bucket.s3_key_mock.generate_url.assert_called_with(10)
 
+    def test_get_signed_url_without_checking_object_exists(self):
+        mock_bucket = FakeBucket()
+        mock_bucket.get_key = mock.Mock()
+        mock_bucket.s3_key_mock.generate_url.return_value = 'https://signed'
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        assert S3('test-bucket').get_signed_url('documents/file.pdf', check_exists=False) == 'https://signed'
+        assert not mock_bucket.get_key.called
+
+    def test_get_signed_url_from_cache(self):
+        mock_bucket = FakeBucket()
+        mock_bucket.s3_key_mock.generate_url.side_effect = ['https://signed/1', 'https://signed/2']
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        with freeze_time('2015-10-10 00:00:00') as frozen:
+            s3 = S3('test-bucket')
+            assert s3.get_signed_url('file.pdf', 60, check_exists=False, cache=True) == 'https://signed/1'
+
+            frozen.tick(datetime.timedelta(seconds=30))
+            assert s3.get_signed_url('file.pdf', 60, check_exists=False, cache=True) == 'https://signed/1'
+
+            frozen.tick(datetime.timedelta(seconds=1))
+            assert s3.get_signed_url('file.pdf', 60, check_exists=False, cache=True) == 'https://signed/2'
+
+    def test_get_signed_urls(self):
+        mock_bucket = FakeBucket()
+        mock_bucket.get_key = mock.Mock()
+        mock_bucket.s3_key_mock.generate_url.return_value = 'https://signed'
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        urls = S3('test-bucket').get_signed_urls(['a.pdf', 'b.pdf'])
+
+        assert urls == {'a.pdf': 'https://signed', 'b.pdf': 'https://signed'}
+        assert not mock_bucket.get_key.called
+
+    def test_get_signed_urls_checking_objects_exist(self):
+        mock_bucket = FakeBucket(['a.pdf'])
+        mock_bucket.s3_key_mock.generate_url.return_value = 'https://signed'
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        urls = S3('test-bucket').get_signed_urls(['a.pdf', 'b.pdf'], check_exists=True)
+
+        assert urls == {'a.pdf': 'https://signed', 'b.pdf': None}
+
     def test_get_key(self):
         mock_bucket = mock.Mock()
         self.s3_mock.get_bucket.return_value = mock_bucket
@@ -89,6 +174,82 @@ class TestS3Uploader(unittest.TestCase):
 
         assert 'folder/2015-10-10T00:00:00-test-file.pdf' in mock_bucket.keys
 
+    @freeze_time('2015-10-10')
+    def test_delete_keys(self):
+        mock_bucket = FakeBucket(['folder/a.pdf', 'folder/b.pdf'])
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        result = S3('test-bucket').delete_keys(['folder/a.pdf', 'folder/b.pdf', 'folder/c.pdf'])
+
+        assert mock_bucket.keys == set(['folder/2015-10-10T00:00:00-a.pdf', 'folder/2015-10-10T00:00:00-b.pdf'])
+        assert mock_bucket.delete_requests == [['folder/a.pdf', 'folder/b.pdf', 'folder/c.pdf']]
+        assert result['keys'] == [
+            {'path': 'folder/a.pdf', 'archive_path': 'folder/2015-10-10T00:00:00-a.pdf',
+             'deleted': True, 'error': None},
+            {'path': 'folder/b.pdf', 'archive_path': 'folder/2015-10-10T00:00:00-b.pdf',
+             'deleted': True, 'error': None},
+            {'path': 'folder/c.pdf', 'archive_path': None, 'deleted': True, 'error': None},
+        ]
+        assert result['summary']['keys'] == 3
+        assert result['summary']['succeeded'] == 3
+        assert result['summary']['failed'] == 0
+
+    def test_delete_keys_in_chunks(self):
+        paths = ['folder/{}.pdf'.format(i) for i in range(2500)]
+        mock_bucket = FakeBucket(paths)
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        S3('test-bucket').delete_keys(paths, archive=False)
+
+        assert [len(request) for request in mock_bucket.delete_requests] == [1000, 1000, 500]
+        assert mock_bucket.keys == set()
+
+    def test_delete_keys_doesnt_delete_files_that_fail_to_archive(self):
+        mock_bucket = FakeBucket(['a.pdf', 'b.pdf'])
+        copy_key = mock_bucket.copy_key
+
+        def fail_to_copy_b(new_key, src_bucket_name, src_key_name):
+            if src_key_name == 'b.pdf':
+                raise S3ResponseError(500, 'Internal Error')
+            copy_key(new_key, src_bucket_name, src_key_name)
+
+        mock_bucket.copy_key = fail_to_copy_b
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        result = S3('test-bucket').delete_keys(['a.pdf', 'b.pdf'], move_prefix='OLD')
+
+        assert mock_bucket.delete_requests == [['a.pdf']]
+        assert mock_bucket.keys == set(['OLD-a.pdf', 'b.pdf'])
+        assert not result['keys'][1]['deleted']
+        assert 'Internal Error' in result['keys'][1]['error']
+        assert result['summary']['failed'] == 1
+
+    def test_delete_keys_reports_keys_that_fail_to_delete(self):
+        mock_bucket = mock.Mock()
+        error = mock.Mock(key='b.pdf', code='AccessDenied', message='Access Denied')
+        mock_bucket.delete_keys.return_value = mock.Mock(errors=[error])
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        result = S3('test-bucket').delete_keys(['a.pdf', 'b.pdf'], archive=False)
+
+        mock_bucket.delete_keys.assert_called_once_with(['a.pdf', 'b.pdf'], quiet=True)
+        assert [key['deleted'] for key in result['keys']] == [True, False]
+        assert result['keys'][1]['error'] == 'AccessDenied: Access Denied'
+        assert result['summary']['succeeded'] == 1
+
+    def test_archive_keys(self):
+        mock_bucket = FakeBucket(['folder/a.pdf'])
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        result = S3('test-bucket').archive_keys(['folder/a.pdf', 'folder/b.pdf'], move_prefix='OLD')
+
+        assert mock_bucket.keys == set(['folder/a.pdf', 'folder/OLD-a.pdf'])
+        assert result['keys'] == [
+            {'path': 'folder/a.pdf', 'archive_path': 'folder/OLD-a.pdf', 'error': None},
+            {'path': 'folder/b.pdf', 'archive_path': None, 'error': None},
+        ]
+        assert result['summary']['succeeded'] == 2
+
     def test_list_files(self):
         mock_bucket = mock.Mock()
         self.s3_mock.get_bucket.return_value = mock_bucket
@@ -157,6 +318,104 @@ class TestS3Uploader(unittest.TestCase):
         assert results[1]['last_modified'] == '2015-11-10T15:00:00.000000Z'
         assert results[2]['last_modified'] == '2015-12-10T15:00:00.000000Z'
 
+    def test_list_files_loads_timestamps_in_parallel(self):
+        mock_bucket = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        mock_bucket.list.return_value = [FakeKey('dir/file {}.odt'.format(i), etag=str(i)) for i in range(20)]
+
+        lock = threading.Lock()
+        in_flight = []
+        most_in_flight = []
+
+        def get_key(name):
+            with lock:
+                in_flight.append(name)
+                most_in_flight.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(name)
+            i = int(name.split()[1].split('.')[0])
+            return FakeKey(name, timestamp='2015-10-{:02}T15:00:00.0000Z'.format(20 - i))
+        mock_bucket.get_key.side_effect = get_key
+
+        results = S3('test-bucket').list(load_timestamps=True, max_concurrency=4)
+
+        assert [result['path'] for result in results] == ['dir/file {}.odt'.format(i) for i in reversed(range(20))]
+        assert 1 < max(most_in_flight) <= 4
+
+    def test_list_files_caches_timestamps_by_etag(self):
+        mock_bucket = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        mock_bucket.get_key.return_value = FakeKey('dir/file 1.odt', timestamp='2015-10-10T15:00:00.0000Z')
+
+        mock_bucket.list.return_value = [FakeKey('dir/file 1.odt', etag='"abc"')]
+        S3('test-bucket').list(load_timestamps=True)
+        results = S3('test-bucket').list(load_timestamps=True)
+
+        assert results[0]['last_modified'] == '2015-10-10T15:00:00.000000Z'
+        assert mock_bucket.get_key.call_count == 1
+
+        mock_bucket.list.return_value = [FakeKey('dir/file 1.odt', etag='"def"')]
+        S3('test-bucket').list(load_timestamps=True)
+
+        assert mock_bucket.get_key.call_count == 2
+
+    def test_list_files_caches_missing_timestamps(self):
+        mock_bucket = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        mock_bucket.get_key.return_value = FakeKey('dir/file 1.odt')
+        mock_bucket.list.return_value = [FakeKey('dir/file 1.odt', etag='"abc"')]
+
+        S3('test-bucket').list(load_timestamps=True)
+        results = S3('test-bucket').list(load_timestamps=True)
+
+        assert results[0]['last_modified'] == '2015-08-17T14:00:00.000000Z'
+        assert mock_bucket.get_key.call_count == 1
+
+    def test_iter_list_is_lazy(self):
+        mock_bucket = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        listed = []
+
+        def list_keys(prefix, delimiter):
+            for i in range(3):
+                listed.append(i)
+                yield FakeKey('dir/file {}.odt'.format(i))
+        mock_bucket.list.side_effect = list_keys
+
+        keys = S3('test-bucket').iter_list('dir/')
+
+        assert next(keys)['path'] == 'dir/file 0.odt'
+        assert listed == [0]
+        assert [key['path'] for key in keys] == ['dir/file 1.odt', 'dir/file 2.odt']
+
+    def test_iter_list_loads_timestamps_a_page_at_a_time(self):
+        mock_bucket = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        mock_bucket.list.return_value = iter([FakeKey('dir/file {}.odt'.format(i)) for i in range(5)])
+        mock_bucket.get_key.return_value = FakeKey('dir/file.odt', timestamp='2015-10-10T15:00:00.0000Z')
+
+        keys = S3('test-bucket').iter_list(load_timestamps=True, page_size=2)
+
+        next(keys)
+        assert mock_bucket.get_key.call_count == 2
+        assert len(list(keys)) == 4
+        assert mock_bucket.get_key.call_count == 5
+
+    def test_newest_and_oldest(self):
+        mock_bucket = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        last_modified = ['2015-10-{:02}T15:00:00.000000Z'.format(day) for day in [3, 1, 5, 2, 4]]
+        mock_bucket.list.side_effect = lambda prefix, delimiter: iter([
+            FakeKey('dir/file {}.odt'.format(i), last_modified=modified) for i, modified in enumerate(last_modified)
+        ])
+
+        s3 = S3('test-bucket')
+
+        assert [key['path'] for key in s3.newest(2)] == ['dir/file 2.odt', 'dir/file 4.odt']
+        assert [key['path'] for key in s3.oldest(2)] == ['dir/file 1.odt', 'dir/file 3.odt']
+        assert len(s3.newest(10)) == 5
+
     def test_save_file(self):
         mock_bucket = FakeBucket()
         self.s3_mock.get_bucket.return_value = mock_bucket
@@ -209,6 +468,125 @@ class TestS3Uploader(unittest.TestCase):
                 'Content-Disposition': 'attachment; filename="new-test-file.pdf"'.encode('utf-8')
             })
 
+    def test_fast_save_sends_acl_with_upload(self):
+        mock_bucket = FakeBucket()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        S3('test-bucket').save('folder/test-file.pdf', mock_file('blah', 123), fast=True)
+
+        mock_bucket.s3_key_mock.set_contents_from_file.assert_called_with(
+            mock.ANY, headers={'Content-Type': 'application/pdf'}, policy='public-read')
+        assert not mock_bucket.s3_key_mock.set_acl.called
+
+    def test_fast_save_archives_existing_file_without_checking_for_it(self):
+        mock_bucket = FakeBucket(['folder/test-file.pdf'])
+        mock_bucket.get_key = mock.Mock()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        S3('test-bucket').save('folder/test-file.pdf', mock_file('blah', 123), move_prefix='OLD', fast=True)
+
+        assert mock_bucket.keys == set(['folder/test-file.pdf', 'folder/OLD-test-file.pdf'])
+        assert not mock_bucket.get_key.called
+
+    def test_fast_save_new_file(self):
+        mock_bucket = FakeBucket()
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        S3('test-bucket').save('folder/test-file.pdf', mock_file('blah', 123), move_prefix='OLD', fast=True)
+
+        assert mock_bucket.keys == set(['folder/test-file.pdf'])
+
+    def test_fast_save_raises_other_copy_errors(self):
+        mock_bucket = FakeBucket(['folder/test-file.pdf'])
+        mock_bucket.copy_key = mock.Mock(side_effect=S3ResponseError(403, 'Forbidden'))
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        with pytest.raises(S3ResponseError):
+            S3('test-bucket').save('folder/test-file.pdf', mock_file('blah', 123), fast=True)
+
+    def test_save_without_archiving(self):
+        mock_bucket = FakeBucket(['folder/test-file.pdf'])
+        self.s3_mock.get_bucket.return_value = mock_bucket
+
+        S3('test-bucket').save('folder/test-file.pdf', mock_file('blah', 123), archive=False)
+
+        assert mock_bucket.keys == set(['folder/test-file.pdf'])
+
+    def multipart_bucket(self):
+        mock_bucket = FakeBucket()
+        mock_bucket.upload = mock.Mock()
+        mock_bucket.initiate_multipart_upload = mock.Mock(return_value=mock_bucket.upload)
+        self.s3_mock.get_bucket.return_value = mock_bucket
+        return mock_bucket
+
+    def test_save_large_file_in_parts(self):
+        mock_bucket = self.multipart_bucket()
+        uploaded = {}
+        mock_bucket.upload.upload_part_from_file.side_effect = \
+            lambda fp, part_number, size: uploaded.__setitem__(part_number, fp.read())
+        part_size = MULTIPART_MIN_PART_SIZE
+        data = b'a' * part_size + b'b' * part_size + b'c' * 10
+
+        S3('test-bucket').save(
+            'folder/test-file.pdf', io.BytesIO(data), part_size=part_size,
+            timestamp=datetime.datetime(2015, 10, 11))
+
+        mock_bucket.initiate_multipart_upload.assert_called_once_with(
+            'folder/test-file.pdf', headers={'Content-Type': 'application/pdf'},
+            metadata={'timestamp': '2015-10-11T00:00:00.000000Z'}, policy='public-read')
+        assert sorted(uploaded) == [1, 2, 3]
+        assert b''.join(uploaded[i] for i in sorted(uploaded)) == data
+        mock_bucket.upload.complete_upload.assert_called_once_with()
+        assert not mock_bucket.s3_key_mock.set_contents_from_file.called
+
+    def test_save_small_file_in_one_request(self):
+        mock_bucket = self.multipart_bucket()
+
+        S3('test-bucket').save(
+            'folder/test-file.pdf', io.BytesIO(b'a' * 10), part_size=MULTIPART_MIN_PART_SIZE)
+
+        assert not mock_bucket.initiate_multipart_upload.called
+        assert mock_bucket.s3_key_mock.set_contents_from_file.called
+
+    def test_failed_parts_are_retried(self):
+        mock_bucket = self.multipart_bucket()
+        mock_bucket.upload.upload_part_from_file.side_effect = [S3ResponseError(500, 'Error'), None, None]
+
+        S3('test-bucket').save(
+            'folder/test-file.pdf', io.BytesIO(b'a' * (MULTIPART_MIN_PART_SIZE + 1)),
+            part_size=MULTIPART_MIN_PART_SIZE, max_concurrency=1)
+
+        assert mock_bucket.upload.upload_part_from_file.call_count == 3
+        mock_bucket.upload.complete_upload.assert_called_once_with()
+
+    def test_upload_is_cancelled_when_a_part_fails(self):
+        mock_bucket = self.multipart_bucket()
+        mock_bucket.upload.upload_part_from_file.side_effect = S3ResponseError(500, 'Error')
+
+        with pytest.raises(S3ResponseError):
+            S3('test-bucket').save(
+                'folder/test-file.pdf', io.BytesIO(b'a' * (MULTIPART_MIN_PART_SIZE + 1)),
+                part_size=MULTIPART_MIN_PART_SIZE, part_retries=1)
+
+        mock_bucket.upload.cancel_upload.assert_called_once_with()
+        assert not mock_bucket.upload.complete_upload.called
+
+    def test_client_errors_are_not_retried(self):
+        mock_bucket = self.multipart_bucket()
+        mock_bucket.upload.upload_part_from_file.side_effect = S3ResponseError(403, 'Forbidden')
+
+        with pytest.raises(S3ResponseError):
+            S3('test-bucket').save(
+                'folder/test-file.pdf', io.BytesIO(b'a' * (MULTIPART_MIN_PART_SIZE + 1)),
+                part_size=MULTIPART_MIN_PART_SIZE, max_concurrency=1)
+
+        assert mock_bucket.upload.upload_part_from_file.call_count == 1
+        mock_bucket.upload.cancel_upload.assert_called_once_with()
+
+    def test_part_size_must_be_accepted_by_s3(self):
+        with pytest.raises(ValueError):
+            S3('test-bucket').save('folder/test-file.pdf', io.BytesIO(b'a'), part_size=1024)
+
     def test_save_strips_leading_slash(self):
         mock_bucket = FakeBucket()
         self.s3_mock.get_bucket.return_value = mock_bucket
@@ -280,9 +658,74 @@ class TestS3Uploader(unittest.TestCase):
                          'application/vnd.oasis.opendocument.presentation')
 
 
+class TestStoragePool(object):
+    def setup(self):
+        self.pool = StoragePool()
+        self._session_patch = mock.patch('dmutils.s3.boto3.session.Session')
+        self.session = self._session_patch.start()
+
+    def teardown(self):
+        self._session_patch.stop()
+
+    def test_client_is_shared(self):
+        assert self.pool.get_client('http://s3') is self.pool.get_client('http://s3')
+        self.pool.get_client('http://other-s3')
+
+        assert self.session.return_value.client.call_count == 2
+
+    def test_client_endpoint_defaults_to_environment(self):
+        with mock.patch.dict('os.environ', {'AWS_S3_URL': 'http://s3'}):
+            self.pool.get_client()
+
+        assert self.session.return_value.client.call_args[1]['endpoint_url'] == 'http://s3'
+
+    def test_resources_are_kept_per_thread(self):
+        self.session.return_value.resource.side_effect = lambda *args, **kwargs: mock.Mock()
+        resources = []
+        thread = threading.Thread(target=lambda: resources.append(self.pool.get_resource('http://s3')))
+        thread.start()
+        thread.join()
+
+        assert self.pool.get_resource('http://s3') is self.pool.get_resource('http://s3')
+        assert self.pool.get_resource('http://s3') is not resources[0]
+
+    def test_configure_sets_boto3_timeouts_and_retries(self):
+        self.pool.configure(timeout=5, retries=2, max_connections=20)
+        self.pool.get_client('http://s3')
+
+        config = self.session.return_value.client.call_args[1]['config']
+        assert config.connect_timeout == config.read_timeout == 5
+        assert config.retries == {'max_attempts': 2}
+        assert config.max_pool_connections == 20
+
+    def test_configure_sets_boto_timeouts_and_retries(self):
+        self.pool.configure(timeout=5, retries=2)
+        with mock.patch('dmutils.s3.boto.connect_s3') as connect_s3:
+            connect_s3.return_value.http_connection_kwargs = {}
+            conn = self.pool.get_connection('s3-eu-west-1.amazonaws.com')
+
+        assert conn.http_connection_kwargs == {'timeout': 5}
+        assert conn.num_retries == 2
+
+    def test_configure_clears_existing_clients(self):
+        self.session.return_value.client.side_effect = lambda *args, **kwargs: mock.Mock()
+        client = self.pool.get_client('http://s3')
+        self.pool.configure(timeout=5)
+
+        assert self.pool.get_client('http://s3') is not client
+
+    def test_init_app(self, app):
+        app.config.update({'S3_TIMEOUT': 5, 'S3_RETRIES': 2, 'S3_POOL_SIZE': 20})
+        with mock.patch.object(storage_pool, 'configure') as configure:
+            init_app(app)
+
+        configure.assert_called_once_with(timeout=5, retries=2, max_connections=20)
+
+
 class FakeBucket(object):
     def __init__(self, keys=None):
         self.keys = set(keys or [])
+        self.delete_requests = []
         self.s3_key_mock = mock.Mock()
         self.s3_key_mock.name = "test-file.pdf"
 
@@ -293,20 +736,28 @@ class FakeBucket(object):
     def delete_key(self, key):
         self.keys.remove(key)
 
+    def delete_keys(self, keys, quiet=False):
+        self.delete_requests.append(list(keys))
+        self.keys.difference_update(keys)
+        return mock.Mock(errors=[])
+
     def new_key(self, key):
         self.keys.add(key)
         return self.s3_key_mock
 
-    def copy_key(self, new_key, *args, **kwargs):
+    def copy_key(self, new_key, src_bucket_name, src_key_name, *args, **kwargs):
+        if src_key_name not in self.keys:
+            raise S3ResponseError(404, 'Not Found')
         self.keys.add(new_key)
 
 
 class FakeKey(object):
-    def __init__(self, name, last_modified=None, size=None, timestamp=None):
+    def __init__(self, name, last_modified=None, size=None, timestamp=None, etag=None):
         self.name = name
         self.last_modified = last_modified or '2015-08-17T14:00:00.000000Z'
         self.size = size if size is not None else 1
         self.timestamp = timestamp
+        self.etag = etag
 
     def fake_format_key(self, filename, ext):
         return {
@@ -321,6 +772,29 @@ class FakeKey(object):
         return self.timestamp if key == 'timestamp' and self.timestamp else None
 
 
+@pytest.mark.parametrize('timestamp', [
+    '2015-08-17T14:00:00.000Z',
+    '2015-10-10T15:00:00.0000Z',
+    '2015-10-10T15:00:00.123456Z',
+    '2015-10-10T15:00:00Z',
+    'Mon, 17 Aug 2015 14:00:00 GMT',
+    '2015-10-10T15:00:00+01:00',
+    '2015-10-10 15:00',
+])
+def test_format_timestamp_matches_dateutil(timestamp):
+    assert format_timestamp(timestamp) == parse_time(timestamp).strftime(DATETIME_FORMAT)
+
+
+@pytest.mark.parametrize('timestamp', [
+    '2015-02-30T15:00:00.000Z',
+    'Mon, 30 Feb 2015 14:00:00 GMT',
+    'not a timestamp',
+])
+def test_format_timestamp_rejects_invalid_timestamps(timestamp):
+    with pytest.raises(ValueError):
+        format_timestamp(timestamp)
+
+
 def test_get_file_size_just_below_maximum():
     assert get_file_size_up_to_maximum(mock_file('', 5399999)) == 5399999
 